@@ -1,2 +1,80 @@
+"""DegreesOfClimateChange retrieves, stores and plots global climate data.
+
+The names below are the public interface of the package. Importing the
+package loads none of its submodules: each name is imported on first use, so
+that a job that only fetches data never pays for matplotlib, and one that
+does not use the World Bank data never needs wbpy.
+
+Syntax
+import DegreesOfClimateChange as docc
+frames, report = docc.grab_all()            --> every registered source
+df_co2 = docc.grab_scripps_co2_data()
+df_noaa = await docc.agrab_noaa()           --> inside a coroutine
+docc.plot_each_temperature(df_noaa, df_berkeley, df_wb, True)
+df_noaa = docc.grab_noaa.grab_noaa()        --> any submodule by its name
+
+The grab_noaa, grab_berkeley and grab_worldbank functions share the name of
+their module, so the package attributes of those names are the modules.
+Attribute access is lazy on Python 3.7 and later; on Python 3.6 import the
+submodules explicitly, e.g. from DegreesOfClimateChange import sources.
+"""
+
 from __future__ import absolute_import, division, print_function
 #from .version import __version__  # noqa
+
+import importlib
+
+
+# public name: (submodule, attribute)
+_API = {
+    'Source': ('sources', 'Source'),
+    'grab_all': ('sources', 'grab_all'),
+    'grab_one': ('sources', 'grab_one'),
+    'get_source': ('sources', 'get_source'),
+    'register_source': ('sources', 'register_source'),
+    'source_names': ('sources', 'source_names'),
+    'grab_scripps_co2_data': ('grab_co2_scripps', 'grab_scripps_co2_data'),
+    'agrab_noaa': ('grab_noaa', 'agrab_noaa'),
+    'agrab_berkeley': ('grab_berkeley', 'agrab_berkeley'),
+    'agrab_scripps_co2_data': ('grab_co2_scripps',
+                               'agrab_scripps_co2_data'),
+    'agrab_worldbank': ('grab_worldbank', 'agrab_worldbank'),
+    'iter_berkeley': ('grab_berkeley', 'iter_berkeley'),
+    'refresh_berkeley': ('grab_berkeley', 'refresh_berkeley'),
+    'ClimateStore': ('climate_store', 'ClimateStore'),
+    'RefreshScheduler': ('scheduler', 'RefreshScheduler'),
+    'plot_each_absolute_temperature': ('plot_functions',
+                                       'plot_each_absolute_temperature'),
+    'plot_co2_against_temperature': ('plot_functions',
+                                     'plot_co2_against_temperature'),
+    'plot_each_temperature': ('plot_functions', 'plot_each_temperature'),
+    'plot_all_temperature': ('plot_functions', 'plot_all_temperature'),
+    'add_hook': ('instrument', 'add_hook'),
+    'remove_hook': ('instrument', 'remove_hook'),
+}
+
+_SUBMODULES = ('align', 'axis_cache', 'benchmarks', 'climate_store',
+               'correlate', 'dates', 'fixtures', 'frame_builder',
+               'grab_berkeley', 'grab_co2_scripps', 'grab_noaa',
+               'grab_worldbank', 'http_cache', 'instrument', 'plot_functions',
+               'rebase', 'reference_data', 'replay', 'resample', 'rolling',
+               'scheduler', 'sources', 'transport', 'validation')
+
+__all__ = sorted(_API) + ['grab_berkeley', 'grab_noaa', 'grab_worldbank']
+
+
+def __getattr__(name):
+    if name in _API:
+        module_name, attribute = _API[name]
+        module = importlib.import_module('.' + module_name, __name__)
+        value = getattr(module, attribute)
+        globals()[name] = value  # later lookups skip this function
+        return value
+    if name in _SUBMODULES:
+        return importlib.import_module('.' + name, __name__)
+    raise AttributeError("module {!r} has no attribute {!r}".format(
+        __name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_API) | set(_SUBMODULES))
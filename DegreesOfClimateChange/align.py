@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""align lines up the values of several data sources on shared dates.
+
+This python module contains the align function, which takes any number of
+(dates, values) series and returns the shared, sorted date index together
+with one 2-D float array of the values, one row per date and one column per
+source, and align_frames, which does the same for (Date, value) dataframes
+and can first bring them to a common frequency with the resample module.
+
+The dates of all the sources are merged by one sort (numpy.unique) and the
+values are scattered into the array by fancy indexing, so the cost grows with
+the total number of values and never loops in Python over dates. The joins
+are:
+
+'inner'     only the dates present in every source
+'outer'     the dates present in any source; missing values are NaN
+
+Syntax
+from DegreesOfClimateChange import align
+index, values = align.align([(x_noaa, y_noaa), (x_co2, y_co2)])
+values[:, 1]                            --> CO2 on the shared dates
+index, values = align.align_frames({'NOAA': (df_noaa, 'Tanomaly_C'),
+                                    'Scripps': (df_co2, 'CO2')},
+                                   join='outer', freq='annual')
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+
+from . import dates
+from . import resample
+
+
+JOINS = ('inner', 'outer')
+
+
+def align(series, join='inner'):
+    """Aligns (dates, values) series on their shared dates.
+
+    Args:
+        series (list): (dates, values) pairs of array likes of equal length;
+                       dates are any sortable numbers, e.g. matplotlib date
+                       numbers or the months of dates.month_numbers
+        join (str): 'inner' or 'outer', see the module
+    Returns:
+        (index, values): sorted array of the shared dates, and float array
+        of shape (len(index), len(series)) with NaN where a source has no
+        value
+    Raises:
+        ValueError if join is unknown, if the dates and values of a series
+        differ in length, or if a series repeats a date
+    """
+    if join not in JOINS:
+        raise ValueError("Invalid join {!r}, expected one of {}"
+                         .format(join, JOINS))
+    keys = [np.asarray(xs) for xs, _ in series]
+    values = [np.asarray(ys, dtype=np.float64) for _, ys in series]
+    sizes = [len(xs) for xs in keys]
+    if sizes != [len(ys) for ys in values]:
+        raise ValueError("The dates and values of each series must have "
+                         "the same length")
+    if not series:
+        return np.zeros(0), np.zeros((0, 0))
+
+    # merge the dates of every source with one sort
+    index, rows = np.unique(np.concatenate(keys), return_inverse=True)
+    rows = rows.ravel()
+    columns = np.repeat(np.arange(len(series)), sizes)
+    cells = np.bincount(rows * len(series) + columns,
+                        minlength=len(index) * len(series))
+    if len(cells) and cells.max() > 1:
+        raise ValueError("A series repeats a date")
+
+    matrix = np.full((len(index), len(series)), np.nan)
+    matrix[rows, columns] = np.concatenate(values)
+    if join == 'inner':
+        shared = np.bincount(rows, minlength=len(index)) == len(series)
+        return index[shared], matrix[shared]
+    return index, matrix
+
+
+def align_frames(frames, join='inner', freq=None, date_format='datetime'):
+    """Aligns the value columns of (Date, value) dataframes on their dates.
+
+    Args:
+        frames (dict): {name: (dataframe, value column)}; the columns of the
+                       returned array follow the order of frames
+        join (str): 'inner' or 'outer', see the module
+        freq (str): If given, every dataframe is first averaged over the
+                    periods of freq ('annual', 'decadal' or 'seasonal') by
+                    resample.resample_many, so that monthly and yearly
+                    sources share their dates
+        date_format (str): Form of the returned dates, see the dates module
+    Returns:
+        (Date column, values) as described for align
+    Raises:
+        ValueError if join, freq or a Date is invalid
+    """
+    dates.check_format(date_format)
+    names = list(frames)
+    if freq is not None:
+        resampled = resample.resample_many(frames, freq)
+        frames = OrderedDict((name, (resampled[name], frames[name][1]))
+                             for name in names)
+    series = []
+    for name in names:
+        df, column = frames[name]
+        months, valid = dates.month_numbers(df['Date'])
+        if not valid.all():
+            raise ValueError("Invalid dates in {}".format(name))
+        series.append((months, df[column].values))
+    index, matrix = align(series, join)
+    # months since 1970 back to dates
+    index = np.asarray(index, dtype=np.int64)
+    months = None if freq in ('annual', 'decadal') else index % 12 + 1
+    return dates.make_dates(index // 12 + 1970, months, date_format), matrix
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""axis_cache keeps the plot-ready axes of each dataset on disk.
+
+This python module contains the AxisCache class used by the plot functions
+to store the numeric x (matplotlib dates) and y arrays they prepare for each
+source and transformation, for example the raw monthly values, the yearly
+means, or the yearly means rebased to absolute temperatures. Each pair of
+arrays is saved as two .npy files named by a hash of the input data and of
+the transformation, and later loaded memory mapped, so that plotting the
+same data again skips the date parsing and conversion entirely. The arrays
+are mapped copy-on-write: they can be modified like any array, and the
+changes never reach the cached files.
+
+Syntax
+from DegreesOfClimateChange import axis_cache
+x, y = axis_cache.cached_axes('yearly', df_noaa, 'Tanomaly_C', compute)
+axis_cache.clear_axis_cache()  --> removes every cached axis
+
+The cache lives in <cache root>/axes (see http_cache.cache_root) and can be
+turned off by setting DOCC_AXIS_CACHE=0 or by calling set_axis_cache(None).
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+
+from . import http_cache
+
+
+DEFAULT_MAX_ENTRIES = 256  # pairs of arrays kept before the oldest go
+
+
+def _column_bytes(values):
+    """Returns bytes identifying the values of a Series.
+
+    Numeric, datetime64 and period columns give their raw buffer and text
+    columns their joined strings, which is much faster than hashing each
+    element; other columns fall back to pandas.util.hash_pandas_object.
+    """
+    if str(values.dtype).startswith('period'):
+        return pd.PeriodIndex(values).asi8.tobytes()
+    if isinstance(values.dtype, np.dtype) and values.dtype.kind in 'biufcmM':
+        return np.ascontiguousarray(values.values).tobytes()
+    try:
+        return '\0'.join(values.tolist()).encode('utf-8')
+    except TypeError:
+        return pd.util.hash_pandas_object(values, index=False).values.tobytes()
+
+
+def data_hash(df, column):
+    """Returns the SHA-256 hex digest of the Date and column values of df,
+    including their dtypes."""
+    digest = hashlib.sha256()
+    for label in ('Date', column):
+        digest.update(str(df[label].dtype).encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(_column_bytes(df[label]))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class AxisCache(object):
+    """Memory-mapped .npy files of (x, y) axis arrays.
+
+    Args:
+        directory (str): Folder of the cache; defaults to <cache root>/axes
+        max_entries (int): Pairs of arrays kept; the least recently used
+                           ones are removed beyond it
+    """
+
+    def __init__(self, directory=None, max_entries=DEFAULT_MAX_ENTRIES):
+        self.directory = directory or os.path.join(http_cache.cache_root(),
+                                                   'axes')
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(*parts):
+        """Returns the file name stem of the entry described by parts."""
+        return hashlib.sha256(repr(parts).encode('utf-8')).hexdigest()
+
+    def _paths(self, key):
+        return (os.path.join(self.directory, key + '.x.npy'),
+                os.path.join(self.directory, key + '.y.npy'))
+
+    def load(self, key):
+        """Returns the memory-mapped (x, y) arrays of key, or None."""
+        x_path, y_path = self._paths(key)
+        try:
+            # copy-on-write, so callers may modify the arrays
+            axes = (np.load(x_path, mmap_mode='c'),
+                    np.load(y_path, mmap_mode='c'))
+            os.utime(x_path, None)
+        except (IOError, OSError, ValueError):
+            return None
+        return axes
+
+    def _save_array(self, path, array):
+        handle, tmp_path = tempfile.mkstemp(dir=self.directory,
+                                            suffix='.part')
+        try:
+            with os.fdopen(handle, 'wb') as tmp_file:
+                np.save(tmp_file, np.asarray(array, dtype=np.float64))
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def save(self, key, x, y):
+        """Stores the x and y arrays of key and returns them memory mapped."""
+        with self._lock:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            x_path, y_path = self._paths(key)
+            # y first: an entry is only found once its x file exists
+            self._save_array(y_path, y)
+            self._save_array(x_path, x)
+            self._evict()
+        return self.load(key)
+
+    def _entries(self):
+        """List of (last used time, key) of the entries on disk."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.x.npy'):
+                path = os.path.join(self.directory, name)
+                entries.append((os.path.getmtime(path),
+                                name[:-len('.x.npy')]))
+        return entries
+
+    def _evict(self):
+        entries = sorted(self._entries())
+        for _, key in entries[:max(0, len(entries) - self.max_entries)]:
+            self._remove(key)
+
+    def _remove(self, key):
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def get(self, parts, compute):
+        """Returns the (x, y) arrays described by parts, calling compute()
+        to prepare and store them when they are not cached."""
+        key = self.key(*parts)
+        axes = self.load(key)
+        if axes is None:
+            x, y = compute()
+            axes = self.save(key, x, y)
+            if axes is None:  # removed at once by a tiny max_entries
+                axes = (np.asarray(x, dtype=np.float64),
+                        np.asarray(y, dtype=np.float64))
+        return axes
+
+    def clear(self):
+        """Removes every cached axis."""
+        with self._lock:
+            if not os.path.isdir(self.directory):
+                return
+            for _, key in self._entries():
+                self._remove(key)
+
+
+_UNSET = object()
+_axis_cache = _UNSET
+_axis_cache_lock = threading.Lock()
+
+
+def get_axis_cache():
+    """Returns the cache shared by the plot functions, or None if disabled.
+
+    The default AxisCache is created on first use unless the environment
+    variable DOCC_AXIS_CACHE is set to 0.
+    """
+    global _axis_cache
+    with _axis_cache_lock:
+        if _axis_cache is _UNSET:
+            if os.environ.get("DOCC_AXIS_CACHE", "1") == "0":
+                _axis_cache = None
+            else:
+                _axis_cache = AxisCache()
+        return _axis_cache
+
+
+def set_axis_cache(cache):
+    """Replaces the shared cache; pass None to disable caching."""
+    global _axis_cache
+    with _axis_cache_lock:
+        _axis_cache = cache
+
+
+def clear_axis_cache():
+    """Removes every axis from the shared cache."""
+    cache = get_axis_cache()
+    if cache is not None:
+        cache.clear()
+
+
+def cached_axes(transform, df, column, compute, *params):
+    """Returns the (x, y) float arrays of a transformation of df[column].
+
+    Args:
+        transform (str): Name of the transformation, e.g. 'yearly'
+        df (dataframe): Data with a Date column and column
+        column (str): Name of the value column
+        compute: Function of no arguments returning the (x, y) arrays
+        params: Further values the result depends on, e.g. a baseline
+    Returns:
+        (x, y) writable numpy arrays, memory mapped copy-on-write when the
+        cache is enabled
+    """
+    cache = get_axis_cache()
+    if cache is None:
+        x, y = compute()
+        return (np.asarray(x, dtype=np.float64),
+                np.asarray(y, dtype=np.float64))
+    parts = (transform, data_hash(df, column)) + tuple(params)
+    return cache.get(parts, compute)
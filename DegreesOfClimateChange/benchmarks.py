@@ -0,0 +1,387 @@
+# -*- coding: utf-8 -*-
+"""benchmarks times every stage of the grab functions and the plot data paths.
+
+This python module measures, offline, where the time of the data pipeline
+goes. Each grab function is split into the stages it runs (download, parse,
+clean and aggregate) and each stage is timed on its own, against upstream
+responses served by the replay module. The do_plot=False data paths of
+plot_each_absolute_temperature, plot_co2_against_temperature and
+plot_each_temperature are timed on synthetic data of several sizes, with the
+axis cache turned off so that the full conversion is measured, along with
+the annual averaging of two sources by resample_many and their 1, 5, 10 and
+20 year moving means by rolling_windows, and the lagged correlation of both
+with the CO2, with surrogates, by correlate_frames. The
+import.fetch benchmark times the cold start of a new interpreter importing
+what a fetch-only job needs.
+
+The results of each run are appended as one JSON line to a history file, and
+every benchmark is compared with its median over the previous runs in the
+history; a benchmark slower than that by more than a threshold ratio is
+reported as a regression.
+
+Syntax
+python -m DegreesOfClimateChange.benchmarks                   --> run, print
+python -m DegreesOfClimateChange.benchmarks --filter noaa --repeat 9
+python -m DegreesOfClimateChange.benchmarks --history bench_history.jsonl \
+    --check                                 --> exit status 1 on regression
+python -m DegreesOfClimateChange.benchmarks --fixtures recorded/
+                                            --> recorded upstream responses
+
+Without --fixtures the synthetic upstream files of the fixtures module are
+used.
+"""
+
+import argparse
+import datetime
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from . import axis_cache
+from . import correlate
+from . import dates
+from . import grab_berkeley
+from . import grab_co2_scripps
+from . import grab_noaa
+from . import grab_worldbank
+from . import plot_functions
+from . import replay
+from . import resample
+from . import rolling
+from . import transport
+
+
+DEFAULT_REPEAT = 5  # timed samples per benchmark
+DEFAULT_THRESHOLD = 1.25  # slowdown ratio reported as a regression
+MIN_DELTA = 0.002  # seconds of slowdown ignored as noise
+HISTORY_WINDOW = 5  # previous runs the baseline is taken from
+MIN_SAMPLE = 0.02  # seconds; faster calls are looped within one sample
+PLOT_SIZES = (120, 1200, 12000)  # months of synthetic plot data
+# modules a fetch-only job imports; timed in a new interpreter
+FETCH_JOB = ("import DegreesOfClimateChange.sources, "
+             "DegreesOfClimateChange.grab_noaa, "
+             "DegreesOfClimateChange.grab_worldbank")
+
+
+class Benchmark(object):
+    """One timed function.
+
+    Args:
+        name (str): Name of the benchmark, e.g. 'noaa.parse'
+        setup: Function of no arguments returning the argument tuple of func;
+               runs once and is not timed
+        func: Function timed on the arguments returned by setup
+    """
+
+    def __init__(self, name, setup, func):
+        self.name = name
+        self.setup = setup
+        self.func = func
+
+
+def _time(func, args, repeat):
+    """Returns the per call durations of repeat samples of func(*args)."""
+    start = time.perf_counter()
+    func(*args)
+    first = time.perf_counter() - start
+    loops = max(1, int(MIN_SAMPLE / first)) if first > 0 else 1000
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func(*args)
+        samples.append((time.perf_counter() - start) / loops)
+    return samples
+
+
+def _grab_benchmarks():
+    """Benchmarks of the stages of each grab function."""
+    this_year = datetime.datetime.now().year
+    noaa_urls = grab_noaa.month_urls(this_year)
+    station_urls = [url for _, url in grab_co2_scripps.STATION_URLS]
+    locations = [location for location, _ in grab_co2_scripps.STATION_URLS]
+    country_pairs = grab_worldbank._country_pairs()
+
+    def noaa_texts():
+        return [text for text, _ in transport.fetch_many(noaa_urls)]
+
+    def berkeley_text():
+        body, _ = transport.fetch_bytes(grab_berkeley.BERKELEY_URL)
+        return body.decode('latin-1')
+
+    def berkeley_raw():
+        return grab_berkeley._read_berkeley(io.StringIO(berkeley_text()))
+
+    def station_texts():
+        return [text for text, _ in transport.fetch_many(station_urls)]
+
+    def clean_stations(raws):
+        station_dfs = []
+        for location, raw in zip(locations, raws):
+            station_df = grab_co2_scripps.clean_station(raw)
+            station_df['Location'] = location
+            station_dfs.append(station_df)
+        return pd.concat(station_dfs, ignore_index=True)
+
+    def fetch_countries():
+        return grab_worldbank.fetch_countries(
+            grab_worldbank._climate_api(),
+            [code for _, code in country_pairs])
+
+    return [
+        Benchmark('noaa.download', lambda: (noaa_urls,),
+                  transport.fetch_many),
+        Benchmark('noaa.parse', lambda: (noaa_texts(),),
+                  grab_noaa.parse_months),
+        Benchmark('noaa.clean',
+                  lambda: (grab_noaa.parse_months(noaa_texts()),),
+                  grab_noaa.clean_noaa),
+        Benchmark('berkeley.download',
+                  lambda: (grab_berkeley.BERKELEY_URL,),
+                  transport.fetch_bytes),
+        Benchmark('berkeley.parse', lambda: (berkeley_text(),),
+                  lambda text: grab_berkeley._read_berkeley(
+                      io.StringIO(text))),
+        Benchmark('berkeley.clean', lambda: (berkeley_raw(), 'string'),
+                  grab_berkeley._finish),
+        Benchmark('scripps.download', lambda: (station_urls,),
+                  transport.fetch_many),
+        Benchmark('scripps.parse', lambda: (station_texts(),),
+                  lambda texts: [grab_co2_scripps.read_station(text)
+                                 for text in texts]),
+        Benchmark('scripps.clean',
+                  lambda: ([grab_co2_scripps.read_station(text)
+                            for text in station_texts()],),
+                  clean_stations),
+        Benchmark('scripps.aggregate',
+                  lambda: (clean_stations([grab_co2_scripps.read_station(text)
+                                           for text in station_texts()]),),
+                  grab_co2_scripps.yearly_mean),
+        Benchmark('worldbank.download', lambda: (), fetch_countries),
+        Benchmark('worldbank.aggregate',
+                  lambda: (fetch_countries()[0], country_pairs),
+                  grab_worldbank.yearly_global_mean),
+    ]
+
+
+def plot_frames(n_months):
+    """Synthetic (NOAA, Berkeley, World Bank, CO2) dataframes covering
+    n_months, in the forms returned by the grab functions."""
+    months = np.arange(n_months)
+    years = 1850 + months // 12
+    monthly = pd.DataFrame({
+        'Date': dates.make_dates(years, months % 12 + 1),
+        'Tanomaly_C': np.sin(months / 50.0)})
+    unique_years = np.unique(years)
+    df_wb = pd.DataFrame({'Date': dates.make_dates(unique_years),
+                          'Tabsolute_C': 19.0 + unique_years / 1e4})
+    df_co2 = pd.DataFrame({'Date': dates.make_dates(unique_years),
+                           'CO2': 280.0 + (unique_years - 1850) / 2.0})
+    return monthly, monthly.copy(), df_wb, df_co2
+
+
+def _plot_benchmarks(sizes):
+    """Benchmarks of the plot data paths at several input sizes."""
+    benchmarks = []
+    for n_months in sizes:
+        benchmarks += [
+            Benchmark('plot_each_absolute_temperature[{}]'.format(n_months),
+                      lambda n=n_months: plot_frames(n)[:3],
+                      lambda noaa, berkeley, wb:
+                      plot_functions.plot_each_absolute_temperature(
+                          noaa, berkeley, wb, False)),
+            Benchmark('plot_co2_against_temperature[{}]'.format(n_months),
+                      lambda n=n_months: plot_frames(n),
+                      lambda noaa, berkeley, wb, co2:
+                      plot_functions.plot_co2_against_temperature(
+                          co2, noaa, berkeley, wb, False)),
+            Benchmark('plot_each_temperature[{}]'.format(n_months),
+                      lambda n=n_months: plot_frames(n)[:3],
+                      lambda noaa, berkeley, wb:
+                      plot_functions.plot_each_temperature(
+                          noaa, berkeley, wb, False)),
+            Benchmark('resample_many[{}]'.format(n_months),
+                      lambda n=n_months: plot_frames(n)[:2],
+                      lambda noaa, berkeley: resample.resample_many(
+                          {'NOAA': (noaa, 'Tanomaly_C'),
+                           'Berkeley': (berkeley, 'Tanomaly_C')},
+                          'annual', min_count=12)),
+            Benchmark('rolling_windows[{}]'.format(n_months),
+                      lambda n=n_months: plot_frames(n)[:2],
+                      lambda noaa, berkeley: rolling.rolling_windows(
+                          np.column_stack([noaa['Tanomaly_C'].values,
+                                           berkeley['Tanomaly_C'].values]),
+                          [12, 60, 120, 240], center=True)),
+            Benchmark('correlate_frames[{}]'.format(n_months),
+                      lambda n=n_months: plot_frames(n),
+                      lambda noaa, berkeley, wb, co2:
+                      correlate.correlate_frames(
+                          {'Scripps': (co2, 'CO2'),
+                           'NOAA': (noaa, 'Tanomaly_C'),
+                           'Berkeley': (berkeley, 'Tanomaly_C')},
+                          'Scripps', max_lag=5, n_surrogates=100, seed=0)),
+        ]
+    return benchmarks
+
+
+def cold_start(statement=FETCH_JOB):
+    """Runs statement in a new Python interpreter, so that every module it
+    imports is loaded from scratch."""
+    package_parent = os.path.dirname(os.path.dirname(os.path.abspath(
+        __file__)))
+    subprocess.check_call([sys.executable, '-c', statement],
+                          cwd=package_parent)
+
+
+def all_benchmarks(sizes=PLOT_SIZES):
+    """Returns every Benchmark, grab stages first."""
+    return (_grab_benchmarks() + _plot_benchmarks(sizes) +
+            [Benchmark('import.fetch', lambda: (), cold_start)])
+
+
+def run_benchmarks(fixtures=None, name_filter=None, repeat=DEFAULT_REPEAT,
+                   sizes=PLOT_SIZES):
+    """Runs the benchmarks and returns their results.
+
+    Args:
+        fixtures (str): Folder of recorded upstream responses; defaults to
+                        the synthetic files of the fixtures module
+        name_filter (str): Only run benchmarks whose name contains it
+        repeat (int): Timed samples per benchmark
+        sizes (tuple): Months of synthetic data of the plot benchmarks
+    Returns:
+        OrderedDict of {name: {'median': seconds, 'min': seconds,
+        'repeat': repeat}}
+    """
+    if fixtures is None:
+        from . import fixtures as synthetic
+        fixtures = synthetic.fixture_directory()
+    results = OrderedDict()
+    saved_axis_cache = axis_cache.get_axis_cache()
+    axis_cache.set_axis_cache(None)
+    try:
+        with replay.replaying(fixtures):
+            for benchmark in all_benchmarks(sizes):
+                if name_filter and name_filter not in benchmark.name:
+                    continue
+                samples = _time(benchmark.func, benchmark.setup(), repeat)
+                results[benchmark.name] = {
+                    'median': float(np.median(samples)),
+                    'min': float(np.min(samples)),
+                    'repeat': repeat}
+    finally:
+        axis_cache.set_axis_cache(saved_axis_cache)
+    return results
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history(path):
+    """Returns the list of runs saved in the history file at path."""
+    if not os.path.exists(path):
+        return []
+    with open(path) as history_file:
+        return [json.loads(line) for line in history_file if line.strip()]
+
+
+def append_history(path, results):
+    """Appends a run with its results and environment to the history file."""
+    record = {'time': datetime.datetime.now().isoformat(),
+              'revision': _git_revision(),
+              'python': platform.python_version(),
+              'pandas': pd.__version__,
+              'numpy': np.__version__,
+              'machine': platform.node(),
+              'results': results}
+    with open(path, 'a') as history_file:
+        history_file.write(json.dumps(record) + '\n')
+    return record
+
+
+def check_regressions(results, history, threshold=DEFAULT_THRESHOLD,
+                      min_delta=MIN_DELTA, window=HISTORY_WINDOW):
+    """Compares results with the previous runs of the history.
+
+    The baseline of a benchmark is the median of its medians over the last
+    window runs that include it. A benchmark is a regression when its median
+    exceeds threshold times the baseline by more than min_delta seconds.
+
+    Returns:
+        list of {'name', 'median', 'baseline', 'ratio'} dictionaries of the
+        regressions, in the order of results
+    """
+    regressions = []
+    for name, result in results.items():
+        previous = [run['results'][name]['median'] for run in history
+                    if name in run.get('results', {})][-window:]
+        if not previous:
+            continue
+        baseline = float(np.median(previous))
+        median = result['median']
+        if median > threshold * baseline and median - baseline > min_delta:
+            regressions.append({'name': name, 'median': median,
+                                'baseline': baseline,
+                                'ratio': median / baseline})
+    return regressions
+
+
+def _print_results(results, history, out=sys.stdout):
+    out.write('{:<42} {:>12} {:>12} {:>8}\n'.format(
+        'benchmark', 'median (ms)', 'min (ms)', 'ratio'))
+    for name, result in results.items():
+        previous = [run['results'][name]['median'] for run in history
+                    if name in run.get('results', {})][-HISTORY_WINDOW:]
+        ratio = ('{:8.2f}'.format(result['median'] / np.median(previous))
+                 if previous else '       -')
+        out.write('{:<42} {:12.3f} {:12.3f} {}\n'.format(
+            name, 1e3 * result['median'], 1e3 * result['min'], ratio))
+
+
+def main(argv=None):
+    """Command line entry point; returns the exit status."""
+    parser = argparse.ArgumentParser(
+        description='Times the grab stages and plot data paths offline.')
+    parser.add_argument('--fixtures', help='folder of recorded upstream '
+                        'responses (default: synthetic test files)')
+    parser.add_argument('--filter', help='only run benchmarks whose name '
+                        'contains this text')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    parser.add_argument('--history', help='JSON lines history file to '
+                        'compare with and append to')
+    parser.add_argument('--no-save', action='store_true',
+                        help='compare with the history without appending')
+    parser.add_argument('--check', action='store_true',
+                        help='exit with status 1 if a benchmark regressed')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.fixtures, args.filter, args.repeat)
+    history = load_history(args.history) if args.history else []
+    _print_results(results, history)
+    regressions = check_regressions(results, history, args.threshold)
+    for regression in regressions:
+        print("Regression: {name} {median:.4f} s against {baseline:.4f} s "
+              "({ratio:.2f}x)".format(**regression))
+    if args.history and not args.no_save:
+        append_history(args.history, results)
+    return 1 if (args.check and regressions) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+"""climate_store keeps the cleaned output of the grab functions on disk.
+
+This python module contains the ClimateStore class that writes each cleaned
+dataframe as a versioned, columnar snapshot file and reads it back memory
+mapped, so that a new session loads the data from local disk in milliseconds
+instead of downloading and cleaning every source again. Snapshots are Arrow
+IPC files by default, or Parquet files, and the metadata of each snapshot
+(source, fetch time, content hash, number of rows and time resolution) is
+kept in the schema of the file itself. Reads can select a date range and a
+subset of the columns; with Arrow files only the selected columns are ever
+paged in from disk.
+
+Syntax
+from DegreesOfClimateChange.climate_store import ClimateStore
+store = ClimateStore()
+store.write('NOAA', df_noaa)               --> version number
+df_noaa = store.read('NOAA', start='1950-01-01', end='1999-12-01')
+df_noaa = store.grab('NOAA')               --> snapshot, or grab and store
+frames, report = sources.grab_all(store=store)
+
+The frames read from the store have the same columns as those returned by
+the grab functions and can be passed directly to the plot functions.
+
+The store lives in <cache root>/store (see http_cache.cache_root) unless a
+folder is given. It requires the optional pyarrow package.
+"""
+
+import datetime
+import hashlib
+import json
+import os
+import tempfile
+
+import pandas as pd
+
+from . import dates
+from . import http_cache
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency
+    pa = None
+
+
+FORMATS = {'arrow': '.arrow', 'parquet': '.parquet'}
+META_KEY = b'DegreesOfClimateChange'
+
+
+def content_hash(df):
+    """Returns the SHA-256 hex digest of the values and columns of df."""
+    digest = hashlib.sha256()
+    digest.update(json.dumps([str(column) for column in df.columns])
+                  .encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(df, index=False).values
+                  .tobytes())
+    return digest.hexdigest()
+
+
+def _resolution_of(source):
+    """Native resolution of a registered source, 'monthly' otherwise."""
+    from . import sources
+    try:
+        return sources.get_source(source).resolution
+    except KeyError:
+        return 'monthly'
+
+
+class ClimateStore(object):
+    """Versioned columnar snapshots of the cleaned datasets.
+
+    Each source has a folder holding one file per version, v000001.arrow,
+    v000002.arrow, ... A new version is only written when the content hash
+    of the dataframe differs from that of the latest version.
+
+    Args:
+        directory (str): Folder of the store; defaults to
+                         <cache root>/store
+        format (str): 'arrow' (memory mapped IPC files) or 'parquet'
+    Raises:
+        ImportError if pyarrow is not installed
+    """
+
+    def __init__(self, directory=None, format='arrow'):
+        if pa is None:
+            raise ImportError("ClimateStore requires the pyarrow package")
+        if format not in FORMATS:
+            raise ValueError("Invalid format {!r}, expected one of {}"
+                             .format(format, tuple(FORMATS)))
+        self.directory = directory or os.path.join(http_cache.cache_root(),
+                                                   'store')
+        self.format = format
+        self.suffix = FORMATS[format]
+
+    def _path(self, source, version):
+        return os.path.join(self.directory, source,
+                            'v{:06d}{}'.format(version, self.suffix))
+
+    def sources(self):
+        """List of the names of the sources with at least one snapshot."""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name for name in os.listdir(self.directory)
+                      if self.versions(name))
+
+    def versions(self, source):
+        """Sorted list of the snapshot versions of source."""
+        folder = os.path.join(self.directory, source)
+        if not os.path.isdir(folder):
+            return []
+        return sorted(int(name[1:-len(self.suffix)])
+                      for name in os.listdir(folder)
+                      if name.startswith('v') and name.endswith(self.suffix))
+
+    def _latest(self, source, version=None):
+        if version is None:
+            versions = self.versions(source)
+            if not versions:
+                raise KeyError(source)
+            version = versions[-1]
+        path = self._path(source, version)
+        if not os.path.exists(path):
+            raise KeyError("{} version {}".format(source, version))
+        return version, path
+
+    def _schema(self, path):
+        if self.format == 'parquet':
+            return pq.read_schema(path)
+        return pyarrow.ipc.open_file(pa.memory_map(path)).schema
+
+    def info(self, source, version=None):
+        """Returns the metadata dictionary of a snapshot (latest by default).
+
+        Keys are source, version, fetched_at (ISO time), sha256, rows,
+        resolution and columns.
+
+        Raises:
+            KeyError if the snapshot does not exist
+        """
+        version, path = self._latest(source, version)
+        return json.loads(self._schema(path).metadata[META_KEY]
+                          .decode('utf-8'))
+
+    def write(self, source, df, fetched_at=None, resolution=None):
+        """Stores df as a new version of source.
+
+        Args:
+            source (str): Name of the source, e.g. 'NOAA'
+            df (dataframe): Cleaned dataframe with a Date column in any of
+                            the forms of the dates module
+            fetched_at (datetime): Time the data was downloaded; now
+            resolution (str): 'monthly' or 'yearly'; defaults to that of the
+                              registered source
+        Returns:
+            version number of the snapshot holding df
+        """
+        df_typed = df.reset_index(drop=True)
+        if 'Date' in df_typed.columns:
+            df_typed['Date'] = dates.to_datetime(df_typed['Date'])
+        # hashed once typed, so the form of the Date column does not matter
+        digest = content_hash(df_typed)
+        versions = self.versions(source)
+        if versions and self.info(source)['sha256'] == digest:
+            return versions[-1]
+        version = versions[-1] + 1 if versions else 1
+        if fetched_at is None:
+            fetched_at = datetime.datetime.now()
+        meta = {'source': source,
+                'version': version,
+                'fetched_at': fetched_at.isoformat(),
+                'sha256': digest,
+                'rows': len(df_typed),
+                'resolution': resolution or _resolution_of(source),
+                'columns': [str(column) for column in df_typed.columns]}
+        table = pa.Table.from_pandas(df_typed, preserve_index=False)
+        table = table.replace_schema_metadata(
+            {META_KEY: json.dumps(meta).encode('utf-8')})
+
+        folder = os.path.join(self.directory, source)
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+        handle, tmp_path = tempfile.mkstemp(dir=folder, suffix='.part')
+        os.close(handle)
+        try:
+            if self.format == 'parquet':
+                pq.write_table(table, tmp_path)
+            else:
+                with pa.OSFile(tmp_path, 'wb') as sink:
+                    with pyarrow.ipc.new_file(sink, table.schema) as writer:
+                        writer.write_table(table)
+            os.replace(tmp_path, self._path(source, version))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return version
+
+    def read(self, source, version=None, start=None, end=None, columns=None,
+             date_format='string'):
+        """Reads a snapshot of source (latest by default).
+
+        Args:
+            source (str): Name of the source
+            version (int): Snapshot version; None for the latest
+            start, end: First and last dates kept (anything accepted by
+                        pandas.Timestamp); None for no bound
+            columns (list): Columns returned; defaults to all. Date is
+                            always returned first
+            date_format (str): Form of the Date column, see the dates module
+        Returns:
+            pandas dataframe
+        Raises:
+            KeyError if the snapshot does not exist
+        """
+        dates.check_format(date_format)
+        version, path = self._latest(source, version)
+        meta = self.info(source, version)
+        if columns is not None:
+            columns = ['Date'] + [column for column in columns
+                                  if column != 'Date']
+        if self.format == 'parquet':
+            table = pq.read_table(path, columns=columns, memory_map=True)
+        else:
+            table = pyarrow.ipc.open_file(pa.memory_map(path)).read_all()
+            if columns is not None:
+                table = table.select(columns)
+        table = self._date_range(table, start, end)
+
+        df = table.to_pandas()
+        if 'Date' in df.columns and date_format != 'datetime':
+            df['Date'] = dates.convert_dates(
+                df['Date'], date_format,
+                annual=meta['resolution'] == 'yearly')
+        return df
+
+    @staticmethod
+    def _date_range(table, start, end):
+        """Keeps the rows of table between the start and end dates."""
+        if start is None and end is None:
+            return table
+        stamps = table.column('Date')
+        mask = None
+        for bound, compare in ((start, pc.greater_equal),
+                               (end, pc.less_equal)):
+            if bound is None:
+                continue
+            scalar = pa.scalar(pd.Timestamp(bound).to_datetime64(),
+                               type=stamps.type)
+            condition = compare(stamps, scalar)
+            mask = condition if mask is None else pc.and_(mask, condition)
+        return table.filter(mask)
+
+    def grab(self, source, refresh=False, date_format='string'):
+        """Returns the latest snapshot of a registered source, running its
+        grab function and storing the result first if there is none or if
+        refresh is True."""
+        from . import sources
+        dates.check_format(date_format)
+        if refresh or not self.versions(source):
+            spec = sources.get_source(source)
+            self.write(source, spec.grab(date_format='datetime'),
+                       resolution=spec.resolution)
+        return self.read(source, date_format=date_format)
+
+    def prune(self, source, keep=1):
+        """Removes all but the latest keep versions of source."""
+        for version in self.versions(source)[:-keep or None]:
+            os.remove(self._path(source, version))
@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+"""correlate measures how quantities follow each other at every time lag.
+
+This python module contains the cross_correlation function, which returns
+the correlation of two series at every lag, for many pairs of series at once,
+surrogate_test, which tells how likely such a peak of correlation is between
+unrelated series of the same spectra, and correlate_frames, which does both
+for each temperature source against a reference series such as the Scripps
+CO2.
+
+The correlations of all the lags come from one FFT product instead of one
+dot product per lag, so a pair of n values costs O(n log n) whatever the
+number of lags, and every pair is transformed in the same numpy call. Trends
+shared by two series (both rising since 1960) correlate them at every lag, so
+the series can first be transformed:
+
+'none'          the values less their mean
+'detrend'       the values less their least-squares line
+'difference'    the changes from one row to the next
+
+The surrogates are series with the amplitude spectrum (hence the
+autocorrelation) of the first series and random phases. The p value of a
+pair is the share of the surrogates whose largest absolute correlation over
+the lags reaches that of the data.
+
+Missing values count as the mean of their series and add nothing to the
+sums, and a constant series has NaN correlations. A positive lag means that
+the second series follows the first.
+
+Syntax
+from DegreesOfClimateChange import correlate
+lags, r = correlate.cross_correlation(co2, temperatures, max_lag=20,
+                                      transform='detrend')
+r[lags == 5]                  --> correlation with temperatures 5 rows later
+p_values, thresholds = correlate.surrogate_test(co2, temperatures, 20)
+correlations, summary = correlate.correlate_frames(
+    {'Scripps': (df_co2, 'CO2'), 'NOAA': (df_noaa, 'Tanomaly_C'),
+     'Berkeley': (df_berkeley, 'Tanomaly_C')}, 'Scripps', max_lag=20,
+    transform='difference', n_surrogates=1000)
+summary.loc['NOAA', 'p_value']
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from . import align
+
+
+TRANSFORMS = ('none', 'detrend', 'difference')
+N_SURROGATES = 1000  # default surrogates of surrogate_test
+SURROGATE_BATCH = 64  # surrogates of each pair transformed in one FFT call
+
+
+def cross_correlation(x, y, max_lag=None, transform='none', pairwise=False):
+    """Returns the correlation of x with y at every lag up to max_lag.
+
+    Args:
+        x, y (array like): 1-D series, or 2-D arrays with one series per
+                           column, of the same number of rows
+        max_lag (int): Largest lag, in rows; None for every lag
+        transform (str): One of TRANSFORMS, see the module
+        pairwise (bool): Correlate every column of x with every column of y;
+                         otherwise column k of x with column k of y, a 1-D
+                         series being paired with every column of the other
+    Returns:
+        (lags, r): int array of the lags -max_lag to max_lag, and float
+        array of the correlations, of shape (len(lags),) for two 1-D series,
+        (len(lags), pairs) or, if pairwise, (len(lags), x columns,
+        y columns); r[lag] is the correlation of x[t] with y[t + lag]
+    Raises:
+        ValueError if the arguments are invalid
+    """
+    x, y, flat = _pair(x, y, pairwise)
+    x, y = _prepare(x, transform), _prepare(y, transform)
+    max_lag = _check_lag(max_lag, len(x))
+    nfft = _fft_size(len(x) + max_lag)
+    fx = np.fft.rfft(x, nfft, axis=0)
+    fy = np.fft.rfft(y, nfft, axis=0)
+    if pairwise:
+        products = np.conj(fx)[:, :, None] * fy[:, None, :]
+        norms = np.sqrt(np.outer((x ** 2).sum(axis=0), (y ** 2).sum(axis=0)))
+    else:
+        products = np.conj(fx) * fy
+        norms = np.sqrt((x ** 2).sum(axis=0) * (y ** 2).sum(axis=0))
+    r = _lagged(np.fft.irfft(products, nfft, axis=0), max_lag)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        r = r / norms
+    lags = np.arange(-max_lag, max_lag + 1)
+    return lags, r[:, 0] if flat else r
+
+
+def surrogate_test(x, y, max_lag=None, transform='none',
+                   n_surrogates=N_SURROGATES, level=0.95, seed=None):
+    """Tests the largest absolute correlation of each pair of x and y
+    against phase-randomized surrogates of x.
+
+    Args:
+        x, y, max_lag, transform: As for cross_correlation (not pairwise)
+        n_surrogates (int): Surrogates of each pair
+        level (float): Quantile of the surrogate peaks returned as threshold
+        seed (int): Seed of the random phases, for repeatable p values
+    Returns:
+        (p_values, thresholds): for each pair (floats for two 1-D series),
+        the share of the surrogates whose peak reaches that of the data, and
+        the level quantile of the surrogate peaks
+    Raises:
+        ValueError if the arguments are invalid
+    """
+    if int(n_surrogates) != n_surrogates or n_surrogates < 1:
+        raise ValueError("Invalid n_surrogates {!r}, expected a positive "
+                         "integer".format(n_surrogates))
+    if not 0 < level < 1:
+        raise ValueError("Invalid level {!r}, expected between 0 and 1"
+                         .format(level))
+    x, y, flat = _pair(x, y, False)
+    _, r = cross_correlation(x, y, max_lag, transform)
+    observed = np.abs(r).max(axis=0)
+    x, y = _prepare(x, transform), _prepare(y, transform)
+    n_rows, n_pairs = x.shape
+    max_lag = _check_lag(max_lag, n_rows)
+    nfft = _fft_size(n_rows + max_lag)
+    fy = np.fft.rfft(y, nfft, axis=0)[:, :, None]
+    norms_y = np.sqrt((y ** 2).sum(axis=0))[:, None]
+
+    # the surrogates keep the amplitudes of x and draw new phases, leaving
+    # the zero frequency (and the Nyquist one of an even length) real
+    amplitudes = np.abs(np.fft.rfft(x, axis=0))[:, :, None]
+    random_state = np.random.RandomState(seed)
+    peaks = np.empty((n_pairs, int(n_surrogates)))
+    for start in range(0, int(n_surrogates), SURROGATE_BATCH):
+        size = min(SURROGATE_BATCH, int(n_surrogates) - start)
+        phases = random_state.uniform(0, 2 * np.pi,
+                                      (len(amplitudes), n_pairs, size))
+        phases[0] = 0
+        if n_rows % 2 == 0:
+            phases[-1] = 0
+        surrogates = np.fft.irfft(amplitudes * np.exp(1j * phases), n_rows,
+                                  axis=0)
+        lagged = _lagged(np.fft.irfft(
+            np.conj(np.fft.rfft(surrogates, nfft, axis=0)) * fy, nfft,
+            axis=0), max_lag)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            lagged = lagged / (np.sqrt((surrogates ** 2).sum(axis=0)) *
+                               norms_y)
+        peaks[:, start:start + size] = np.abs(lagged).max(axis=0)
+
+    p_values = (((peaks >= observed[:, None]).sum(axis=1) + 1.0) /
+                (n_surrogates + 1.0))
+    p_values[np.isnan(observed)] = np.nan
+    thresholds = np.quantile(peaks, level, axis=1)
+    if flat:
+        return p_values[0], thresholds[0]
+    return p_values, thresholds
+
+
+def correlate_frames(frames, reference, max_lag=None, transform='none',
+                     freq='annual', n_surrogates=0, seed=None):
+    """Correlates the value column of each dataframe with that of the
+    reference dataframe, e.g. each temperature source with the CO2.
+
+    The dataframes are averaged over the periods of freq and aligned on
+    their dates by align.align_frames, over the years of the reference.
+
+    Args:
+        frames (dict): {name: (dataframe, value column)}, with Date columns
+                       of any form of the dates module
+        reference (str): Name in frames of the series the others are
+                         correlated with; positive lags mean the others
+                         follow it
+        max_lag (int): Largest lag, in periods of freq; None for every lag
+        transform (str): One of TRANSFORMS, see the module
+        freq (str): 'annual', 'decadal' or 'seasonal', see the resample
+                    module; None to align the dates as they are
+        n_surrogates (int): Surrogates of the p values; 0 for none
+        seed (int): Seed of the surrogates
+    Returns:
+        (correlations, summary): dataframe of the correlations, indexed by
+        Lag with one column per source, and dataframe indexed by source of
+        the peak_lag and peak_r of the largest absolute correlation and its
+        p_value (NaN without surrogates); the correlations of a constant
+        series, after transform, are NaN
+    Raises:
+        ValueError if reference is not in frames, if there is no other
+        source, or if an argument is invalid
+    """
+    if reference not in frames:
+        raise ValueError("No reference {!r} in the frames".format(reference))
+    names = [name for name in frames if name != reference]
+    if not names:
+        raise ValueError("No source to correlate with " + reference)
+    ordered = OrderedDict((name, frames[name])
+                          for name in [reference] + names)
+    _, values = align.align_frames(ordered, join='outer', freq=freq)
+    covered = np.flatnonzero(~np.isnan(values[:, 0]))
+    if not len(covered):
+        raise ValueError("No values of " + reference)
+    values = values[covered[0]:covered[-1] + 1]
+
+    lags, r = cross_correlation(values[:, 0], values[:, 1:], max_lag,
+                                transform)
+    correlations = pd.DataFrame(r, index=pd.Index(lags, name='Lag'),
+                                columns=names)
+    peaks = np.argmax(np.where(np.isnan(r), -1.0, np.abs(r)), axis=0)
+    summary = pd.DataFrame({'peak_lag': lags[peaks],
+                            'peak_r': r[peaks, np.arange(len(names))],
+                            'p_value': np.nan}, index=names,
+                           columns=['peak_lag', 'peak_r', 'p_value'])
+    if n_surrogates:
+        summary['p_value'] = surrogate_test(
+            values[:, 0], values[:, 1:], max_lag, transform, n_surrogates,
+            seed=seed)[0]
+    return correlations, summary
+
+
+def _pair(x, y, pairwise):
+    """Returns x and y as float 2-D arrays of paired columns, and whether
+    both were 1-D."""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if x.ndim not in (1, 2) or y.ndim not in (1, 2):
+        raise ValueError("Expected 1-D or 2-D series")
+    if len(x) != len(y):
+        raise ValueError("x and y must have the same number of rows, not "
+                         "{} and {}".format(len(x), len(y)))
+    flat = x.ndim == 1 and y.ndim == 1 and not pairwise
+    x, y = x.reshape(len(x), -1), y.reshape(len(y), -1)
+    if not pairwise and x.shape[1] != y.shape[1]:
+        if x.shape[1] == 1:
+            x = np.repeat(x, y.shape[1], axis=1)
+        elif y.shape[1] == 1:
+            y = np.repeat(y, x.shape[1], axis=1)
+        else:
+            raise ValueError("x and y must have the same number of columns, "
+                             "or one column, not {} and {}".format(
+                                 x.shape[1], y.shape[1]))
+    return x, y, flat
+
+
+def _prepare(data, transform):
+    """Returns the transformed columns of data less their mean, with the
+    missing values set to 0."""
+    if transform not in TRANSFORMS:
+        raise ValueError("Invalid transform {!r}, expected one of {}"
+                         .format(transform, TRANSFORMS))
+    if transform == 'difference':
+        data = data[1:] - data[:-1]
+    valid = ~np.isnan(data)
+    counts = np.maximum(valid.sum(axis=0), 1)
+    data = np.where(valid, data, 0.0)
+    data = np.where(valid, data - data.sum(axis=0) / counts, 0.0)
+    if transform == 'detrend':
+        # least-squares slope of each column over its valid rows
+        rows = np.where(valid, np.arange(len(data))[:, None], 0.0)
+        rows = np.where(valid, rows - rows.sum(axis=0) / counts, 0.0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            slopes = (rows * data).sum(axis=0) / (rows ** 2).sum(axis=0)
+        data = data - rows * np.nan_to_num(slopes)
+    return data
+
+
+def _check_lag(max_lag, n_rows):
+    """Returns max_lag, n_rows - 1 if None, checked against n_rows."""
+    if n_rows < 2:
+        raise ValueError("At least 2 rows are needed, not {}".format(n_rows))
+    if max_lag is None:
+        return n_rows - 1
+    if int(max_lag) != max_lag or not 0 <= max_lag < n_rows:
+        raise ValueError("Invalid max_lag {!r}, expected an integer from 0 "
+                         "to {}".format(max_lag, n_rows - 1))
+    return int(max_lag)
+
+
+def _fft_size(n):
+    """Smallest power of 2 of at least n."""
+    return 1 << int(n - 1).bit_length()
+
+
+def _lagged(circular, max_lag):
+    """Rows of the lags -max_lag to max_lag of a circular correlation."""
+    if max_lag == 0:
+        return circular[:1]
+    return np.concatenate([circular[-max_lag:], circular[:max_lag + 1]])
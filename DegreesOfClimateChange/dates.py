@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""dates builds and converts the Date column shared by all grab functions.
+
+Every grab function returns a Date column in one of three forms, chosen with
+its date_format argument:
+
+    'string'    "YYYY-M-01" text for monthly data and "YYYY-01-01" for yearly
+                data, as the grab functions have always returned (default)
+    'datetime'  numpy datetime64 values at the first day of the period
+    'period'    Pandas monthly ('M') or yearly periods
+
+The typed forms are built directly from the integer years and months, and
+the plot functions accept all three forms, so a typed Date column is never
+formatted into text or parsed back.
+
+Syntax
+from DegreesOfClimateChange import dates
+dates.make_dates(years, months, 'datetime')  --> Date column
+dates.to_datetime(df['Date'])                --> datetime64 Series
+dates.to_plot_dates(df['Date'])              --> matplotlib date numbers
+dates.month_numbers(df['Date'])              --> months since 1970, valid
+"""
+
+import numpy as np
+import pandas as pd
+
+
+DATE_FORMATS = ('string', 'datetime', 'period')
+
+
+def _annual_freq():
+    """Pandas name of the yearly period frequency ('Y', formerly 'A')."""
+    try:
+        pd.Period('2000', freq='Y')
+        return 'Y'
+    except ValueError:
+        return 'A'
+
+
+ANNUAL = _annual_freq()
+MONTHLY = 'M'
+
+
+def check_format(date_format):
+    """Raises ValueError unless date_format is one of DATE_FORMATS."""
+    if date_format not in DATE_FORMATS:
+        raise ValueError("Invalid date_format {!r}, expected one of {}"
+                         .format(date_format, DATE_FORMATS))
+
+
+def make_dates(year, month=None, date_format='string'):
+    """Builds a Date column from integer years and months.
+
+    Args:
+        year (array like): Years of the rows
+        month (array like): Months (1-12) of the rows; None for yearly data
+        date_format (str): One of DATE_FORMATS
+    Returns:
+        numpy array of strings, datetime64 values or Pandas periods
+    """
+    check_format(date_format)
+    year = np.asarray(year, dtype=np.int64)
+    if date_format == 'string':
+        years = year.astype(str).astype(object)
+        if month is None:
+            return years + '-01-01'
+        months = np.asarray(month, dtype=np.int64).astype(str).astype(object)
+        return years + '-' + months + '-01'
+
+    months = (np.ones_like(year) if month is None
+              else np.asarray(month, dtype=np.int64))
+    # months since 1970-01 as datetime64[M], then to the first day
+    stamps = ((year - 1970) * 12 + months - 1).astype('datetime64[M]')
+    values = stamps.astype('datetime64[ns]')
+    if date_format == 'datetime':
+        return values
+    freq = ANNUAL if month is None else MONTHLY
+    return pd.Series(values).dt.to_period(freq).values
+
+
+def to_datetime(dates):
+    """Returns the Date column as a datetime64 Series.
+
+    Typed columns are converted without any text parsing; strings are
+    parsed once, vectorized.
+    """
+    dates = pd.Series(dates)
+    if str(dates.dtype).startswith('period'):
+        return dates.dt.to_timestamp()
+    if pd.api.types.is_datetime64_any_dtype(dates.dtype):
+        return dates
+    return pd.to_datetime(dates)
+
+
+def month_numbers(dates):
+    """Returns the months since January 1970 of a Date column of any form.
+
+    Monthly and yearly periods are converted from their ordinals, datetime64
+    values without any parsing, and strings are parsed once with the format
+    of make_dates.
+
+    Returns:
+        (months, valid): int64 array of the months, and the boolean mask of
+        the valid dates (the months of invalid dates are meaningless)
+    """
+    dates = pd.Series(dates)
+    if str(dates.dtype).startswith('period'):
+        index = pd.PeriodIndex(dates)
+        # the ordinals of monthly and yearly periods count from 1970
+        if index.freqstr[0] in 'MAY':
+            valid = ~np.asarray(index.isna())
+            months = index.asi8 * (1 if index.freqstr[0] == 'M' else 12)
+            return np.where(valid, months, 0), valid
+    if str(dates.dtype).startswith('period') or \
+            pd.api.types.is_datetime64_any_dtype(dates.dtype):
+        stamps = to_datetime(dates)
+    else:
+        try:
+            stamps = pd.to_datetime(dates, format='%Y-%m-%d')
+        except (TypeError, ValueError):
+            stamps = pd.to_datetime(dates, errors='coerce')
+    stamps = stamps.values.astype('datetime64[ns]')
+    valid = ~np.isnat(stamps)
+    months = stamps.astype('datetime64[M]').astype(np.int64)
+    return np.where(valid, months, 0), valid
+
+
+def convert_dates(dates, date_format, annual=False):
+    """Converts a Date column of any form to date_format.
+
+    Args:
+        dates (array like): Date column as strings, datetime64 or periods
+        date_format (str): One of DATE_FORMATS
+        annual (bool): True for yearly data ("YYYY-01-01" strings and
+                       yearly periods)
+    """
+    check_format(date_format)
+    stamps = to_datetime(dates)
+    years = stamps.dt.year.values
+    months = None if annual else stamps.dt.month.values
+    return make_dates(years, months, date_format)
+
+
+def to_plot_dates(dates):
+    """Returns the Date column as matplotlib date numbers (floats)."""
+    import matplotlib.dates
+    return matplotlib.dates.date2num(to_datetime(dates))
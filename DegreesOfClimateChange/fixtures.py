@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""fixtures builds synthetic copies of the upstream files.
+
+This python module builds files in the formats published by NOAA, Berkeley
+Earth, the Scripps Institution of Oceanography and the World Bank climate API,
+and saves them as replay fixtures (see the replay module) for the real
+upstream urls. The unit tests and the benchmarks module serve them to the
+grab functions, so that both run without any network access and in the same
+code paths as a live download.
+
+Syntax
+from DegreesOfClimateChange import fixtures, replay
+with replay.replaying(fixtures.fixture_directory()):
+    df_noaa = grab_noaa.grab_noaa()          --> synthetic NOAA data
+fixtures.build_fixtures('fixtures/')         --> saves them to a folder
+fixtures.berkeley_text(36)                   --> body of one upstream file
+"""
+
+import atexit
+import datetime
+import json
+import shutil
+import tempfile
+import threading
+
+from . import grab_berkeley
+from . import grab_co2_scripps
+from . import grab_noaa
+from . import reference_data
+from . import replay
+
+
+def noaa_month_csv(imonth, start_year, end_year):
+    """Returns a NOAA style monthly time series file body."""
+    lines = ["Global Land and Ocean Temperature Anomalies, Month " +
+             str(imonth),
+             "Units: Degrees Celsius",
+             "Base Period: 1901-2000",
+             "Missing: -999",
+             "Year,Value"]
+    for year in range(start_year, end_year + 1):
+        lines.append("{},{:.2f}".format(year, (year - 1950) / 100 +
+                                        imonth / 1000))
+    return "\n".join(lines) + "\n"
+
+
+def berkeley_text(n_months, note="generated", header_lines=34):
+    """Returns a Berkeley Earth style file with n_months of data lines."""
+    lines = ["% Berkeley Earth stand-in, " + note]
+    lines += ["% header line {}".format(k) for k in range(2, header_lines)]
+    lines.append("%")
+    for k in range(n_months):
+        year, month = 1750 + k // 12, k % 12 + 1
+        values = ["{:.3f}".format((k % 17) / 10 - 0.8)] * 10
+        lines.append("  {}    {:2d}  ".format(year, month) + "  ".join(values))
+    return "\n".join(lines) + "\n"
+
+
+def station_csv(rows, n_notes=3):
+    """Scripps style monthly station file with a quoted description, the
+    three line column header and one line per (year, month, co2) row"""
+    lines = ['"' + '-' * 40 + '"']
+    lines += ['" note {} about the station"'.format(k) for k in range(n_notes)]
+    lines += ['"' + '-' * 40 + '"',
+              '  Yr, Mn,    Date,      Date,     CO2,seasonally',
+              '    ,   ,   Excel,          ,        , adjusted',
+              '    ,   ,        ,          ,   [ppm],     [ppm]']
+    for year, month, co2 in rows:
+        lines.append('  {}, {:02d},  30000,  {}.04,  {},  {}'.format(
+            year, month, year, co2, co2))
+    return '\n'.join(lines) + '\n'
+
+
+def climate_api_json(offset):
+    """Climate API style yearly temperatures of one country, 1901-2012"""
+    return json.dumps([{"year": year, "data": 10.0 + offset + year / 1e4}
+                       for year in range(1901, 2013)])
+
+
+def _save(store, url, body, content_type="text/plain"):
+    store.save("GET", url, 200, {"Content-Type": content_type},
+               body.encode("utf-8"))
+
+
+def build_fixtures(directory):
+    """Saves the synthetic response of every upstream url into directory."""
+    store = replay.FixtureStore(directory)
+    today = datetime.date.today()
+
+    # NOAA: one file per calendar month, complete up to last month
+    for imonth in range(1, 13):
+        end_year = today.year if imonth < today.month else today.year - 1
+        _save(store, "{}{}/1880-{}.csv".format(grab_noaa.BASE_URL, imonth,
+                                               today.year),
+              noaa_month_csv(imonth, 1880, end_year))
+
+    # Berkeley Earth: monthly anomalies from 1750 to 2017
+    _save(store, grab_berkeley.BERKELEY_URL, berkeley_text(268 * 12))
+
+    # Scripps: every station from 1958 to 2017, with a missing month
+    for k, (_, url) in enumerate(grab_co2_scripps.STATION_URLS):
+        rows = [(year, month, 315.0 + 1.5 * (year - 1958) + k / 10.0)
+                for year in range(1958, 2018) for month in range(1, 13)]
+        rows[5 + k] = rows[5 + k][:2] + (-99.99,)
+        _save(store, url, station_csv(rows))
+
+    # World Bank climate API: every economy that wbpy knows
+    import wbpy
+    base_url = wbpy.ClimateAPI.BASE_URL + "v1/country/cru/tas/year/"
+    registry = reference_data.get_registry()
+    for offset, code in enumerate(registry.codes):
+        try:
+            alpha3 = wbpy.utils.convert_country_code(registry.iso3(code),
+                                                     "alpha3")
+        except Exception:
+            continue  # wbpy rejects it before any request
+        _save(store, base_url + str(alpha3),
+              climate_api_json(offset % 20), "application/json")
+
+
+_directory = None
+_directory_lock = threading.Lock()
+
+
+def fixture_directory():
+    """Returns the folder of the synthetic fixtures, built on first use and
+    removed when the process exits."""
+    global _directory
+    with _directory_lock:
+        if _directory is None:
+            directory = tempfile.mkdtemp(prefix="docc-fixtures-")
+            build_fixtures(directory)
+            atexit.register(shutil.rmtree, directory, True)
+            _directory = directory
+    return _directory
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""frame_builder accumulates ingested data column by column.
+
+This python module contains the FrameBuilder class that the grab functions
+use to collect parsed values before creating their Pandas DataFrame. Growing
+a DataFrame one row at a time (df.loc[count] = [...] or DataFrame.append in a
+loop) copies the whole frame on every insert, so the cost grows with the
+square of the number of rows. FrameBuilder instead keeps one Python list per
+column, extends the lists with whole blocks of values, and creates the
+DataFrame a single time at the end.
+
+Syntax
+from DegreesOfClimateChange.frame_builder import FrameBuilder
+builder = FrameBuilder(['Country', 'Date', 'Tabsolute_C'])
+builder.extend(Country='Chad', Date=[1901, 1902],
+               Tabsolute_C=[26.5, 26.9])             --> a block of rows
+df = builder.build()
+"""
+
+import itertools
+
+import numpy as np
+import pandas as pd
+
+
+class FrameBuilder(object):
+    """Collects values per column and builds a DataFrame once.
+
+    Args:
+        columns (list): Names of the columns, in output order
+        dtypes (dict): Optional {column: dtype} applied when building
+    """
+
+    def __init__(self, columns, dtypes=None):
+        self.columns = list(columns)
+        self.dtypes = dict(dtypes or {})
+        self._data = {column: [] for column in self.columns}
+        self._n_rows = 0
+
+    def __len__(self):
+        return self._n_rows
+
+    def extend(self, **columns):
+        """Adds a block of rows given as one sequence per column.
+
+        A scalar value is repeated for every row of the block. All sequences
+        must have the same length and every column must be given.
+        """
+        if set(columns) != set(self.columns):
+            raise ValueError("Expected columns {}, got {}".format(
+                self.columns, sorted(columns)))
+        lengths = set(len(value) for value in columns.values()
+                      if not np.isscalar(value))
+        if len(lengths) > 1:
+            raise ValueError("All columns must have the same length")
+        n_new = lengths.pop() if lengths else 1
+        for column in self.columns:
+            value = columns[column]
+            if np.isscalar(value):
+                self._data[column].extend(itertools.repeat(value, n_new))
+            else:
+                self._data[column].extend(value)
+        self._n_rows += n_new
+
+    def build(self):
+        """Returns the accumulated values as a single Pandas DataFrame."""
+        data = {}
+        for column in self.columns:
+            values = self._data[column]
+            if column in self.dtypes:
+                data[column] = np.asarray(values, dtype=self.dtypes[column])
+            else:
+                data[column] = values
+        return pd.DataFrame(data, columns=self.columns)
@@ -13,18 +13,64 @@ An overview of the data access available from Berkeley Earth is at:
 http://berkeleyearth.lbl.gov/auto/Global/Raw_TAVG_complete.txt
 
 The data is provided as a delimited, plain text webpage that can be easily
-read by various text interpreters. This module uses the Pandas package and
-the Pandas.read_csv function to retrieve the data into a Pandas DataFrame.
+read by various text interpreters. The file is streamed through the shared
+session and on-disk cache of the transport module straight into the
+Pandas.read_csv function. The description at the top of the file is found
+by its leading '%' characters rather than by a fixed line count, and only the
+year, month and monthly anomaly columns are parsed, with explicit dtypes.
+With smoothed=True the moving averages published in the file (annual, five,
+ten and twenty year anomalies, see SMOOTHED_COLUMNS) are kept as well, for
+example to cross-check the rolling module.
+iter_berkeley yields the same data in blocks of rows, so that the larger
+Berkeley Earth land and regional files can be processed without holding them
+in memory. agrab_berkeley downloads and parses the file for asyncio
+applications.
+
+The file is mostly extended by a few months at its end, so
+grab_berkeley(incremental=True) keeps the last parsed result in a local
+snapshot and on refresh downloads only the new tail of the file. A HEAD
+request compares the size and validators (ETag, Last-Modified) of the file
+with those of the snapshot, and an unchanged file costs no download. If the
+file has grown, the bytes from OVERLAP_BYTES before the end of the snapshot
+to the new end and the description at the top of the file are downloaded
+with byte range requests, and both must hash to those of the snapshot; the
+description records the date of each analysis, so it changes whenever
+Berkeley Earth re-homogenizes past months. Any mismatch, a file that did not
+grow, or a server that ignores range requests leads to a full download,
+compared by hash with the whole file of the snapshot.
 
 Written by Abhishek Anand
 2018
 """
 
 
+import asyncio
+import hashlib
+import io
+import json
+import os
+import numpy as np
 import pandas as pd
 
+from . import dates
+from . import http_cache
+from . import instrument
+from . import transport
+from . import validation
+
+
+BERKELEY_URL = ("http://berkeleyearth.lbl.gov/auto/Global/" +
+                "Complete_TAVG_complete.txt")
+COMMENT = '%'  # first character of the description lines
+OVERLAP_BYTES = 1024  # bytes of the snapshot re-downloaded to detect edits
+SNAPSHOT_SCHEMA = 4  # header and overlap hashes since 4
+# centered moving averages published in the file, by column position
+SMOOTHED_COLUMNS = [(4, 'Tanomaly_1y_C'), (6, 'Tanomaly_5y_C'),
+                    (8, 'Tanomaly_10y_C'), (10, 'Tanomaly_20y_C')]
+
 
-def grab_berkeley():
+def grab_berkeley(incremental=False, snapshot_dir=None, date_format='string',
+                  smoothed=False, validate='report'):
     """
     Returns a dataframe of (Date, Tanomaly_C) tuples with data
     from the Berkeley Earth.
@@ -33,10 +79,26 @@ def grab_berkeley():
             Estimated Jan 1951-Dec 1980 absolute temperature (C): 8.64
 
     Args:
-        None
+        incremental (bool): Refresh a local snapshot by downloading only the
+                            new end of the file (see refresh_berkeley)
+        snapshot_dir (str): Folder of the snapshot when incremental;
+                            defaults to a berkeley folder in the cache root
+        date_format (str): Form of the Date column, 'string' (default),
+                           'datetime' or 'period' (monthly periods), see the
+                           dates module
+        smoothed (bool): Also return the published moving averages, in the
+                         columns of SMOOTHED_COLUMNS; not available with
+                         incremental, whose snapshot only keeps the monthly
+                         anomalies
+        validate (str): What a failed check of the dataframe does,
+                        'report' (default), 'raise' or 'off', see the
+                        validation module
     Returns:
         pandas dataframe: Dataframe pointing to the temperature measurement
                           on monthly basis
+    Raises:
+        ValueError if both incremental and smoothed are set
+        ValidationError if the dataframe fails the checks of validate
     Examples:
         >>> df_Berekely = grab_berkeley()
         >>>  print(df_Berekely.head())
@@ -47,19 +109,333 @@ def grab_berkeley():
             3  1750-4-01       0.382
             4  1750-5-01         NaN
     """
-    url = "http://berkeleyearth.lbl.gov/auto/Global/Complete_TAVG_complete.txt"
-    df_berkeley = pd.read_csv(url, delim_whitespace=True, index_col=None,
-                              skiprows=34, header=None, lineterminator='\n')
-    df_berkeley.columns = ['Year', 'Month', 'Monthly Anomaly',
-                           'Annual Anomaly', 'Five-year Anomaly',
-                           'Ten-year Anomaly', 'Twenty-year Anomaly',
-                           '8', '9', '10', '11', '12']
-    df_berkeley.drop(df_berkeley.columns[[3, 4, 5, 6, 7, 8, 9, 10, 11]],
-                     axis=1, inplace=True)
-    # clean up dataframe
-    df_berkeley["Date"] = (df_berkeley["Year"].astype("str") + "-" +
-                           df_berkeley["Month"].astype("str") + "-01")
-    df_berkeley["Tanomaly_C"] = df_berkeley["Monthly Anomaly"]
-    df_berkeley.drop(df_berkeley.columns[[0, 1, 2]], axis=1, inplace=True)
+    dates.check_format(date_format)
+    validation.check_mode(validate)
+    if incremental and smoothed:
+        raise ValueError("The incremental snapshot has no smoothed columns")
+    if incremental:
+        with instrument.stage('berkeley.refresh') as st:
+            df_berkeley, _ = refresh_berkeley(snapshot_dir=snapshot_dir,
+                                              date_format=date_format)
+            st.record(rows=len(df_berkeley))
+        return _validated(df_berkeley, validate)
+    stream = transport.open_stream(BERKELEY_URL)
+    try:
+        # the file is parsed while it downloads, so one stage covers both
+        with instrument.stage('berkeley.download') as st:
+            df_raw = _read_berkeley(_text_stream(stream), smoothed=smoothed)
+            st.record(bytes=stream.tell(), rows=len(df_raw))
+    finally:
+        stream.close()
+    with instrument.stage('berkeley.clean') as st:
+        df_berkeley = _finish(df_raw, date_format)
+        st.record(rows=len(df_berkeley))
+    return _validated(df_berkeley, validate)
+
+
+async def agrab_berkeley(date_format='string', executor=None, smoothed=False,
+                         validate='report'):
+    """Coroutine version of grab_berkeley, for use in asyncio applications.
+
+    The file is downloaded without blocking the event loop and parsed in
+    executor (the default executor of the loop if None). Returns the same
+    dataframe as grab_berkeley.
+    """
+    dates.check_format(date_format)
+    validation.check_mode(validate)
+    body, _ = await transport.afetch_bytes(BERKELEY_URL)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        executor, _parse_validated, body.decode('latin-1'), date_format,
+        smoothed, validate)
+
+
+def _parse_validated(text, date_format, smoothed, validate):
+    return _validated(parse_berkeley(text, date_format, smoothed), validate)
+
+
+def _validated(df_berkeley, validate):
+    """Checks the dataframe of grab_berkeley for duplicate or missing months
+    and implausible anomalies, as set by validate."""
+    validation.check(df_berkeley, 'Berkeley', 'Tanomaly_C', 'monthly',
+                     validate, valid_range=validation.ANOMALY_RANGE)
+    return df_berkeley
+
+
+def _text_stream(stream):
+    """Wraps a binary file object for the text parser."""
+    return io.TextIOWrapper(io.BufferedReader(stream), encoding='latin-1')
+
+
+def _read_berkeley(source, chunksize=None, smoothed=False):
+    """Reads the year, month and monthly anomaly columns of source, and the
+    columns of SMOOTHED_COLUMNS if smoothed.
+
+    Lines starting with COMMENT are skipped wherever they appear, and the
+    remaining columns of the file are never converted.
+    """
+    columns = [(0, 'Year'), (1, 'Month'), (2, 'Tanomaly_C')]
+    if smoothed:
+        columns += SMOOTHED_COLUMNS
+    dtypes = dict((name, np.float64) for _, name in columns)
+    dtypes.update({'Year': np.int32, 'Month': np.int32})
+    return pd.read_csv(source, sep=r'\s+', comment=COMMENT, header=None,
+                       usecols=[position for position, _ in columns],
+                       names=[name for _, name in columns],
+                       dtype=dtypes, chunksize=chunksize)
+
 
+def _finish(df_raw, date_format):
+    """Turns the parsed columns into the (Date, Tanomaly_C) dataframe,
+    followed by any smoothed columns."""
+    df_berkeley = pd.DataFrame(index=df_raw.index)
+    df_berkeley["Date"] = dates.make_dates(df_raw["Year"].values,
+                                           df_raw["Month"].values,
+                                           date_format)
+    df_berkeley["Tanomaly_C"] = df_raw["Tanomaly_C"]
+    for _, name in SMOOTHED_COLUMNS:
+        if name in df_raw.columns:
+            df_berkeley[name] = df_raw[name]
     return df_berkeley
+
+
+def parse_berkeley(source, date_format='string', smoothed=False):
+    """Parses Berkeley Earth data into the (Date, Tanomaly_C) dataframe.
+
+    Args:
+        source: Text of the file (or of complete data lines of it), or a
+                readable text file object
+        date_format (str): Form of the Date column, see the dates module
+        smoothed (bool): Also keep the columns of SMOOTHED_COLUMNS
+    """
+    if isinstance(source, str):
+        source = io.StringIO(source)
+    return _finish(_read_berkeley(source, smoothed=smoothed), date_format)
+
+
+def iter_berkeley(source=None, chunksize=100000, date_format='string',
+                  smoothed=False):
+    """Yields Berkeley Earth data as (Date, Tanomaly_C) dataframes of at
+    most chunksize rows each.
+
+    Only one block of rows is held in memory at a time. Concatenating the
+    blocks gives the same dataframe as grab_berkeley for the same file.
+
+    Args:
+        source: Url (downloaded through the transport module), path of a
+                local file, or readable text file object; defaults to the
+                global Berkeley Earth file
+        chunksize (int): Rows per yielded dataframe
+        date_format (str): Form of the Date column, see the dates module
+        smoothed (bool): Also keep the columns of SMOOTHED_COLUMNS
+    Examples:
+        >>> url = ("http://berkeleyearth.lbl.gov/auto/Regional/TAVG/Text/" +
+        ...        "global-land-TAVG-Trend.txt")
+        >>> for block in iter_berkeley(url, chunksize=1200):
+        ...     print(block["Tanomaly_C"].mean())
+    """
+    dates.check_format(date_format)
+    if source is None:
+        source = BERKELEY_URL
+    close = None
+    if isinstance(source, str) and '://' in source:
+        close = transport.open_stream(source)
+        source = _text_stream(close)
+    elif isinstance(source, str):
+        source = close = open(source, encoding='latin-1')
+    try:
+        for block in _read_berkeley(source, chunksize=chunksize,
+                                    smoothed=smoothed):
+            yield _finish(block, date_format)
+    finally:
+        if close is not None:
+            close.close()
+
+
+def _header_length(body):
+    """Returns the number of bytes of the description lines at the start
+    of body, found as the lines before the first data line."""
+    offset = 0
+    for line in io.BytesIO(body):
+        stripped = line.strip()
+        if stripped and not stripped.startswith(COMMENT.encode()):
+            break
+        offset += len(line)
+    return offset
+
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _file_meta(length, header, tail, sha256):
+    """Describes a downloaded file by its length, the length and hash of its
+    header and of its last bytes, and the hash of its whole content (None
+    when only its tail was downloaded)."""
+    return {'length': length,
+            'header_length': len(header),
+            'header_sha256': _digest(header),
+            'tail_length': len(tail),
+            'tail_sha256': _digest(tail),
+            'sha256': sha256}
+
+
+def _whole_file_meta(body):
+    return _file_meta(len(body), body[:_header_length(body)],
+                      body[-OVERLAP_BYTES:], _digest(body))
+
+
+def _validators(headers):
+    """Returns the ETag and Last-Modified response headers, which change
+    whenever the file does, as a dict without the missing ones."""
+    return dict((key, headers[key]) for key in ('ETag', 'Last-Modified')
+                if headers.get(key))
+
+
+class _Snapshot(object):
+    """Last parsed Berkeley Earth file kept on disk.
+
+    The parsed dataframe, with datetime64 dates, is pickled next to a json
+    file describing the downloaded file: its url, its validators and the
+    _file_meta of its content.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.frame_path = os.path.join(directory, 'berkeley.pkl')
+        self.meta_path = os.path.join(directory, 'berkeley.json')
+
+    def load(self, url):
+        """Returns (dataframe, meta) of the snapshot of url, or None."""
+        try:
+            with open(self.meta_path) as meta_file:
+                meta = json.load(meta_file)
+            if (meta['url'] != url or
+                    meta.get('schema') != SNAPSHOT_SCHEMA):
+                return None
+            return pd.read_pickle(self.frame_path), meta
+        except (IOError, OSError, ValueError, KeyError):
+            return None
+
+    def save(self, url, df_berkeley, file_meta, validators):
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        df_berkeley.to_pickle(self.frame_path)
+        meta = dict(file_meta, schema=SNAPSHOT_SCHEMA, url=url,
+                    validators=validators)
+        with open(self.meta_path, 'w') as meta_file:
+            json.dump(meta, meta_file)
+
+
+def refresh_berkeley(url=None, snapshot_dir=None, date_format='string'):
+    """Brings the local Berkeley Earth snapshot up to date.
+
+    A HEAD request is made first. If the server sends validators (ETag or
+    Last-Modified) and they and the size of the file match the snapshot,
+    the snapshot is returned without any download. If the file has grown,
+    the bytes from OVERLAP_BYTES before the end of the snapshot to the new
+    end are downloaded with a range request, and the header with another;
+    when both hash to those of the snapshot only the appended lines are
+    parsed and added to the snapshot. Otherwise the whole file is
+    downloaded and, if its first bytes hash to the whole file of the
+    snapshot, still only the appended lines are parsed. Any other change,
+    such as revised older months of the same length, leads to a full parse.
+
+    Args:
+        url (str): Address of the file; defaults to BERKELEY_URL
+        snapshot_dir (str): Folder of the snapshot; defaults to
+                            <cache root>/berkeley
+        date_format (str): Form of the Date column of the returned
+                           dataframe, see the dates module
+    Returns:
+        (dataframe, mode) tuple where mode tells how the snapshot was
+        refreshed: 'unchanged', 'tail' or 'full'
+    """
+    dates.check_format(date_format)
+    if url is None:
+        url = BERKELEY_URL
+    if snapshot_dir is None:
+        snapshot_dir = os.path.join(http_cache.cache_root(), 'berkeley')
+    snapshot = _Snapshot(snapshot_dir)
+    saved = snapshot.load(url)
+    headers = transport.fetch_head(url)
+    validators = _validators(headers)
+    length = headers.get('Content-Length')
+    length = int(length) if length is not None else None
+    if (saved is not None and validators and
+            validators == saved[1]['validators'] and
+            length == saved[1]['length']):
+        df_berkeley, mode = saved[0], 'unchanged'
+    else:
+        refreshed, body = None, None
+        if (saved is not None and length is not None and
+                length > saved[1]['length']):
+            refreshed, body = _refresh_tail(url, *saved)
+        if refreshed is None:
+            if body is None:
+                # revalidating any cached copy of the file
+                body, _ = transport.fetch_bytes(url, ttl=0)
+            if saved is not None:
+                refreshed = _merge_tail(body, *saved)
+            if refreshed is None:
+                refreshed = parse_berkeley(body.decode('latin-1'),
+                                           'datetime'), 'full'
+            refreshed += (_whole_file_meta(body),)
+        df_berkeley, mode, file_meta = refreshed
+        snapshot.save(url, df_berkeley, file_meta, validators)
+
+    if date_format != 'datetime':
+        df_berkeley = df_berkeley.copy()
+        df_berkeley['Date'] = dates.convert_dates(df_berkeley['Date'],
+                                                  date_format)
+    return df_berkeley, mode
+
+
+def _refresh_tail(url, df_old, meta):
+    """Downloads the new end of the file and its header with range requests.
+
+    Returns:
+        (refreshed, body) tuple. refreshed is (dataframe, 'tail', file meta)
+        if the overlapping bytes and the header hash to those of the
+        snapshot, else None. body is the whole file if the server ignored
+        the range request, else None.
+    """
+    start = meta['length'] - meta['tail_length']
+    status, new_bytes = transport.fetch_range(url, start)
+    if status != 206:
+        return None, new_bytes
+    overlap = new_bytes[:meta['tail_length']]
+    appended = new_bytes[meta['tail_length']:]
+    # only complete lines are appended
+    if (_digest(overlap) != meta['tail_sha256'] or
+            not overlap.endswith(b'\n') or not appended.endswith(b'\n') or
+            not meta['header_length']):
+        return None, None
+    status, header = transport.fetch_range(url, 0, meta['header_length'] - 1)
+    if status != 206 or _digest(header) != meta['header_sha256']:
+        return None, None
+    df_new = parse_berkeley(appended.decode('latin-1'), 'datetime')
+    # the hash of the whole file is unknown without downloading it
+    file_meta = _file_meta(start + len(new_bytes), header,
+                           new_bytes[-OVERLAP_BYTES:], None)
+    return (pd.concat([df_old, df_new], ignore_index=True), 'tail',
+            file_meta), None
+
+
+def _merge_tail(body, df_old, meta):
+    """Returns (dataframe, mode) with the lines appended to the file of the
+    snapshot parsed and merged, or None if the file of the snapshot is not
+    the start of body, or its hash is unknown, and a full parse is
+    needed."""
+    length = meta['length']
+    if (meta['sha256'] is None or len(body) < length or
+            _digest(body[:length]) != meta['sha256']):
+        return None
+    appended = body[length:]
+    if not appended:
+        return df_old, 'unchanged'
+    # only complete lines are appended
+    if not body[:length].endswith(b'\n') or not appended.endswith(b'\n'):
+        return None
+    df_new = parse_berkeley(appended.decode('latin-1'), 'datetime')
+    return pd.concat([df_old, df_new], ignore_index=True), 'tail'
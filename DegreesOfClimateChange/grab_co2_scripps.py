@@ -28,31 +28,114 @@ Usage:
 
     function usage is then simple:
     >>> df = grab_co2_scripps()
+    >>> df, df_stations = grab_scripps_co2_data(by_station=True)
+
+The five station files are downloaded concurrently through the transport
+module. The column header of each file is found as the lines before the
+first line starting with a year, and the rows are cleaned with vectorized
+masks: non-numeric values and the -99.99 missing value mnemonic are dropped.
+agrab_scripps_co2_data is the same for asyncio applications.
 
 Output:
     Relation/Dataframe -> R(Date, CO2 (ppm)),
     where 'CO2 (ppm)' is the average CO2 measurement averaged across the sampling
            stations defined above
+    and with by_station=True also the long format relation
+    R(Date, Location, CO2 (ppm)) of the monthly values of each station
 
 Dependencies:
     pandas
+    requests (through the transport module, which caches the station files)
 
 Written by Rahul Birmiwal
 2018
 """
 
+import asyncio
+import io
+import numpy as np
 import pandas as pd
 
+from . import dates
+from . import instrument
+from . import transport
+from . import validation
+
+
+STATION_URLS = [
+    ('Alert_CAN', 'http://scrippsco2.ucsd.edu/assets/data/atmospheric/stations/flask_co2/monthly/monthly_flask_co2_alt.csv'),
+    ('LaJolla_USA', 'http://scrippsco2.ucsd.edu/assets/data/atmospheric/stations/flask_co2/monthly/monthly_flask_co2_ljo.csv'),
+    ('ChristmasIsland_AUS', 'http://scrippsco2.ucsd.edu/assets/data/atmospheric/stations/flask_isotopic/monthly/monthly_flask_c13_chr.csv'),
+    ('AmericanSamoa_ASM', 'http://scrippsco2.ucsd.edu/assets/data/atmospheric/stations/flask_co2/monthly/monthly_flask_co2_sam.csv'),
+    ('SouthPole_ANT', 'http://scrippsco2.ucsd.edu/assets/data/atmospheric/stations/merged_in_situ_and_flask/monthly/monthly_merge_co2_spo.csv')]
+MISSING = -99.99  # Scripps mnemonic for a missing value
+MAX_WORKERS = len(STATION_URLS)
+
+
+def _header_length(text):
+    """Returns the number of lines before the first data line of a station
+    file, i.e. the first line whose first field is a year."""
+    n_lines = 0
+    for line in io.StringIO(text):
+        if line.split(',', 1)[0].strip().isdigit():
+            break
+        n_lines += 1
+    return n_lines
 
-def grab_scripps_co2_data():
+
+def parse_station(text):
+    """Parses a Scripps monthly station file.
+
+    Args:
+        text (str): Contents of the station csv file
+    Returns:
+        pandas dataframe with columns Year (int), Month (int) and CO2
+        (float, ppm), without non-numeric or missing (-99.99) rows
+    """
+    return clean_station(read_station(text))
+
+
+def read_station(text):
+    """Reads the year, month and CO2 columns of a station file as text."""
+    return pd.read_csv(io.StringIO(text), skiprows=_header_length(text),
+                       comment='"', header=None, usecols=[0, 1, 4],
+                       names=['Year', 'Month', 'CO2'], dtype=str)
+
+
+def clean_station(raw):
+    """Converts the columns read by read_station to numbers and drops the
+    non-numeric and missing (-99.99) rows."""
+    values = raw.apply(lambda column: pd.to_numeric(column.str.strip(),
+                                                    errors='coerce'))
+    valid = (values.notnull().all(axis=1).values &
+             (values['CO2'] != MISSING).values &
+             (values['Year'] != MISSING).values)
+    values = values[valid]
+    return pd.DataFrame({'Year': values['Year'].values.astype(np.int64),
+                         'Month': values['Month'].values.astype(np.int64),
+                         'CO2': values['CO2'].values.astype(np.float64)},
+                        columns=['Year', 'Month', 'CO2'])
+
+
+def grab_scripps_co2_data(date_format='string', by_station=False,
+                          max_workers=MAX_WORKERS, validate='report'):
     """Returns a dataframe of (Year, Mean CO2 Level (ppm)) tuples with data
        from the Scripps Institute sampling stations.
        Note: Scripps uses the mnemonic '-99.99' to represent missing data!!
 
     Args:
-        None
+        date_format (str): Form of the Date column, 'string' (default),
+                           'datetime' or 'period' (yearly periods), see the
+                           dates module
+        by_station (bool): Also return the monthly values of every station
+        max_workers (int): Number of station files downloaded at once
+        validate (str): What a failed check of the dataframe does,
+                        'report' (default), 'raise' or 'off', see the
+                        validation module
     Returns:
         pandas dataframe: Dataframe pointing to the CO2 measurement per annum
+        and, if by_station, a second dataframe with the columns Date
+        (monthly), Location and CO2 holding the values of each station
     Examples:
         >>> df = grab_co2_scripps()
         >>> print(df.head())
@@ -64,45 +147,82 @@ def grab_scripps_co2_data():
         4   1961-01-01  317.387500
         5   1962-01-01  317.364444
     """
-    # url links to data
-    links = ['http://scrippsco2.ucsd.edu/assets/data/atmospheric/stations/flask_co2/monthly/monthly_flask_co2_alt.csv',
-            'http://scrippsco2.ucsd.edu/assets/data/atmospheric/stations/flask_co2/monthly/monthly_flask_co2_ljo.csv',
-            'http://scrippsco2.ucsd.edu/assets/data/atmospheric/stations/flask_isotopic/monthly/monthly_flask_c13_chr.csv',
-            'http://scrippsco2.ucsd.edu/assets/data/atmospheric/stations/flask_co2/monthly/monthly_flask_co2_sam.csv',
-            'http://scrippsco2.ucsd.edu/assets/data/atmospheric/stations/merged_in_situ_and_flask/monthly/monthly_merge_co2_spo.csv']
-
-    # labels
-    locations = ['Alert_CAN', 'LaJolla_USA', 'ChristmasIsland_AUS', 'AmericanSamoa_ASM', 'SouthPole_ANT']
-
-    # dataframe to store results
-    master_df = pd.DataFrame(dtype=float)
-    count = 0
-    for link in links:
-        station_df = pd.read_csv(link,comment='"', delimiter=",", header=None) #read in a dataframe for _this_ station
-
-        #Add column denoting _this_ substation location
-        station_df['Location'] = locations[count]
-        count += 1
-
-        #only get the columns we care about...
-        station_df = station_df.iloc[:, [0, 4, 10]]
-        master_df = master_df.append(station_df)
-
-    master_df = master_df.iloc[5:] #get rid of garbage at the top of the frame
-    master_df.columns = ['Date', 'CO2', 'Location'] #rename columns
-    master_df = master_df[master_df.Date.apply(lambda x: x.isnumeric())] #get rid of non-numeric Dates
-    master_df['Date'] = pd.to_numeric(master_df['Date']) #convert Date column to numeric
-    master_df['CO2'] = pd.to_numeric(master_df['CO2']) #convert CO2 col to numeric
-    master_df = master_df[master_df.CO2 != -99.99] #remove missing values
-    master_df = master_df[master_df.Date != -99.99] #remove missing values
-
-    # Average by year across all locations
-    master_df = master_df.groupby('Date').mean()
-    master_df = master_df.reset_index() #convert dataframe back to two columns
-
-    ### Convert DATE columns to yyyy-mm-dd format!
-    master_df['Date'] = master_df['Date'].astype(str) + '-01-01'
-    return master_df
+    dates.check_format(date_format)
+    validation.check_mode(validate)
+    links = [link for _, link in STATION_URLS]
+    with instrument.stage('scripps.download') as st:
+        responses = transport.fetch_many(links, max_workers=max_workers)
+        st.record(bytes=sum(len(text) for text, _ in responses))
+    return _frames_from_texts([text for text, _ in responses], date_format,
+                              by_station, validate)
+
+
+async def agrab_scripps_co2_data(date_format='string', by_station=False,
+                                 limit=MAX_WORKERS, executor=None,
+                                 validate='report'):
+    """Coroutine version of grab_scripps_co2_data, for use in asyncio
+    applications.
+
+    The station files are downloaded without blocking the event loop, at
+    most limit at a time, and parsed in executor (the default executor of
+    the loop if None). Returns the same dataframes as grab_scripps_co2_data.
+    """
+    dates.check_format(date_format)
+    validation.check_mode(validate)
+    responses = await transport.afetch_many(
+        [link for _, link in STATION_URLS], limit=limit)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        executor, _frames_from_texts, [text for text, _ in responses],
+        date_format, by_station, validate)
+
+
+def _frames_from_texts(texts, date_format, by_station, validate='report'):
+    """Parses, cleans and averages the station files, in the order of
+    STATION_URLS."""
+    with instrument.stage('scripps.parse') as st:
+        raws = [read_station(text) for text in texts]
+        st.record(rows=sum(len(raw) for raw in raws))
+
+    with instrument.stage('scripps.clean') as st:
+        station_dfs = []
+        for (location, _), raw in zip(STATION_URLS, raws):
+            station_df = clean_station(raw)
+            station_df['Location'] = location
+            station_dfs.append(station_df)
+        stations_df = pd.concat(station_dfs, ignore_index=True)
+        st.record(rows=len(stations_df))
+
+    with instrument.stage('scripps.aggregate') as st:
+        master_df = yearly_mean(stations_df, date_format)
+        st.record(rows=len(master_df))
+    # no -99.99 left over and no year without a measurement
+    validation.check(master_df, 'Scripps', 'CO2', 'yearly', validate,
+                     valid_range=validation.CO2_RANGE)
+    if not by_station:
+        return master_df
+    return master_df, station_frame(stations_df, date_format)
+
+
+def yearly_mean(stations_df, date_format='string'):
+    """Averages the CO2 values of every station and month of each year into
+    the (Date, CO2) dataframe."""
+    yearly = stations_df.groupby('Year')['CO2'].mean()
+    return pd.DataFrame({
+        'Date': dates.make_dates(yearly.index.values,
+                                 date_format=date_format),
+        'CO2': yearly.values}, columns=['Date', 'CO2'])
+
+
+def station_frame(stations_df, date_format='string'):
+    """Returns the long format (Date, Location, CO2) dataframe of the
+    monthly values of each station."""
+    return pd.DataFrame({
+        'Date': dates.make_dates(stations_df['Year'].values,
+                                 stations_df['Month'].values, date_format),
+        'Location': stations_df['Location'].values,
+        'CO2': stations_df['CO2'].values},
+        columns=['Date', 'Location', 'CO2'])
 
 if __name__ == '__main__':
     df = grab_scripps_co2_data()
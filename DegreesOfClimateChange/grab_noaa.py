@@ -8,26 +8,53 @@ is the climate data that is used to evaluate global climate change.
 Syntax
 import grab_noaa
 df_noaa = grab_noaa.grab_noaa()
+df_noaa = await grab_noaa.agrab_noaa()   --> inside a coroutine
 
 An overview of the data access available from NOAA is at:
 https://www.ncdc.noaa.gov/cag/global/time-series
 
 The data is provided as a delimited, plain text webpage that can be easily
-read by various text interpreters. This module uses the Pandas package and
-the Pandas.read_csv function to retrieve the data into a Pandas DataFrame.
+read by various text interpreters. NOAA publishes one file per calendar
+month, so the 12 files are downloaded concurrently over the shared keep-alive
+session in the transport module and then parsed with the Pandas.read_csv
+function into a single Pandas DataFrame. agrab_noaa is the same for asyncio
+applications.
 
 Written by Todd Schultz
 2018
 """
 
+import asyncio
 import datetime
+import io
 import pandas as pd
 
+from . import dates
+from . import instrument
+from . import transport
+from . import validation
 
-def grab_noaa():
+
+BASE_URL = ("https://www.ncdc.noaa.gov/cag/global/" +
+            "time-series/globe/land_ocean/1/")
+START_YEAR = 1880  # first year of the NOAA series
+HEADER_SKIP = [0, 1, 2, 3]  # description lines above the Year,Value header
+
+
+def grab_noaa(concurrent=True, max_workers=12, latencies=None,
+              date_format='string', validate='report'):
     """Retrieves global average temperatures from NOAA.
     Inputs
     None required
+    concurrent = Boolean, download the 12 monthly files in parallel (default)
+                 or one after another
+    max_workers = number of monthly files downloaded at once when concurrent
+    latencies = optional dictionary that is filled with the duration in
+                seconds of the request for each month, {month: seconds}
+    date_format = form of the Date column, 'string' (default), 'datetime'
+                  or 'period' (monthly periods), see the dates module
+    validate = what a failed check of the dataframe does, 'report'
+               (default), 'raise' or 'off', see the validation module
     Outputs
     Pandas DataFrame with 2 columns, Date and Tanomaly_C
         Date        Tanomaly_C
@@ -37,32 +64,91 @@ def grab_noaa():
     3  1880-4-01       -0.05
     4  1880-5-01       -0.07
     """
+    dates.check_format(date_format)
+    validation.check_mode(validate)
     # NOAA Global average temperature time series
-    start_year = 1880
     this_year = datetime.datetime.now().year
-    base_url = ("https://www.ncdc.noaa.gov/cag/global/" +
-                "time-series/globe/land_ocean/1/")
-    end_url = "/" + str(start_year) + "-" + str(this_year) + ".csv"
-    header_skip = [0, 1, 2, 3]
-    df_noaa = pd.DataFrame(columns=['Year', 'Value', 'Month'])
-    
-    for imonth in range(1, 13):
-        month = str(imonth)
-        noaa_url = base_url + month + end_url
-        data_df = pd.read_csv(noaa_url, skiprows=header_skip)
+    noaa_urls = month_urls(this_year)
+
+    with instrument.stage('noaa.download') as st:
+        if concurrent:
+            responses = transport.fetch_many(noaa_urls,
+                                             max_workers=max_workers)
+        else:
+            responses = [transport.fetch_text(noaa_url)
+                         for noaa_url in noaa_urls]
+        st.record(bytes=sum(len(text) for text, _ in responses))
+    if latencies is not None:
+        for imonth, (_, latency) in enumerate(responses, start=1):
+            latencies[imonth] = latency
+
+    return _frame_from_texts([text for text, _ in responses], this_year,
+                             date_format, validate)
+
+
+async def agrab_noaa(limit=12, date_format='string', executor=None,
+                     validate='report'):
+    """Coroutine version of grab_noaa, for use in asyncio applications.
+
+    The 12 monthly files are downloaded without blocking the event loop,
+    at most limit at a time, and parsed in executor (the default executor
+    of the loop if None). Returns the same dataframe as grab_noaa.
+    """
+    dates.check_format(date_format)
+    validation.check_mode(validate)
+    this_year = datetime.datetime.now().year
+    responses = await transport.afetch_many(month_urls(this_year),
+                                            limit=limit)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        executor, _frame_from_texts, [text for text, _ in responses],
+        this_year, date_format, validate)
+
+
+def _frame_from_texts(texts, this_year, date_format, validate='report'):
+    """Parses, cleans and checks the 12 monthly files."""
+    with instrument.stage('noaa.parse') as st:
+        df_noaa = parse_months(texts)
+        st.record(rows=len(df_noaa))
+
+    with instrument.stage('noaa.clean') as st:
+        df_noaa = clean_noaa(df_noaa, date_format)
+        st.record(rows=len(df_noaa))
+
+    # every month since START_YEAR up to last year; too few rows raise
+    # ValidationError unless validate is 'off'
+    validation.check(df_noaa, 'NOAA', 'Tanomaly_C', 'monthly', validate,
+                     valid_range=validation.ANOMALY_RANGE,
+                     min_rows=(this_year - START_YEAR) * 12)
+    return df_noaa
+
+
+def month_urls(this_year):
+    """Returns the urls of the 12 monthly files, January first."""
+    end_url = "/" + str(START_YEAR) + "-" + str(this_year) + ".csv"
+    return [BASE_URL + str(imonth) + end_url for imonth in range(1, 13)]
+
+
+def parse_months(texts):
+    """Parses the 12 monthly files, January first, into one dataframe with
+    the columns Year, Value and Month."""
+    # parse each month and combine them once at the end
+    month_dfs = []
+    for imonth, text in enumerate(texts, start=1):
+        data_df = pd.read_csv(io.StringIO(text), skiprows=HEADER_SKIP)
         data_df["Month"] = imonth
-        df_noaa = df_noaa.append(data_df)
-        
-    # check length of dataframe
-    assert (df_noaa.shape[0] >= (this_year - start_year)*12), \
-        "Error retrieving data, not enough rows"
-    
-    # clean up dataframe
+        month_dfs.append(data_df)
+    return pd.concat(month_dfs, ignore_index=True)
+
+
+def clean_noaa(df_noaa, date_format='string'):
+    """Turns the parsed months into the sorted (Date, Tanomaly_C)
+    dataframe."""
     df_noaa = df_noaa.sort_values(["Year", "Month"])
-    df_noaa["Date"] = (df_noaa["Year"].astype("str") + "-" +
-                       df_noaa["Month"].astype("str") + "-01")
+    df_noaa["Date"] = dates.make_dates(df_noaa["Year"].values,
+                                       df_noaa["Month"].values, date_format)
     df_noaa["Tanomaly_C"] = df_noaa["Value"]
     df_noaa = df_noaa.reset_index()
     df_noaa = df_noaa.drop(columns=["Year", "Value", "Month", "index"])
-    
+
     return df_noaa
@@ -24,23 +24,119 @@ Dependencies:
     wbpy
     numpy
     pandas
+    requests (through the transport module)
+
+All requests, including the ones made by wbpy, go through the shared session
+and on-disk cache of the transport module. The climate API data is historic
+and does not change, so it is cached for CACHE_TTL seconds (30 days).
+
+The list of countries comes from the reference table bundled with the
+package (see the reference_data module), so it needs no download. The
+countries are requested by their ISO alpha-3 codes.
+
+The climate API serves one country per request, so the countries are
+requested one per task by a bounded pool of worker threads. Failed requests
+are retried by the transport module only; a country still failing, or
+unknown to the API, is reported and left out of the global mean.
+
+agrab_worldbank is the same for asyncio applications.
 
 Written by Rahul Birmiwal
 2018
 """
 
 
-import wbpy
-import pandas as pd
-import sys
+import asyncio
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+from . import dates
+from . import instrument
+from . import reference_data
+from . import transport
+from . import validation
+from .frame_builder import FrameBuilder
 
 
 MIN_YEAR = 1901  # constant defining minimum year value in WorldBank dataset
 MAX_YEAR = 2012  # likewise maximum
+CACHE_TTL = 30 * 24 * 3600  # seconds the cached API responses are reused
+MAX_WORKERS = transport.POOL_SIZE  # climate API requests in flight at once
+
+
+def _fetch(url):
+    """Fetch function handed to wbpy so its requests use our transport."""
+    text, _ = transport.fetch_text(url, ttl=CACHE_TTL)
+    return text
+
+
+def _climate_api():
+    """Returns a wbpy.ClimateAPI whose requests go through our transport.
+
+    wbpy is imported here rather than with this module, so that it is only
+    loaded (and only required) once World Bank data is requested.
+    """
+    import wbpy
+    return wbpy.ClimateAPI(fetch=_fetch)
+
+
+def _fetch_country(climate_api, code):
+    """Requests the yearly temperatures of one country; returns
+    {year_string: temperature}."""
+    result = climate_api.get_instrumental(data_type='tas', interval='year',
+                                          locations=[code])
+    # wbpy keys as_dict() by its own region code of the location
+    return result.as_dict()[result.api_calls[0]["region"][0]]
+
+
+def _try_country(climate_api, code):
+    """Returns the data of _fetch_country, or None if the request failed
+    after the retries of the transport module."""
+    try:
+        return _fetch_country(climate_api, code)
+    except Exception:
+        return None
 
 
-def grab_worldbank(start_date=1901, end_date=2012):
+def fetch_countries(climate_api, codes, max_workers=MAX_WORKERS):
+    """Retrieves the yearly temperatures of many countries concurrently.
+
+    Args:
+        climate_api (wbpy.ClimateAPI): API interface used for the requests
+        codes (list): ISO alpha-3 country codes to request
+        max_workers (int): Number of countries requested at once
+    Returns:
+        (dataset, failed) tuple where dataset is a dictionary of
+        {code: {year_string: temperature}} and failed is the list of codes
+        for which no data could be retrieved, in the order of codes
+    """
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        results = list(executor.map(
+            lambda code: _try_country(climate_api, code), codes))
+    return _merge(codes, results)
+
+
+async def afetch_countries(climate_api, codes, limit=MAX_WORKERS):
+    """Coroutine version of fetch_countries; limit is the number of
+    countries requested at once. Returns the (dataset, failed) tuple."""
+    results = await transport.amap(
+        lambda code: _try_country(climate_api, code), codes, limit)
+    return _merge(codes, results)
+
+
+def _merge(codes, results):
+    """Splits the results of the countries into (dataset, failed)."""
+    dataset, failed = {}, []
+    for code, data in zip(codes, results):
+        if data is None:
+            failed.append(code)
+        else:
+            dataset[code] = data
+    return dataset, failed
+
+
+def grab_worldbank(start_date=1901, end_date=2012, max_workers=MAX_WORKERS,
+                   date_format='string', validate='report'):
     """Returns a dataframe of (Year, GlobalAverageTemperature) tuples with data
        from the WorldBank database.
        https://data.worldbank.org/topic/climate-change
@@ -49,6 +145,14 @@ def grab_worldbank(start_date=1901, end_date=2012):
                           Defaults to 1901
         end_date (int): End year for data retrieval; maximum 2012.
                         Defaults to 2012
+        max_workers (int): Number of climate API requests in flight at
+                           once; 1 requests the countries one at a time
+        date_format (str): Form of the Date column, 'string' (default),
+                           'datetime' or 'period' (yearly periods), see the
+                           dates module
+        validate (str): What a failed check of the dataframe does,
+                        'report' (default), 'raise' or 'off', see the
+                        validation module
     Returns:
         pandas dataframe: Dataframe pointing to the results from the worldbank
                           Columns are of type Date (yyyy-mm-dd string);
@@ -72,75 +176,147 @@ def grab_worldbank(start_date=1901, end_date=2012):
         1  2012-01-01    19.026535
 
     """
+    _check_arguments(start_date, end_date, date_format, validate)
+
+    """Instantiate API Interface using wbpy package"""
+    climate_api = _climate_api()
+
+    """Obtain the (name, ISO alpha-3 code) pairs of ALL countries in the
+       world from the bundled reference table"""
+    code_country_pairs = _country_pairs()  # i.e. [(Germany, DEU), ...]
+    codes_list = [code for _, code in code_country_pairs]
+
+    """
+        Create a 'temporary' _dataset_ of (country, year, average annual
+        temperature) triples. To do this, we will need to use the
+        climate_api.get_instrumental() wrapper function,
+        and store the wrapper results into a dictionary called _dataset_
+    """
+    with instrument.stage('worldbank.download') as st:
+        dataset, failed = fetch_countries(climate_api, codes_list,
+                                          max_workers=max_workers)
+        st.record(rows=len(dataset), failed=len(failed))
+    _missing_countries(failed)
+
+    return _aggregate(dataset, code_country_pairs, start_date, end_date,
+                      date_format, validate)
+
+
+async def agrab_worldbank(start_date=1901, end_date=2012, limit=MAX_WORKERS,
+                          date_format='string', executor=None,
+                          validate='report'):
+    """Coroutine version of grab_worldbank, for use in asyncio applications.
+
+    The climate API is requested without blocking the event loop, at most
+    limit countries at a time, and the countries are averaged in executor
+    (the default executor of the loop if None). Returns the same dataframe
+    as grab_worldbank.
+    """
+    _check_arguments(start_date, end_date, date_format, validate)
+    code_country_pairs = _country_pairs()
+    with instrument.stage('worldbank.download') as st:
+        dataset, failed = await afetch_countries(
+            _climate_api(), [code for _, code in code_country_pairs],
+            limit=limit)
+        st.record(rows=len(dataset), failed=len(failed))
+    _missing_countries(failed)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        executor, _aggregate, dataset, code_country_pairs, start_date,
+        end_date, date_format, validate)
+
+
+def _country_pairs():
+    """(name, ISO alpha-3 code) tuples of every economy of the registry.
+
+    The climate API knows the countries by their alpha-3 code, not by the
+    legacy World Bank codes of the table (ROM, ZAR, TMP, ...), which wbpy
+    would pass on unchanged.
+    """
+    registry = reference_data.get_registry()
+    return [(name, registry.iso3(code)) for name, code in registry.pairs()]
+
+
+def _missing_countries(failed):
+    """Warns about each country code of failed and returns the error
+    dictionary of {code: 1} of the countries without data."""
+    # Dictionary to store countries who do NOT HAVE DATA
+    err_dict = {}
+    for code in failed:
+        print("Warning: Data Does Not Exist for Country Code: {}".format(code))
+        # Add erroneous country to error dictionary
+        err_dict[code] = 1
+    return err_dict
+
+
+def _check_arguments(start_date, end_date, date_format, validate):
+    """Raises ValueError for years outside the dataset, a bad format or an
+    unknown validate."""
     if (start_date is not None and not isinstance(start_date, int) or
         end_date is not None and not isinstance(end_date, int)):
         raise ValueError("Error: Invalid argument type. Must be integer")
-        sys.exit(0)
     if (start_date is not None and (start_date < MIN_YEAR or start_date > MAX_YEAR)):
         raise ValueError("Error: Starting date cannot precede 1901")
-        sys.exit(0)
     if (end_date is not None and (end_date > MAX_YEAR or end_date < MIN_YEAR)):
         raise ValueError("Error: Ending date cannot exceed 2012")
-        sys.exit(0)
+    dates.check_format(date_format)
+    validation.check_mode(validate)
 
-    """Dictionary to store countries who do NOT HAVE DATA"""
-    err_dict = {}
 
-    """Instantiate API Interface using wbpy package"""
-    climate_api = wbpy.ClimateAPI()
+def _aggregate(dataset, code_country_pairs, start_date, end_date,
+               date_format, validate):
+    with instrument.stage('worldbank.aggregate') as st:
+        df_worldbank = yearly_global_mean(dataset, code_country_pairs,
+                                          start_date, end_date, date_format)
+        st.record(rows=len(df_worldbank))
+    validation.check(df_worldbank, 'WorldBank', 'Tabsolute_C', 'yearly',
+                     validate, valid_range=validation.ABSOLUTE_RANGE)
+    return df_worldbank
 
-    """Obtain ISO country codes for ALL countries in the world"""
-    iso_df = pd.read_csv('https://raw.githubusercontent.com/datasets/country-codes/master/data/country-codes.csv',
-                         delimiter=',')
-    codes_list = np.array(iso_df['ISO3166-1-Alpha-3'])  # i.e. [DEU, GHA, GIB,...]
-    country_list = np.array(iso_df['official_name_en'])  # i.e. [Germany, Ghana, Gibraltar, ...]
 
-    codes_list = list(filter(lambda v: v == v, codes_list))
-    country_list = list(filter(lambda v: v == v, country_list))
+def yearly_global_mean(dataset, code_country_pairs, start_date=MIN_YEAR,
+                       end_date=MAX_YEAR, date_format='string'):
+    """Averages the yearly country temperatures into a global time series.
 
+    Args:
+        dataset (dict): {code: {year_string: temperature}} as returned by
+                        fetch_countries
+        code_country_pairs (list): (country name, code) tuples; countries
+                                   not in dataset are skipped
+        start_date (int): First year kept
+        end_date (int): Last year kept
+        date_format (str): Form of the Date column, see the dates module
+    Returns:
+        pandas dataframe with columns Date (yyyy-01-01 string by default)
+        and Tabsolute_C (float), one row per year
     """
-        Create a 'temporary' _dataset_ of (country, year, average annual
-        temperature) triples. To do this, we will need to use the
-        climate_api.get_instrumental() wrapper function,
-        and store the wrapper results into a dictionary called _dataset_
-    """
-    code_country_pairs = [(country_list[k],codes_list[k]) for k in range(0,len(codes_list))]
-    dataset = {}
-    for k in range(0, len(code_country_pairs)):
-        code = code_country_pairs[k][1]
-        try:
-            dataset[code] = climate_api.get_instrumental(data_type='tas',
-                                             interval='year', locations=[code])
-        except Exception as e:
-            print("Warning: Data Does Not Exist for Country Code: {}".format(code))
-            # Add erroneous country to error dictionary
-            err_dict[code] = 1
-            continue
-
     """
-        Create a pandas dataframe from the dataset dictionary
-        by parsing the content of the calls to climate_api.get_instrumental(),
-        stored in dataset
+        Create a pandas dataframe from the dataset dictionary. The values
+        of each country are added to the columns of a FrameBuilder as one
+        block, and the DataFrame is created once at the end
     """
-    df = pd.DataFrame(columns=['Country', 'Date', 'Tabsolute_C'])
-    count = 0
+    if start_date is None:
+        start_date = MIN_YEAR
+    if end_date is None:
+        end_date = MAX_YEAR
+    builder = FrameBuilder(['Country', 'Date', 'Tabsolute_C'],
+                           dtypes={'Date': int, 'Tabsolute_C': float})
     # For all countries
-    for k in range(0, len(code_country_pairs)):
-        c_name, c_code = code_country_pairs[k][0], code_country_pairs[k][1]
+    for c_name, c_code in code_country_pairs:
 
         # if is a valid country
-        if (c_code not in err_dict):
+        if (c_code in dataset):
 
-            # convert the get_instrumental() content to dictionary and access 
-            # it's 'subdictionary' using the appropriate country code
-            country_data = dataset[c_code].as_dict()[c_code]
+            # {year: temperature} dictionary for this country
+            country_data = dataset[c_code]
+            years = np.array([int(year_key) for year_key in country_data.keys()])
+            temps = np.array(list(country_data.values()), dtype=float)
 
             # for all years that are in the valid time window
-            for year_key in country_data.keys():
-                if (int(year_key) >= start_date and int(year_key) <= end_date):
-                    # Append to dataframe
-                    df.loc[count] = [c_name,int(year_key), country_data[year_key]]
-                    count += 1
+            in_window = (years >= start_date) & (years <= end_date)
+            builder.extend(Country=c_name, Date=years[in_window],
+                           Tabsolute_C=temps[in_window])
+    df = builder.build()
 
     """
         At this point, df points to a relation df -> R(Country, Year,
@@ -148,12 +324,11 @@ def grab_worldbank(start_date=1901, end_date=2012):
         we compute the mean of all countries per given year, and store the
         results in a new dataframe
     """
-    print(".......computing worldwide averages across all years...hang on!!!")
-    df_worldbank = df.groupby(df['Date']).mean()
-    df_worldbank = df_worldbank.reset_index()
+    df_worldbank = df.groupby('Date', as_index=False)['Tabsolute_C'].mean()
 
-    # Convert DATE columns to yyyy-mm-dd format!
-    df_worldbank['Date'] = df['Date'].astype(str) + '-01-01'
+    # Convert the years to the requested Date form, yyyy-01-01 by default
+    df_worldbank['Date'] = dates.make_dates(df_worldbank['Date'].values,
+                                            date_format=date_format)
 
     return df_worldbank
 
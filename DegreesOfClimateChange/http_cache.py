@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+"""http_cache keeps downloaded upstream files in a persistent on-disk cache.
+
+This python module contains the HttpCache class used by the transport module
+so that every grab function reuses the files it downloaded on an earlier run.
+A cached response is served straight from disk while it is younger than its
+time-to-live (TTL). Once it is older, the transport revalidates it with the
+upstream host using the ETag and Last-Modified headers of the cached copy; a
+304 Not Modified answer is then served from the local copy without
+downloading the body again. The total size of the cache is bounded and the
+least recently used entries are evicted first.
+
+Syntax
+from DegreesOfClimateChange import http_cache
+http_cache.cache_info()   --> dictionary describing the cache contents
+http_cache.clear_cache()  --> removes every cached response
+
+The cache lives in ~/.cache/DegreesOfClimateChange/http unless the
+DOCC_CACHE_DIR environment variable points elsewhere, and it can be turned
+off by setting DOCC_HTTP_CACHE=0 or by calling http_cache.set_cache(None).
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+DEFAULT_TTL = 3600  # seconds a response is served without revalidation
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024  # size bound before LRU eviction
+
+
+def cache_root():
+    """Returns the folder holding every local cache of the package."""
+    base = os.environ.get("DOCC_CACHE_DIR")
+    if not base:
+        base = os.path.join(os.path.expanduser("~"), ".cache",
+                            "DegreesOfClimateChange")
+    return base
+
+
+def default_cache_dir():
+    """Returns the directory used by the default cache."""
+    return os.path.join(cache_root(), "http")
+
+
+class HttpCache(object):
+    """Persistent, size-bounded LRU cache of HTTP responses.
+
+    Each entry is stored as two files named by the SHA-256 hash of the url:
+    <key>.body holds the raw response bytes and <key>.json holds the
+    metadata (url, ETag, Last-Modified, encoding, size and time fetched).
+    The time an entry was last used is the modification time of its body
+    file, so that a cache hit only touches the body instead of rewriting
+    the metadata.
+
+    Args:
+        directory (str): Folder holding the cache; default_cache_dir()
+        ttl (float): Seconds a response is fresh; defaults to DEFAULT_TTL
+        max_bytes (int): Total body size kept before the least recently
+                         used entries are evicted; DEFAULT_MAX_BYTES
+    """
+
+    def __init__(self, directory=None, ttl=DEFAULT_TTL,
+                 max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory or default_cache_dir()
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.RLock()
+        self._index = None
+
+    @staticmethod
+    def key(url):
+        """Returns the file name stem used for url."""
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def _path(self, key, suffix):
+        return os.path.join(self.directory, key + suffix)
+
+    def _load_index(self):
+        """Reads the metadata of every entry on disk into memory."""
+        index = {}
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if not name.endswith(".json"):
+                    continue
+                key = name[:-len(".json")]
+                try:
+                    with open(self._path(key, ".json")) as meta_file:
+                        meta = json.load(meta_file)
+                except (IOError, ValueError):
+                    continue
+                try:
+                    meta["last_access"] = os.path.getmtime(
+                        self._path(key, ".body"))
+                except OSError:
+                    continue
+                index[key] = meta
+        return index
+
+    def _entries(self):
+        if self._index is None:
+            self._index = self._load_index()
+        return self._index
+
+    def _write_atomic(self, path, data):
+        """Writes bytes to path so readers never see a partial file."""
+        handle, tmp_path = tempfile.mkstemp(dir=self.directory)
+        try:
+            with os.fdopen(handle, "wb") as tmp_file:
+                tmp_file.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _write_meta(self, key, meta):
+        # last_access lives in the modification time of the body file
+        stored = dict((name, value) for name, value in meta.items()
+                      if name != "last_access")
+        self._write_atomic(self._path(key, ".json"),
+                           json.dumps(stored).encode("utf-8"))
+
+    def _touch(self, key, meta):
+        """Marks the entry key as used now without rewriting its metadata."""
+        now = time.time()
+        try:
+            os.utime(self._path(key, ".body"), (now, now))
+        except OSError:
+            pass
+        meta["last_access"] = now
+
+    def lookup(self, url):
+        """Returns the metadata dictionary cached for url, or None."""
+        with self._lock:
+            meta = self._entries().get(self.key(url))
+            return dict(meta) if meta is not None else None
+
+    def is_fresh(self, meta, ttl=None):
+        """True if the entry meta is younger than ttl seconds."""
+        if ttl is None:
+            ttl = self.ttl
+        return (time.time() - meta["fetched_at"]) < ttl
+
+    def read(self, url):
+        """Returns the cached body bytes for url and marks it as used.
+
+        Raises:
+            KeyError if url is not cached
+        """
+        with self._lock:
+            key = self.key(url)
+            meta = self._entries().get(key)
+            if meta is None:
+                raise KeyError(url)
+            try:
+                with open(self._path(key, ".body"), "rb") as body_file:
+                    body = body_file.read()
+            except IOError:
+                self._remove(key)
+                raise KeyError(url)
+            self._touch(key, meta)
+            return body
+
+    def open(self, url):
+        """Returns the cached body of url as an open binary file, and marks
+        it as used; None if url is not cached."""
+        with self._lock:
+            key = self.key(url)
+            meta = self._entries().get(key)
+            if meta is None:
+                return None
+            try:
+                body_file = open(self._path(key, ".body"), "rb")
+            except IOError:
+                self._remove(key)
+                return None
+            self._touch(key, meta)
+            return body_file
+
+    def temp_file(self):
+        """Returns (binary file, path) of a new temporary file in the cache
+        folder, to be passed to store_file once fully written."""
+        with self._lock:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+        handle, tmp_path = tempfile.mkstemp(dir=self.directory,
+                                            suffix=".part")
+        return os.fdopen(handle, "wb"), tmp_path
+
+    def store_file(self, url, tmp_path, headers=None, encoding=None):
+        """Caches a body already written to tmp_path (see temp_file)."""
+        self._store(url, os.path.getsize(tmp_path), headers, encoding,
+                    lambda path: os.replace(tmp_path, path))
+
+    def store(self, url, body, headers=None, encoding=None):
+        """Caches the body bytes of a fresh response for url.
+
+        Args:
+            url (str): Address the body was downloaded from
+            body (bytes): Raw response body
+            headers (dict): Response headers; ETag and Last-Modified are kept
+            encoding (str): Text encoding of the body, if known
+        """
+        with self._lock:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            self._store(url, len(body), headers, encoding,
+                        lambda path: self._write_atomic(path, body))
+
+    def _store(self, url, size, headers, encoding, write_body):
+        headers = headers or {}
+        now = time.time()
+        meta = {"url": url,
+                "etag": headers.get("ETag"),
+                "last_modified": headers.get("Last-Modified"),
+                "encoding": encoding,
+                "size": size,
+                "fetched_at": now}
+        with self._lock:
+            key = self.key(url)
+            write_body(self._path(key, ".body"))
+            self._write_meta(key, meta)
+            self._touch(key, meta)
+            self._entries()[key] = meta
+            self._evict()
+
+    def revalidated(self, url, headers=None):
+        """Restarts the TTL of url after the host answered 304 Not Modified.
+
+        Any new ETag or Last-Modified value sent with the 304 is kept.
+        """
+        headers = headers or {}
+        with self._lock:
+            key = self.key(url)
+            meta = self._entries().get(key)
+            if meta is None:
+                return
+            meta["fetched_at"] = time.time()
+            if headers.get("ETag"):
+                meta["etag"] = headers.get("ETag")
+            if headers.get("Last-Modified"):
+                meta["last_modified"] = headers.get("Last-Modified")
+            self._write_meta(key, meta)
+            self._touch(key, meta)
+
+    def _remove(self, key):
+        for suffix in (".body", ".json"):
+            try:
+                os.remove(self._path(key, suffix))
+            except OSError:
+                pass
+        self._entries().pop(key, None)
+
+    def _evict(self):
+        """Removes least recently used entries until under max_bytes."""
+        entries = self._entries()
+        total = sum(meta["size"] for meta in entries.values())
+        if total <= self.max_bytes:
+            return
+        by_age = sorted(entries.items(),
+                        key=lambda item: item[1]["last_access"])
+        for key, meta in by_age:
+            if total <= self.max_bytes:
+                break
+            total -= meta["size"]
+            self._remove(key)
+
+    def info(self):
+        """Returns a dictionary describing the cache contents.
+
+        Keys are directory, ttl, max_bytes, total_bytes, n_entries and
+        entries, a list of the metadata of each cached response ordered from
+        most to least recently used.
+        """
+        with self._lock:
+            self._index = self._load_index()
+            entries = sorted(self._index.values(),
+                             key=lambda meta: meta["last_access"],
+                             reverse=True)
+            return {"directory": self.directory,
+                    "ttl": self.ttl,
+                    "max_bytes": self.max_bytes,
+                    "total_bytes": sum(meta["size"] for meta in entries),
+                    "n_entries": len(entries),
+                    "entries": [dict(meta) for meta in entries]}
+
+    def clear(self):
+        """Removes every cached response."""
+        with self._lock:
+            self._index = self._load_index()
+            for key in list(self._index.keys()):
+                self._remove(key)
+            # downloads that never completed
+            if os.path.isdir(self.directory):
+                for name in os.listdir(self.directory):
+                    if name.endswith(".part"):
+                        os.remove(os.path.join(self.directory, name))
+
+
+_UNSET = object()
+_cache = _UNSET
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Returns the cache shared by all grab functions, or None if disabled.
+
+    The default HttpCache is created on first use unless the environment
+    variable DOCC_HTTP_CACHE is set to 0, or DOCC_REPLAY selects recording
+    or replaying fixtures (see the replay module). The transport module
+    also bypasses the cache whenever the replay module records or replays,
+    however the mode was set.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is _UNSET:
+            if (os.environ.get("DOCC_HTTP_CACHE", "1") == "0" or
+                    os.environ.get("DOCC_REPLAY", "off") != "off"):
+                _cache = None
+            else:
+                _cache = HttpCache()
+        return _cache
+
+
+def set_cache(cache):
+    """Replaces the shared cache; pass None to disable caching."""
+    global _cache
+    with _cache_lock:
+        _cache = cache
+
+
+def cache_info():
+    """Returns HttpCache.info() for the shared cache, or None if disabled."""
+    cache = get_cache()
+    return cache.info() if cache is not None else None
+
+
+def clear_cache():
+    """Removes every response from the shared cache."""
+    cache = get_cache()
+    if cache is not None:
+        cache.clear()
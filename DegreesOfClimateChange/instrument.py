@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+"""instrument reports the time and resources taken by each pipeline stage.
+
+This python module lets the grab functions, the transport module and the plot
+data functions report every stage they run, e.g. 'noaa.download',
+'worldbank.download' or 'scripps.clean', to hooks registered by the user.
+Each hook is a function called with one event dictionary per finished stage:
+
+    {'stage': 'noaa.download',  # name of the stage
+     'start': 1539849600.0,     # wall clock time the stage started
+     'seconds': 0.42,           # duration
+     'bytes': 81920,            # bytes downloaded, or None
+     'rows': None,              # rows produced, or None
+     'peak_memory': None,       # peak traced bytes above the start, or None
+     'error': None,             # 'Type: message' if the stage raised
+     ...}                       # further fields given by the stage
+
+Three hooks are provided: LoggingSink writes one log line per stage,
+Collector keeps the events in memory and JsonLinesSink appends them to a
+file. Peak memory is measured with tracemalloc, which slows Python down, so
+it is only traced when a hook is registered with memory=True. When no hook is
+registered a stage costs a single check of the module state.
+
+Syntax
+from DegreesOfClimateChange import instrument
+with instrument.collecting() as collector:
+    df_noaa = grab_noaa()
+collector.totals()           --> {'noaa.download': 0.42, 'noaa.parse': ...}
+instrument.add_hook(instrument.JsonLinesSink('stages.jsonl'), memory=True)
+instrument.add_hook(instrument.LoggingSink())  --> log through 'logging'
+
+Inside the package a stage is timed with
+
+with instrument.stage('noaa.parse') as st:
+    df = parse(texts)
+    st.record(rows=len(df))
+"""
+
+import contextlib
+import json
+import logging
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+
+
+LOGGER_NAME = 'DegreesOfClimateChange'
+
+_hooks = ()  # (hook, memory) tuples; replaced, never mutated
+_hooks_lock = threading.Lock()
+_started_tracing = False  # True if tracemalloc was started by add_hook
+_local = threading.local()  # per thread stack of running stages
+
+
+class _NullStage(object):
+    """Stage handed out when no hook is registered; does nothing."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def record(self, **fields):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage(object):
+    """Running stage; reports its event to the hooks when it exits."""
+
+    def __init__(self, name, hooks, fields):
+        self.hooks = hooks
+        self.event = OrderedDict([('stage', name), ('start', None),
+                                  ('seconds', None), ('bytes', None),
+                                  ('rows', None), ('peak_memory', None),
+                                  ('error', None)])
+        self.event.update(fields)
+        self._memory = tracemalloc.is_tracing()
+        self._peak = 0
+
+    def record(self, **fields):
+        """Sets fields of the event, e.g. bytes=..., rows=..."""
+        self.event.update(fields)
+
+    def __enter__(self):
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        stack.append(self)
+        if self._memory:
+            self._start_memory = tracemalloc.get_traced_memory()[0]
+            _reset_peak()
+        self.event['start'] = time.time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.event['seconds'] = time.perf_counter() - self._start
+        _local.stack.pop()
+        if self._memory and tracemalloc.is_tracing():
+            peak = max(self._peak, tracemalloc.get_traced_memory()[1])
+            self.event['peak_memory'] = max(0, peak - self._start_memory)
+            if _local.stack:
+                # the peak was reset for this stage; hand it to the parent
+                parent = _local.stack[-1]
+                parent._peak = max(parent._peak, peak)
+        if exc_type is not None:
+            self.event['error'] = "{}: {}".format(exc_type.__name__,
+                                                  exc_value)
+        _emit(self.hooks, dict(self.event))
+        return False
+
+
+def _reset_peak():
+    reset_peak = getattr(tracemalloc, 'reset_peak', None)  # Python 3.9+
+    if reset_peak is not None:
+        reset_peak()
+
+
+def _emit(hooks, event):
+    for hook, _ in hooks:
+        try:
+            hook(event)
+        except Exception as error:
+            # a broken hook must not break the data pipeline
+            print("Warning: instrumentation hook {!r} failed: {}".format(
+                hook, error))
+
+
+def stage(name, **fields):
+    """Returns a context manager timing the stage called name.
+
+    Args:
+        name (str): Name of the stage, '<source>.<step>' by convention
+        fields: Further fields of the event, e.g. url=...
+    Returns:
+        object with a record(**fields) method setting fields of the event
+        once they are known, e.g. record(bytes=..., rows=...)
+    """
+    hooks = _hooks
+    if not hooks:
+        return _NULL_STAGE
+    return _Stage(name, hooks, fields)
+
+
+def enabled():
+    """True if at least one hook is registered."""
+    return bool(_hooks)
+
+
+def add_hook(hook, memory=False):
+    """Registers hook, a function called with the event of every stage.
+
+    Args:
+        hook: Function taking one event dictionary
+        memory (bool): Trace the peak memory of each stage (tracemalloc is
+                       started if needed, and stopped again once no hook
+                       asks for it)
+    """
+    global _hooks, _started_tracing
+    with _hooks_lock:
+        _hooks = _hooks + ((hook, memory),)
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _started_tracing = True
+
+
+def remove_hook(hook):
+    """Unregisters hook; ValueError if it is not registered."""
+    global _hooks, _started_tracing
+    with _hooks_lock:
+        for k, (registered, _) in enumerate(_hooks):
+            if registered is hook:
+                break
+        else:
+            raise ValueError("Hook not registered: {!r}".format(hook))
+        _hooks = _hooks[:k] + _hooks[k + 1:]
+        if _started_tracing and not any(memory for _, memory in _hooks):
+            tracemalloc.stop()
+            _started_tracing = False
+
+
+@contextlib.contextmanager
+def hooked(hook, memory=False):
+    """Context manager registering hook while its block runs."""
+    add_hook(hook, memory)
+    try:
+        yield hook
+    finally:
+        remove_hook(hook)
+
+
+def collecting(memory=False):
+    """Context manager collecting the events of its block in a Collector."""
+    return hooked(Collector(), memory)
+
+
+class Collector(object):
+    """Hook keeping every event in memory, in the events list."""
+
+    def __init__(self):
+        self.events = []
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        with self._lock:
+            self.events.append(event)
+
+    def clear(self):
+        """Forgets the collected events."""
+        with self._lock:
+            self.events = []
+
+    def select(self, name):
+        """List of the events of the stage called name."""
+        with self._lock:
+            return [event for event in self.events if event['stage'] == name]
+
+    def totals(self):
+        """Dictionary of {stage name: total seconds}, in order of first
+        appearance."""
+        totals = OrderedDict()
+        with self._lock:
+            for event in self.events:
+                totals[event['stage']] = (totals.get(event['stage'], 0.0) +
+                                          event['seconds'])
+        return totals
+
+
+class LoggingSink(object):
+    """Hook writing one line per stage to a logging logger.
+
+    Args:
+        logger (logging.Logger): Defaults to the 'DegreesOfClimateChange'
+                                 logger
+        level (int): Level of the log records, INFO by default
+    """
+
+    def __init__(self, logger=None, level=logging.INFO):
+        self.logger = logger or logging.getLogger(LOGGER_NAME)
+        self.level = level
+
+    def __call__(self, event):
+        parts = ["{:.3f} s".format(event['seconds'])]
+        if event['bytes'] is not None:
+            parts.append("{} bytes".format(event['bytes']))
+        if event['rows'] is not None:
+            parts.append("{} rows".format(event['rows']))
+        if event['peak_memory'] is not None:
+            parts.append("peak {:.1f} MB".format(event['peak_memory'] / 1e6))
+        if event['error'] is not None:
+            parts.append("failed: " + event['error'])
+        self.logger.log(self.level, "%s %s", event['stage'],
+                        ", ".join(parts))
+
+
+class JsonLinesSink(object):
+    """Hook appending each event as one JSON line to the file at path."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        line = json.dumps(event, default=str)
+        with self._lock:
+            with open(self.path, 'a') as events_file:
+                events_file.write(line + '\n')
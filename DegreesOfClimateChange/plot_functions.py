@@ -11,24 +11,105 @@ Syntax
 import plot_functions as pf
 pf.plot_function_name() --> outputs matplotlib figure to the session
 
+The Date columns may hold the "YYYY-M-01" strings returned by default by the
+grab functions, or the datetime64 or period values returned with their
+date_format argument; typed dates are used without any text parsing.
+The numeric axes prepared for each dataset are kept in the memory-mapped
+cache of the axis_cache module, so plotting the same data again skips the
+date conversion and the annual averaging; the arrays returned with
+do_plot=False are copy-on-write maps of it, writable like any array. The
+data preparation of each plot is reported to the hooks of the instrument
+module as a 'plot.<name>' stage.
+
+matplotlib.pyplot is only imported when a figure is drawn, so the plot data
+(do_plot=False) is available without its import cost. Without a display,
+and unless MPLBACKEND is set, the non-interactive Agg backend is used.
+
 Written by Todd Schultz, Rahul Birmiwal, Abhishek Anand
 2018
 """
 
 import datetime
 import math
-import matplotlib
-import matplotlib.pyplot as plt
-import numpy as np
+import os
+import sys
 import pandas as pd
-from functools import reduce
 
+from . import align
+from . import axis_cache
+from . import dates
+from . import instrument
+from . import rebase
+from . import resample
+
+
+def _headless():
+    """True if no backend was chosen and no display is available."""
+    if os.environ.get('MPLBACKEND'):
+        return False
+    if not sys.platform.startswith('linux'):
+        return False
+    return not (os.environ.get('DISPLAY') or
+                os.environ.get('WAYLAND_DISPLAY'))
+
+
+def _pyplot():
+    """Returns matplotlib.pyplot, imported on the first plot.
+
+    Without a display the non-interactive Agg backend is selected, so that
+    figures can still be drawn and saved by batch jobs.
+    """
+    if 'matplotlib.pyplot' not in sys.modules and _headless():
+        import matplotlib
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def _yearly_mean(df, column):
+    """Returns (yearly dates, yearly means) of a monthly column of df.
+
+    The means are computed by the resample module, and the yearly dates are
+    January 1st of each year with at least one valid month.
+    """
+    yearly = resample.resample(df, column, 'annual')
+    return yearly['Date'].values, yearly[column].values
+
+
+def _raw_axes(df, column):
+    """Returns the cached (matplotlib dates, values) arrays of df[column]."""
+    return axis_cache.cached_axes(
+        'raw', df, column,
+        lambda: (dates.to_plot_dates(df['Date']), df[column].values))
+
+
+def _yearly_axes(df, column, offset=0.0):
+    """Returns the cached (matplotlib dates, yearly means + offset) arrays
+    of the monthly df[column]."""
+    def compute():
+        yearly_dates, yearly = _yearly_mean(df, column)
+        return dates.to_plot_dates(yearly_dates), yearly + offset
+    return axis_cache.cached_axes('annual', df, column, compute,
+                                  float(offset))
 
-def plot_each_absolute_temperature(df_noaa, df_berkeley, df_wb, do_plot, fig_num=None):
+
+def _years_covered(df):
+    """Returns the (first year, last year) of the valid dates of df."""
+    months, valid = dates.month_numbers(df['Date'])
+    if not valid.any():
+        raise ValueError("No valid dates to take a reference period from")
+    years = months[valid] // 12 + 1970
+    return int(years.min()), int(years.max())
+
+
+def plot_each_absolute_temperature(df_noaa, df_berkeley, df_wb, do_plot,
+                                   fig_num=None, period=None):
     """plot_each_absolute_temperature plots each agency's temperture estimates
        on a single plot, colored by agency; if the agency's data is in Anomaly
-       format, then we convert to absolute temperature via by using the
-       reference temperature as the mean global average temperature 1901-2012.
+       format, then we convert to absolute temperature with the rebase
+       module: the anomalies are shifted so that their mean over the
+       reference period equals the mean World Bank temperature over the same
+       years, whatever reference period the agency uses itself.
        This function returns a plot handle, and/or the data used to plot
        (see do_plot argument)
 
@@ -52,6 +133,8 @@ def plot_each_absolute_temperature(df_noaa, df_berkeley, df_wb, do_plot, fig_num
     - df_wb (Pandas Dataframe): World Bank dataframe from grab_worldbank
     - do_plot (boolean): True if to plot; False to return plot data
     - fig_num (int): Figure number to use in the output plotting
+    - period (tuple): (first year, last year) of the reference period of
+                      the conversion; defaults to the years of df_wb
 
     Output
         if (do_plot is True), outputs
@@ -84,26 +167,27 @@ def plot_each_absolute_temperature(df_noaa, df_berkeley, df_wb, do_plot, fig_num
 
 
 
-    # annualize the data
-    yearly_noaa = df_noaa.groupby(df_noaa['Date'].map(lambda x: pd.to_datetime(x).year)).mean()
-    yearly_noaa = yearly_noaa.reset_index()
-    yearly_noaa['Date'] = yearly_noaa['Date'].astype(str) + '-01-01' #reset Date to proper format
-
-    yearly_ber = df_berkeley.groupby(df_berkeley['Date'].map(lambda x: pd.to_datetime(x).year)).mean()
-    yearly_ber = yearly_ber.reset_index()
-    yearly_ber['Date'] = yearly_ber['Date'].astype(str) + '-01-01' #reset Date to proper format
-
-    # baseline temperature for conversion
-    baseline_temp = np.mean(df_wb['Tabsolute_C'])
-
-    # convert Anomaly data to Absolute
-    noaa_2_absolute = list(map(lambda x: x + baseline_temp, yearly_noaa['Tanomaly_C']))
-    berkeley_2_absolute = list(map(lambda x: x + baseline_temp, yearly_ber['Tanomaly_C']))
-
-    # Get new yearly dates
-    dates_yearly_noaa = matplotlib.dates.date2num(pd.to_datetime(yearly_noaa['Date']))
-    dates_yearly_ber = matplotlib.dates.date2num(pd.to_datetime(yearly_ber['Date']))
-    dateswb = matplotlib.dates.date2num(pd.to_datetime(df_wb['Date']))
+    with instrument.stage('plot.each_absolute_temperature') as st:
+        # offsets converting the Anomaly data to Absolute, cached per
+        # source and reference period
+        if period is None:
+            period = _years_covered(df_wb)
+        noaa_offset = rebase.absolute_offset(
+            df_noaa, 'Tanomaly_C', df_wb, 'Tabsolute_C', period,
+            'NOAA', 'WorldBank')
+        berkeley_offset = rebase.absolute_offset(
+            df_berkeley, 'Tanomaly_C', df_wb, 'Tabsolute_C', period,
+            'Berkeley', 'WorldBank')
+
+        # annualize the data and convert Anomaly data to Absolute
+        dates_yearly_noaa, noaa_2_absolute = _yearly_axes(
+            df_noaa, 'Tanomaly_C', noaa_offset)
+        dates_yearly_ber, berkeley_2_absolute = _yearly_axes(
+            df_berkeley, 'Tanomaly_C', berkeley_offset)
+        noaa_2_absolute = list(noaa_2_absolute)
+        berkeley_2_absolute = list(berkeley_2_absolute)
+        dateswb, _ = _raw_axes(df_wb, 'Tabsolute_C')
+        st.record(rows=len(df_noaa) + len(df_berkeley) + len(df_wb))
 
     if (not do_plot):
         plot_data = {'NOAA':noaa_2_absolute, 'Berkeley':berkeley_2_absolute, 'WorldBank':df_wb['Tabsolute_C']}
@@ -112,6 +196,7 @@ def plot_each_absolute_temperature(df_noaa, df_berkeley, df_wb, do_plot, fig_num
     else:
         # Now plot the temperatures from the 3 sources using
         # the same units (absolute degrees Celsius)
+        plt = _pyplot()
         if (fig_num is None):
             fig_num = 0
         hf = plt.figure(fig_num)
@@ -166,25 +251,23 @@ def plot_co2_against_temperature(df_co2, df_noaa, df_berkeley, df_wb, do_plot=Tr
         raise ValueError("Invalid arguments datatype, expected pandas dataframes")
 
 
-    # Get the data source dictionary and their respective x-axes
-    (data_dict, axes_dict) = plot_each_absolute_temperature(df_noaa, df_berkeley, df_wb, False, 0)
-    co2_data = df_co2["CO2"] #store CO2 in this dictionary
-    data_dict['Scripps'] = co2_data #add co2 data to the 'data source dictionary'
-
-    co2_xs = matplotlib.dates.date2num(pd.to_datetime(df_co2['Date']))
-    axes_dict['Scripps'] = co2_xs #likewise for the x-axes
+    with instrument.stage('plot.co2_against_temperature') as st:
+        # Get the data source dictionary and their respective x-axes
+        (data_dict, axes_dict) = plot_each_absolute_temperature(df_noaa, df_berkeley, df_wb, False, 0)
+        co2_data = df_co2["CO2"] #store CO2 in this dictionary
+        data_dict['Scripps'] = co2_data #add co2 data to the 'data source dictionary'
 
-    # compute the common dates across all data sources
-    common_dates = np.asarray(list(map(int, (list(reduce(lambda x, y: x&y, [set(xs) for xs in axes_dict.values()]))))), dtype=float)
+        co2_xs, _ = _raw_axes(df_co2, 'CO2')
+        axes_dict['Scripps'] = co2_xs #likewise for the x-axes
 
-    # sort them in chronological order for plotting
-    common_dates = np.sort(common_dates)
-
-    # get the data correspondong to _common_dates_, and restore in data dictionary
-    for agency_name, data in data_dict.items():
-        mask = np.isin(axes_dict[agency_name], common_dates)
-        masked_data = [data[i] for i in range(len(data)) if mask[i]]
-        data_dict[agency_name] = masked_data
+        # the common dates across all data sources, in chronological order,
+        # and the data of each source on them
+        agency_names = list(data_dict)
+        common_dates, values = align.align(
+            [(axes_dict[name], data_dict[name]) for name in agency_names])
+        for column, agency_name in enumerate(agency_names):
+            data_dict[agency_name] = values[:, column]
+        st.record(rows=len(common_dates))
 
 
     if (not do_plot):
@@ -193,6 +276,7 @@ def plot_co2_against_temperature(df_co2, df_noaa, df_berkeley, df_wb, do_plot=Tr
         return (data_dict, x_linspace)
     else:
         # Create comparison graph
+        plt = _pyplot()
         fig, ax1 = plt.subplots()
         with plt.style.context('Solarize_Light2'):
             color1 = 'tab:blue'
@@ -247,29 +331,28 @@ def plot_each_temperature(df_noaa, df_berkeley, df_wb, do_plot=False):
 
 
 
-    # Prepare data for plotting
-    # NOAA Data
-    tnoaa = pd.to_datetime(df_noaa['Date'])
-    datesnoaa = matplotlib.dates.date2num(tnoaa)
-    # Berkeley Data
-    tberkeley = pd.to_datetime(df_berkeley['Date'])
-    datesberkeley = matplotlib.dates.date2num(tberkeley)
-    # World Bank Data
-    twb = pd.to_datetime(df_wb['Date'])
-    dateswb = matplotlib.dates.date2num(twb)
+    with instrument.stage('plot.each_temperature') as st:
+        # Prepare data for plotting
+        # NOAA Data
+        datesnoaa, _ = _raw_axes(df_noaa, 'Tanomaly_C')
+        # Berkeley Data
+        datesberkeley, _ = _raw_axes(df_berkeley, 'Tanomaly_C')
+        # World Bank Data
+        dateswb, _ = _raw_axes(df_wb, 'Tabsolute_C')
 
-    # Find plotting limits
-    datemin = min([datesnoaa.min(), datesberkeley.min(), dateswb.min()])
-    datemax = max([datesnoaa.max(), datesberkeley.max(), dateswb.max()])
-    datelims = [datemin, datemax]
-    ymin = math.floor(min([df_noaa["Tanomaly_C"].min(),
-                           df_berkeley["Tanomaly_C"].min()]))
-    ymax = math.ceil(max([df_noaa["Tanomaly_C"].max(),
-                          df_berkeley["Tanomaly_C"].max()]))
-    yanomalylims = [ymin, ymax]
-    ymin = math.floor(min([df_wb["Tabsolute_C"].min()]))
-    ymax = math.ceil(max([df_wb["Tabsolute_C"].max()]))
-    yabsolutelims = [ymin, ymax]
+        # Find plotting limits
+        datemin = min([datesnoaa.min(), datesberkeley.min(), dateswb.min()])
+        datemax = max([datesnoaa.max(), datesberkeley.max(), dateswb.max()])
+        datelims = [datemin, datemax]
+        ymin = math.floor(min([df_noaa["Tanomaly_C"].min(),
+                               df_berkeley["Tanomaly_C"].min()]))
+        ymax = math.ceil(max([df_noaa["Tanomaly_C"].max(),
+                              df_berkeley["Tanomaly_C"].max()]))
+        yanomalylims = [ymin, ymax]
+        ymin = math.floor(min([df_wb["Tabsolute_C"].min()]))
+        ymax = math.ceil(max([df_wb["Tabsolute_C"].max()]))
+        yabsolutelims = [ymin, ymax]
+        st.record(rows=len(df_noaa) + len(df_berkeley) + len(df_wb))
 
     if (not do_plot):
         x_linspace = {'NOAA':datesnoaa, 'Berkeley':datesberkeley,'WorldBank':dateswb}
@@ -280,6 +363,7 @@ def plot_each_temperature(df_noaa, df_berkeley, df_wb, do_plot=False):
 
     else:
         # Create comparison plot
+        plt = _pyplot()
         hf = plt.figure(1)
         # Subplot 1
         plt.subplot(3, 1, 1)
@@ -338,14 +422,11 @@ def plot_all_temperature(df_noaa, df_berkeley, df_wb):
     """
     # Prepare data for plotting
     # NOAA Data
-    tnoaa = pd.to_datetime(df_noaa['Date'])
-    datesnoaa = matplotlib.dates.date2num(tnoaa)
+    datesnoaa, _ = _raw_axes(df_noaa, 'Tanomaly_C')
     # Berkeley Data
-    tberkeley = pd.to_datetime(df_berkeley['Date'])
-    datesberkeley = matplotlib.dates.date2num(tberkeley)
+    datesberkeley, _ = _raw_axes(df_berkeley, 'Tanomaly_C')
     # World Bank Data
-    twb = pd.to_datetime(df_wb['Date'])
-    dateswb = matplotlib.dates.date2num(twb)
+    dateswb, _ = _raw_axes(df_wb, 'Tabsolute_C')
 
     # Find plotting limits
     datemin = min([datesnoaa.min(), datesberkeley.min(), dateswb.min()])
@@ -361,6 +442,7 @@ def plot_all_temperature(df_noaa, df_berkeley, df_wb):
     yabsolutelims = [ymin, ymax]
 
     # Create comparison graph
+    plt = _pyplot()
     fig, ax1 = plt.subplots()
     color1 = 'tab:blue'
     ax1.set_xlabel('Date')
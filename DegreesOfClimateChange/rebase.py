@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""rebase re-expresses temperatures against another reference period.
+
+Each agency reports anomalies against its own reference period (NOAA
+1901-2000, Berkeley Earth 1951-1980, see the sources module), so anomalies
+of different agencies cannot be compared, nor turned into absolute
+temperatures, by adding the same constant. This python module contains
+functions that work on whole columns at once:
+
+baseline       mean of a column over the years of a reference period
+rebase         anomalies against another reference period, or an absolute
+               climatology added to them
+to_absolute    absolute temperatures, by giving the anomalies of a source
+               the mean of an absolute source (e.g. World Bank) over a
+               period covered by both
+
+The baseline of each (source, period) pair is cached in memory together
+with a hash of the data, so repeated plots and analyses of the same data do
+not average it again, while refreshed data is averaged anew.
+
+Syntax
+from DegreesOfClimateChange import rebase
+rebase.reference_period('Berkeley')                  --> (1951, 1980)
+rebase.baseline(df_noaa, 'Tanomaly_C', (1961, 1990), name='NOAA')
+rebase.rebase(df_berkeley, 'Tanomaly_C', (1901, 2000), name='Berkeley')
+                                       --> anomalies against 1901-2000
+rebase.to_absolute(df_noaa, 'Tanomaly_C', df_wb, 'Tabsolute_C',
+                   (1901, 2000), name='NOAA', reference_name='WorldBank')
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from . import axis_cache
+from . import dates
+
+
+MAX_BASELINES = 256  # cached (source, period) baselines before the oldest go
+
+_baselines = OrderedDict()  # {(name, column, period, data hash): baseline}
+_baselines_lock = threading.Lock()
+
+
+def reference_period(name):
+    """Returns the (first year, last year) reference period of the
+    anomalies of the registered source called name.
+
+    Raises:
+        KeyError if no source is called name
+        ValueError if the source has no known reference period
+    """
+    from . import sources
+    period = sources.get_source(name).baseline
+    if period is None:
+        raise ValueError("No reference period is known for " + name)
+    return period
+
+
+def _check_period(period):
+    """Returns period as a (first year, last year) tuple of ints."""
+    try:
+        first, last = (int(year) for year in period)
+    except (TypeError, ValueError):
+        raise ValueError("Invalid period {!r}, expected (first year, last "
+                         "year)".format(period))
+    if first > last:
+        raise ValueError("Invalid period {!r}, the first year is after the "
+                         "last".format(period))
+    return first, last
+
+
+def baseline(df, column, period=None, name=None):
+    """Returns the mean of df[column] over the years of period.
+
+    Args:
+        df (dataframe): Dataframe with a Date column of any form of the
+                        dates module
+        column (str): Name of the value column
+        period (tuple): (first year, last year), both included; None for the
+                        reference period of the registered source name
+        name (str): Name of the source, the key of the cache with period
+    Returns:
+        float
+    Raises:
+        ValueError if period is invalid or df has no value in it
+    """
+    if period is None:
+        if name is None:
+            raise ValueError("A period or the name of a registered source "
+                             "is needed")
+        period = reference_period(name)
+    period = _check_period(period)
+    key = (name, column, period, axis_cache.data_hash(df, column))
+    with _baselines_lock:
+        if key in _baselines:
+            _baselines.move_to_end(key)
+            return _baselines[key]
+
+    months, valid = dates.month_numbers(df['Date'])
+    years = months // 12 + 1970
+    values = np.asarray(df[column].values, dtype=np.float64)
+    inside = (valid & ~np.isnan(values) & (years >= period[0]) &
+              (years <= period[1]))
+    if not inside.any():
+        raise ValueError("No {} values of {} in {}-{}".format(
+            column, name or 'the data', period[0], period[1]))
+    mean = float(values[inside].mean())
+
+    with _baselines_lock:
+        _baselines[key] = mean
+        while len(_baselines) > MAX_BASELINES:
+            _baselines.popitem(last=False)
+    return mean
+
+
+def clear_baselines():
+    """Empties the cache of baselines."""
+    with _baselines_lock:
+        _baselines.clear()
+
+
+def offset(df, column, period=None, name=None, climatology=0.0):
+    """Returns the constant that rebase adds to df[column]: climatology
+    minus the baseline of df[column] over period."""
+    return climatology - baseline(df, column, period, name)
+
+
+def rebase(df, column, period=None, name=None, climatology=0.0):
+    """Re-expresses df[column] against the reference period period.
+
+    Args:
+        df, column, period, name: As for baseline
+        climatology (float): Value the mean over period becomes; 0 gives
+                             anomalies against period, an absolute mean
+                             temperature of period gives absolute values
+    Returns:
+        float numpy array of the rebased values
+    """
+    return (np.asarray(df[column].values, dtype=np.float64) +
+            offset(df, column, period, name, climatology))
+
+
+def absolute_offset(df, column, reference, reference_column, period,
+                    name=None, reference_name=None):
+    """Returns the constant that to_absolute adds to df[column]."""
+    return offset(df, column, period, name,
+                  baseline(reference, reference_column, period,
+                           reference_name))
+
+
+def to_absolute(df, column, reference, reference_column, period, name=None,
+                reference_name=None):
+    """Converts the anomalies df[column] to absolute temperatures.
+
+    The anomalies are rebased so that their mean over period is that of the
+    absolute temperatures reference[reference_column] over the same years;
+    the reference period of the anomalies does not matter.
+
+    Args:
+        df, column, name: Anomalies, as for baseline
+        reference (dataframe): Absolute temperatures, e.g. of grab_worldbank
+        reference_column (str): Value column of reference
+        period (tuple): (first year, last year) covered by both dataframes
+        reference_name (str): Name of the reference source, for the cache
+    Returns:
+        float numpy array of the absolute temperatures
+    """
+    return (np.asarray(df[column].values, dtype=np.float64) +
+            absolute_offset(df, column, reference, reference_column, period,
+                            name, reference_name))
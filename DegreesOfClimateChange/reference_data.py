@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""reference_data provides the country reference tables shipped with the
+package.
+
+This python module contains the CountryRegistry class, an indexed view of the
+bundled World Bank country table (country_iso_codes.csv) and of the regional
+groupings of those countries (country_groups.csv). The tables are read from
+the package folder the first time get_registry() is called and the same
+registry is returned for the rest of the process, so no network access is
+needed to know which countries exist.
+
+Syntax
+from DegreesOfClimateChange import reference_data
+registry = reference_data.get_registry()
+registry.name('GHA')        --> 'Ghana'
+registry.code('Ghana')      --> 'GHA'
+registry.iso3('ROM')        --> 'ROU'
+registry.members('SSF')     --> ('AGO', 'BEN', 'BWA', ...)
+registry.groups_of('GHA')   --> ('SSF',)
+
+country_iso_codes.csv lists the 218 World Bank economies followed, after a
+blank separator, by the aggregate groups the World Bank publishes (regions,
+income groups, World, ...). The CODE column holds the World Bank codes, a few
+of which are legacy codes rather than ISO 3166-1 alpha-3 codes (ROM for
+Romania, ZAR for the Democratic Republic of the Congo, ...); the ISO3 column
+holds the alpha-3 code the climate API expects. The Channel Islands have no
+alpha-3 code and keep CHI. country_groups.csv holds one (CODE, GROUP) row
+per membership and currently assigns every economy to one of the seven World
+Bank geographic regions: EAS, ECS, LCN, MEA, NAC, SAS and SSF.
+"""
+
+import csv
+import os
+import threading
+
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+COUNTRIES_FILE = os.path.join(DATA_DIR, 'country_iso_codes.csv')
+GROUPS_FILE = os.path.join(DATA_DIR, 'country_groups.csv')
+WORLD = 'WLD'  # group code containing every economy
+
+
+class CountryRegistry(object):
+    """Indexed lookups between country codes, names and groups.
+
+    Args:
+        countries (list): (name, code) tuples of the economies, in order
+        group_names (dict): {group code: group name} of the aggregates
+        memberships (list): (code, group code) tuples
+        iso3_codes (dict): {code: ISO alpha-3 code} of the economies whose
+                           code is not their alpha-3 code
+    """
+
+    def __init__(self, countries, group_names, memberships, iso3_codes=None):
+        self._countries = tuple(countries)
+        self._iso3 = dict(iso3_codes or {})
+        self._name_by_code = dict((code, name) for name, code in countries)
+        self._code_by_name = dict((name, code) for name, code in countries)
+        self.group_names = dict(group_names)
+        members = {}
+        groups = {}
+        for code, group in memberships:
+            if code not in self._name_by_code:
+                raise ValueError("Unknown country code in groups: " + code)
+            members.setdefault(group, []).append(code)
+            groups.setdefault(code, []).append(group)
+        members[WORLD] = [code for _, code in countries]
+        self._members = dict((group, tuple(codes))
+                             for group, codes in members.items())
+        self._groups = dict((code, tuple(codes))
+                            for code, codes in groups.items())
+
+    def __len__(self):
+        return len(self._countries)
+
+    def __contains__(self, code):
+        return code in self._name_by_code
+
+    @property
+    def codes(self):
+        """Tuple of every economy code, in table order."""
+        return tuple(code for _, code in self._countries)
+
+    def pairs(self):
+        """List of (name, code) tuples of every economy, in table order."""
+        return list(self._countries)
+
+    def name(self, code):
+        """Returns the country name of code; KeyError if unknown."""
+        return self._name_by_code[code]
+
+    def code(self, name):
+        """Returns the country code of name; KeyError if unknown."""
+        return self._code_by_name[name]
+
+    def iso3(self, code):
+        """Returns the ISO alpha-3 code of the economy code; KeyError if
+        unknown."""
+        if code not in self._name_by_code:
+            raise KeyError(code)
+        return self._iso3.get(code, code)
+
+    def members(self, group):
+        """Returns the tuple of economy codes belonging to group.
+
+        Raises:
+            KeyError if group has no members
+        """
+        return self._members[group]
+
+    def groups_of(self, code):
+        """Returns the tuple of group codes that code belongs to."""
+        if code not in self._name_by_code:
+            raise KeyError(code)
+        return self._groups.get(code, ()) + (WORLD,)
+
+
+def _read_rows(path):
+    """Returns the rows of a bundled csv file without its header."""
+    # utf-8-sig drops the byte order mark at the start of the files
+    with open(path, encoding='utf-8-sig', newline='') as csv_file:
+        rows = list(csv.reader(csv_file))
+    return rows[1:]
+
+
+def load_registry(countries_file=COUNTRIES_FILE, groups_file=GROUPS_FILE):
+    """Reads the reference tables and returns a new CountryRegistry.
+
+    The economies are the rows before the first blank row of
+    countries_file; the named rows after it are the aggregate groups.
+    """
+    countries, group_names, iso3_codes = [], {}, {}
+    in_groups = False
+    for row in _read_rows(countries_file):
+        name, code, iso3 = (row + ['', '', ''])[:3]
+        if not name and not code:
+            in_groups = True
+            continue
+        if in_groups:
+            group_names[code] = name
+        else:
+            countries.append((name, code))
+            if iso3 and iso3 != code:
+                iso3_codes[code] = iso3
+    memberships = [(row[0], row[1]) for row in _read_rows(groups_file)
+                   if len(row) >= 2 and row[0]]
+    return CountryRegistry(countries, group_names, memberships, iso3_codes)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """Returns the CountryRegistry of the bundled tables.
+
+    The tables are read on the first call only; later calls return the
+    same registry.
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = load_registry()
+    return _registry
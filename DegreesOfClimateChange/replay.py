@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""replay records upstream responses into fixture files and serves them back.
+
+This python module lets every grab function run without network access. The
+shared session of the transport module sends its requests through the
+FixtureAdapter class below, which works in one of three modes:
+
+    'off'       requests go to the upstream hosts (default)
+    'record'    requests go to the upstream hosts and every response is
+                also saved into a fixture directory
+    'replay'    responses are served from the fixture directory and no
+                request leaves the machine; a request without a fixture
+                raises FixtureMissing
+
+Because the switch happens below the session, the grab functions, the
+stream, range and HEAD requests of the transport module and the wbpy climate
+API all run through exactly the same code in every mode.
+
+Syntax
+from DegreesOfClimateChange import replay
+with replay.recording('fixtures'):
+    df_noaa = grab_noaa()          --> downloads and saves the responses
+with replay.replaying('fixtures'):
+    df_noaa = grab_noaa()          --> offline, from the saved responses
+
+The mode can also be chosen for a whole process with the environment
+variables DOCC_REPLAY (off, record or replay) and DOCC_FIXTURES (fixture
+directory). The on-disk HTTP cache is bypassed while recording or replaying
+so that every request reaches the fixtures.
+
+Each response is saved as <key>.body holding the raw body bytes, exactly as
+sent by the host, and <key>.json holding the fixture format version, method,
+url, requested byte range, status code and headers; key is the SHA-256 hash
+of the method, url and byte range.
+"""
+
+import contextlib
+import datetime
+import hashlib
+import io
+import json
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.response import HTTPResponse
+
+from . import http_cache
+
+
+FIXTURE_VERSION = 1
+MODES = ('off', 'record', 'replay')
+# headers describing the original connection rather than the response
+_DROPPED_HEADERS = ('connection', 'keep-alive', 'transfer-encoding')
+
+
+class FixtureMissing(requests.ConnectionError):
+    """Raised in replay mode for a request that has no fixture."""
+
+
+class FixtureStore(object):
+    """Directory of recorded responses.
+
+    Args:
+        directory (str): Folder holding the fixture files
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(method, url, byte_range=None):
+        """Returns the file name stem of a request."""
+        text = "{} {} {}".format(method.upper(), url, byte_range or '')
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def _paths(self, key):
+        return (os.path.join(self.directory, key + '.json'),
+                os.path.join(self.directory, key + '.body'))
+
+    def save(self, method, url, status, headers, body, byte_range=None):
+        """Saves a response; headers is a dictionary of response headers
+        and body the raw (possibly compressed) body bytes."""
+        meta = {'version': FIXTURE_VERSION,
+                'method': method.upper(),
+                'url': url,
+                'range': byte_range,
+                'status': status,
+                'headers': dict((name, value) for name, value
+                                in headers.items()
+                                if name.lower() not in _DROPPED_HEADERS),
+                'recorded_at': datetime.datetime.now().isoformat()}
+        meta_path, body_path = self._paths(self.key(method, url, byte_range))
+        with self._lock:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            with open(body_path, 'wb') as body_file:
+                body_file.write(body)
+            with open(meta_path, 'w') as meta_file:
+                json.dump(meta, meta_file, indent=1, sort_keys=True)
+
+    def load(self, method, url, byte_range=None):
+        """Returns (meta, body) of a saved response.
+
+        Raises:
+            FixtureMissing if the response was never saved
+            ValueError if it was saved by another fixture format version
+        """
+        meta_path, body_path = self._paths(self.key(method, url, byte_range))
+        try:
+            with open(meta_path) as meta_file:
+                meta = json.load(meta_file)
+            with open(body_path, 'rb') as body_file:
+                body = body_file.read()
+        except (IOError, OSError):
+            raise FixtureMissing("No fixture for {} {}{} in {}".format(
+                method.upper(), url,
+                " (range {})".format(byte_range) if byte_range else "",
+                self.directory))
+        if meta.get('version') != FIXTURE_VERSION:
+            raise ValueError("Fixture {} has format version {}, expected {}"
+                             .format(meta_path, meta.get('version'),
+                                     FIXTURE_VERSION))
+        return meta, body
+
+
+_state_lock = threading.Lock()
+_state = None  # (mode, FixtureStore) set by the context managers
+
+
+def _env_state():
+    mode = os.environ.get('DOCC_REPLAY', 'off')
+    if mode not in MODES:
+        raise ValueError("Invalid DOCC_REPLAY {!r}, expected one of {}"
+                         .format(mode, MODES))
+    if mode == 'off':
+        return mode, None
+    directory = os.environ.get('DOCC_FIXTURES')
+    if not directory:
+        raise ValueError("DOCC_FIXTURES must name the fixture directory "
+                         "when DOCC_REPLAY is " + mode)
+    return mode, FixtureStore(directory)
+
+
+def current_mode():
+    """Returns (mode, FixtureStore or None) in effect."""
+    with _state_lock:
+        if _state is not None:
+            return _state
+    return _env_state()
+
+
+@contextlib.contextmanager
+def _mode(mode, directory):
+    global _state
+    saved_cache = http_cache.get_cache()
+    with _state_lock:
+        saved_state = _state
+        _state = (mode, FixtureStore(directory) if directory else None)
+    if mode != 'off':
+        http_cache.set_cache(None)
+    try:
+        yield _state[1]
+    finally:
+        with _state_lock:
+            _state = saved_state
+        http_cache.set_cache(saved_cache)
+
+
+def recording(directory):
+    """Context manager saving every upstream response into directory."""
+    return _mode('record', directory)
+
+
+def replaying(directory):
+    """Context manager serving every request from the fixtures in
+    directory, without any network access."""
+    return _mode('replay', directory)
+
+
+def live():
+    """Context manager sending requests upstream, whatever the
+    environment variables say."""
+    return _mode('off', None)
+
+
+class FixtureAdapter(HTTPAdapter):
+    """Transport adapter recording or replaying responses (see module)."""
+
+    def send(self, request, **kwargs):
+        mode, store = current_mode()
+        if mode == 'off':
+            return super(FixtureAdapter, self).send(request, **kwargs)
+        byte_range = request.headers.get('Range')
+        if mode == 'replay':
+            meta, body = store.load(request.method, request.url, byte_range)
+            return self._build(request, meta['status'], meta['headers'],
+                               body)
+
+        response = super(FixtureAdapter, self).send(
+            request, **dict(kwargs, stream=True))
+        body = response.raw.read(decode_content=False)
+        headers = dict(response.headers)
+        response.close()
+        store.save(request.method, request.url, response.status_code,
+                   headers, body, byte_range)
+        return self._build(request, response.status_code, headers, body)
+
+    def _build(self, request, status, headers, body):
+        """Builds a response that reads body as if it came off the wire."""
+        headers = dict((name, value) for name, value in headers.items()
+                       if name.lower() not in _DROPPED_HEADERS)
+        if request.method != 'HEAD':
+            # a HEAD response keeps the length of the file it describes
+            headers = dict((name, value) for name, value in headers.items()
+                           if name.lower() != 'content-length')
+            headers['Content-Length'] = str(len(body))
+        raw = HTTPResponse(body=io.BytesIO(body), headers=headers,
+                           status=status, preload_content=False,
+                           decode_content=False,
+                           request_method=request.method)
+        return self.build_response(request, raw)
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""resample averages monthly data into annual, decadal or seasonal means.
+
+This python module contains the resample function, which averages the value
+column of one (Date, value) dataframe over each year, decade or meteorological
+season, and resample_many, which does the same for several dataframes in one
+pass. Every Date is turned into an integer period key (see period_keys), and
+the sums and counts of all the periods of all the dataframes are accumulated
+by a single numpy bincount, so no date is parsed per row and no groupby is
+built.
+
+A period is only kept if it has at least min_count valid (non NaN) values,
+for example min_count=10 drops the years with fewer than 10 valid months.
+
+The periods are:
+
+'annual'    calendar years, dated January 1st
+'decadal'   decades starting with the years ending in 0, dated January 1st
+'seasonal'  DJF, MAM, JJA and SON seasons, dated on their first month; the
+            December of each winter belongs to the next year's DJF
+
+Syntax
+from DegreesOfClimateChange import resample
+df_yearly = resample.resample(df_noaa, 'Tanomaly_C', 'annual', min_count=12)
+frames = resample.resample_many({'NOAA': (df_noaa, 'Tanomaly_C'),
+                                 'Berkeley': (df_berkeley, 'Tanomaly_C')},
+                                'decadal')
+frames['NOAA']                          --> (Date, Tanomaly_C) decadal means
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from . import dates
+
+
+FREQUENCIES = ('annual', 'decadal', 'seasonal')
+SEASONS = ('DJF', 'MAM', 'JJA', 'SON')
+
+
+def period_keys(date_column, freq):
+    """Returns the integer period keys of a Date column of any form.
+
+    Keys are consecutive integers for consecutive periods: years since 1970
+    ('annual'), decades since 1970 ('decadal') or seasons since the winter
+    of 1970 ('seasonal').
+
+    Returns:
+        (keys, valid): int64 array of the keys, and the boolean mask of the
+        valid dates
+    Raises:
+        ValueError if freq is not one of FREQUENCIES
+    """
+    _check_freq(freq)
+    months, valid = dates.month_numbers(date_column)
+    if freq == 'annual':
+        return months // 12, valid
+    if freq == 'decadal':
+        return (months // 12 + 1970) // 10 - 197, valid
+    # December opens the winter of the next year
+    return (months + 1) // 3, valid
+
+
+def period_dates(keys, freq, date_format='datetime'):
+    """Returns the Date column of the periods with the given keys.
+
+    Args:
+        keys (array like): Period keys of period_keys
+        freq (str): One of FREQUENCIES
+        date_format (str): Form of the Date column, see the dates module;
+                           seasons are monthly dates, the others yearly
+    """
+    _check_freq(freq)
+    keys = np.asarray(keys, dtype=np.int64)
+    if freq == 'annual':
+        return dates.make_dates(keys + 1970, date_format=date_format)
+    if freq == 'decadal':
+        return dates.make_dates((keys + 197) * 10, date_format=date_format)
+    months = keys * 3 - 1
+    return dates.make_dates(months // 12 + 1970, months % 12 + 1,
+                            date_format)
+
+
+def season_names(keys):
+    """Returns the DJF, MAM, JJA or SON name of seasonal period keys."""
+    return np.asarray(SEASONS)[np.asarray(keys, dtype=np.int64) % 4]
+
+
+def resample(df, column, freq='annual', min_count=1, date_format='datetime'):
+    """Averages df[column] over each period of freq.
+
+    Args:
+        df (dataframe): Dataframe with a Date column of any form of the
+                        dates module, usually monthly data
+        column (str): Name of the value column
+        freq (str): 'annual', 'decadal' or 'seasonal'
+        min_count (int): Fewest valid values of a kept period
+        date_format (str): Form of the returned Date column
+    Returns:
+        pandas dataframe with the columns Date and column, one row per kept
+        period in chronological order
+    Raises:
+        ValueError if freq or min_count is invalid
+    """
+    return resample_many({column: (df, column)}, freq, min_count,
+                         date_format)[column]
+
+
+def resample_many(frames, freq='annual', min_count=1,
+                  date_format='datetime'):
+    """Averages several dataframes over each period of freq in one pass.
+
+    Args:
+        frames (dict): {name: (dataframe, value column)}
+        freq (str): 'annual', 'decadal' or 'seasonal'
+        min_count (int): Fewest valid values of a kept period
+        date_format (str): Form of the returned Date columns
+    Returns:
+        OrderedDict of {name: (Date, value column) dataframe}, in the order
+        of frames
+    Raises:
+        ValueError if freq or min_count is invalid
+    """
+    _check_freq(freq)
+    dates.check_format(date_format)
+    if min_count < 1:
+        raise ValueError("Invalid min_count {!r}, expected at least 1"
+                         .format(min_count))
+    names = list(frames)
+    keys, values, sizes = [], [], []
+    for name in names:
+        df, column = frames[name]
+        frame_keys, valid = period_keys(df['Date'], freq)
+        frame_values = np.asarray(df[column].values, dtype=np.float64)
+        # invalid dates count as missing values
+        keys.append(frame_keys)
+        values.append(np.where(valid, frame_values, np.nan))
+        sizes.append(len(frame_keys))
+    keys = np.concatenate(keys) if keys else np.zeros(0, dtype=np.int64)
+    values = np.concatenate(values) if values else np.zeros(0)
+
+    valid = ~np.isnan(values)
+    first = keys[valid].min() if valid.any() else 0
+    span = keys[valid].max() - first + 1 if valid.any() else 0
+    # one bin per (dataframe, period)
+    source = np.repeat(np.arange(len(names)), sizes)
+    bins = source[valid] * span + (keys[valid] - first)
+    sums = np.bincount(bins, weights=values[valid],
+                       minlength=len(names) * span)
+    counts = np.bincount(bins, minlength=len(names) * span)
+
+    resampled = OrderedDict()
+    for index, name in enumerate(names):
+        column = frames[name][1]
+        own = slice(index * span, (index + 1) * span)
+        kept = np.flatnonzero(counts[own] >= min_count)
+        resampled[name] = pd.DataFrame({
+            'Date': period_dates(kept + first, freq, date_format),
+            column: sums[own][kept] / counts[own][kept]},
+            columns=['Date', column])
+    return resampled
+
+
+def _check_freq(freq):
+    if freq not in FREQUENCIES:
+        raise ValueError("Invalid freq {!r}, expected one of {}"
+                         .format(freq, FREQUENCIES))
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""rolling computes moving-window statistics of many sources at once.
+
+This python module contains the rolling function, which returns the moving
+mean, standard deviation, sum, count, minimum or maximum of a series over
+a trailing or centered window, and rolling_windows, which does the same for
+several windows sharing one pass over the data. The values may be a 1-D
+series or a 2-D array with one column per source, such as the array of the
+align module, and every column is computed at once.
+
+Each statistic takes linear time whatever the window: sums, counts and
+squares come from cumulative sums (of the values less their mean, to keep
+the precision of long series), and minima and maxima from the van Herk /
+Gil-Werman block algorithm, which needs only two cumulative maxima. NaN
+values are skipped, and a window with fewer than min_periods valid values
+gives NaN.
+
+Syntax
+from DegreesOfClimateChange import rolling
+rolling.rolling(df_noaa['Tanomaly_C'], 12, center=True)  --> 12 month mean
+smoothed = rolling.rolling_windows(values, [12, 60, 120], min_periods=1)
+smoothed[60]                            --> 5 year means of every column
+df = rolling.add_rolling(df_noaa, 'Tanomaly_C', [12, 120])
+df['Tanomaly_C_mean120']                --> 10 year means
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+
+
+STATISTICS = ('mean', 'std', 'sum', 'count', 'min', 'max')
+
+
+def rolling(values, window, statistic='mean', center=False, min_periods=None,
+            ddof=1):
+    """Returns the moving statistic of values over window rows.
+
+    Args:
+        values (array like): 1-D series, or 2-D array with one column per
+                             source
+        window (int): Rows of each window
+        statistic (str): One of STATISTICS
+        center (bool): Centered windows, as pandas rolling(center=True);
+                       trailing windows ending at each row otherwise
+        min_periods (int): Fewest valid values giving a result; defaults to
+                           window. 'count' is never NaN
+        ddof (int): Delta degrees of freedom of 'std'
+    Returns:
+        float numpy array of the shape of values
+    Raises:
+        ValueError if window, statistic or min_periods is invalid
+    """
+    return rolling_windows(values, [window], statistic, center, min_periods,
+                           ddof)[window]
+
+
+def rolling_windows(values, windows, statistic='mean', center=False,
+                    min_periods=None, ddof=1):
+    """Returns the moving statistic of values for each of several windows.
+
+    The cumulative sums are computed once and shared by all the windows.
+    Takes the arguments of rolling, with a list of windows; a min_periods
+    larger than a window is reduced to the window.
+
+    Returns:
+        OrderedDict of {window: float numpy array of the shape of values}
+    """
+    if statistic not in STATISTICS:
+        raise ValueError("Invalid statistic {!r}, expected one of {}"
+                         .format(statistic, STATISTICS))
+    for window in windows:
+        if int(window) != window or window < 1:
+            raise ValueError("Invalid window {!r}, expected a positive "
+                             "integer".format(window))
+    if min_periods is not None and min_periods < 1:
+        raise ValueError("Invalid min_periods {!r}, expected at least 1"
+                         .format(min_periods))
+    values = np.asarray(values, dtype=np.float64)
+    flat = values.ndim == 1
+    # one column per source, also when there are no rows
+    data = values[:, None] if flat else values
+    if center and len(windows):
+        # NaN rows after the end give the partial windows of the last rows
+        data = np.vstack([data, np.full(((max(windows) - 1) // 2,
+                                         data.shape[1]), np.nan)])
+
+    valid = ~np.isnan(data)
+    counts = _cumulative(valid.astype(np.float64))
+    if statistic in ('mean', 'std', 'sum'):
+        # sums of the values less the column means, to keep precision
+        n_valid = valid.sum(axis=0)
+        shift = (np.where(valid, data, 0.0).sum(axis=0) /
+                 np.maximum(n_valid, 1))
+        centered = np.where(valid, data - shift, 0.0)
+        sums = _cumulative(centered)
+        squares = _cumulative(centered ** 2) if statistic == 'std' else None
+
+    results = OrderedDict()
+    for window in windows:
+        window = int(window)
+        needed = window if min_periods is None else min(min_periods, window)
+        count = _window(counts, window)
+        if statistic == 'count':
+            result = count
+        elif statistic in ('mean', 'sum', 'std'):
+            total = _window(sums, window)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                if statistic == 'mean':
+                    result = total / count + shift
+                elif statistic == 'sum':
+                    result = total + count * shift
+                else:
+                    spread = _window(squares, window) - total ** 2 / count
+                    result = np.sqrt(np.maximum(spread, 0.0) /
+                                     (count - ddof))
+                    result[count <= ddof] = np.nan
+        else:
+            result = _extreme(data, valid, window, statistic)
+        if statistic != 'count':
+            result = np.where(count >= needed, result, np.nan)
+        if center:
+            offset = (window - 1) // 2
+            result = result[offset:offset + len(values)]
+        results[window] = result[:, 0] if flat else result
+    return results
+
+
+def add_rolling(df, column, windows, statistic='mean', center=True,
+                min_periods=None):
+    """Returns a copy of df with the moving statistic of df[column] for each
+    window, in columns named '<column>_<statistic><window>'."""
+    df = df.copy()
+    smoothed = rolling_windows(df[column].values, windows, statistic, center,
+                               min_periods)
+    for window, result in smoothed.items():
+        df['{}_{}{}'.format(column, statistic, window)] = result
+    return df
+
+
+def _cumulative(data):
+    """Cumulative sums along the rows, with a leading row of zeros."""
+    cumulative = np.zeros((len(data) + 1, data.shape[1]))
+    np.cumsum(data, axis=0, out=cumulative[1:])
+    return cumulative
+
+
+def _window(cumulative, window):
+    """Sums over the trailing windows, from the cumulative sums."""
+    starts = np.maximum(np.arange(1, len(cumulative)) - window, 0)
+    return cumulative[1:] - cumulative[starts]
+
+
+def _extreme(data, valid, window, statistic):
+    """Trailing moving minimum or maximum by the van Herk / Gil-Werman
+    algorithm: the extreme of a window spanning two blocks of window rows is
+    that of the suffix of the first block and the prefix of the second."""
+    accumulate = np.maximum if statistic == 'max' else np.minimum
+    fill = -np.inf if statistic == 'max' else np.inf
+    n_rows, n_columns = data.shape
+    # window - 1 filler rows before the data, then whole blocks
+    padded_rows = -(-(n_rows + window - 1) // window) * window
+    padded = np.full((padded_rows, n_columns), fill)
+    padded[window - 1:window - 1 + n_rows] = np.where(valid, data, fill)
+    blocks = padded.reshape(-1, window, n_columns)
+    prefix = accumulate.accumulate(blocks, axis=1).reshape(padded_rows,
+                                                           n_columns)
+    suffix = accumulate.accumulate(blocks[:, ::-1], axis=1)[:, ::-1]
+    suffix = suffix.reshape(padded_rows, n_columns)
+    rows = np.arange(n_rows)
+    return accumulate(suffix[rows], prefix[rows + window - 1])
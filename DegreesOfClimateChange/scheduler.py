@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+"""scheduler keeps the registered sources warm with background refreshes.
+
+This python module contains the RefreshScheduler class that holds the latest
+dataframe of every registered source (see the sources module) in memory and
+refreshes each of them in background threads, every refresh interval of the
+source. Callers are served the last good copy at once, with the time it was
+fetched, while a refresh runs (stale-while-revalidate); only the very first
+request for a source that has no copy yet waits for a download.
+
+A refresh that fails keeps the previous copy and is retried after a backoff
+that doubles with each consecutive failure, up to MAX_BACKOFF seconds.
+
+Syntax
+from DegreesOfClimateChange.scheduler import RefreshScheduler
+scheduler = RefreshScheduler(intervals={'NOAA': 3600})
+scheduler.start()
+snapshot = scheduler.get('WorldBank')   --> last good copy, at once
+snapshot.frame                          --> dataframe of grab_worldbank
+snapshot.fetched_at                     --> datetime of the download
+snapshot.stale                          --> True if older than the interval
+scheduler.status()                      --> state of every source
+scheduler.stop()
+
+With a ClimateStore, the scheduler starts from the latest snapshot of each
+source on disk and stores every refreshed copy, so that a restarted
+dashboard serves data immediately.
+"""
+
+import datetime
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from . import dates
+from . import sources
+
+
+# seconds between refreshes, by native resolution of the source
+INTERVALS = {'monthly': 24 * 3600, 'yearly': 7 * 24 * 3600}
+BACKOFF = 60.0  # seconds before retrying a failed refresh, doubled each time
+MAX_BACKOFF = 6 * 3600  # longest wait between retries
+
+
+class Snapshot(object):
+    """Last good copy of a source, as returned by RefreshScheduler.get.
+
+    Attributes:
+        name (str): Name of the source
+        frame (dataframe): Latest data, None if no refresh succeeded yet.
+                           Shared by every caller: copy it before changing it
+        fetched_at (datetime): Time frame was downloaded, or None
+        stale (bool): True if frame is older than the refresh interval
+        refreshing (bool): True while a refresh of the source runs
+        failures (int): Consecutive failed refreshes
+        error (str): Message of the last failure, None after a success
+    """
+
+    def __init__(self, name, frame, fetched_at, stale, refreshing, failures,
+                 error):
+        self.name = name
+        self.frame = frame
+        self.fetched_at = fetched_at
+        self.stale = stale
+        self.refreshing = refreshing
+        self.failures = failures
+        self.error = error
+
+    def __repr__(self):
+        return "Snapshot({!r}, fetched_at={}, stale={}, refreshing={})".format(
+            self.name, self.fetched_at, self.stale, self.refreshing)
+
+
+class _Entry(object):
+    """Mutable state of one source; guarded by the scheduler lock."""
+
+    def __init__(self, source, interval):
+        self.source = source
+        self.interval = interval
+        self.frame = None
+        self.fetched = None  # time.time() of the download
+        self.failures = 0
+        self.error = None
+        self.next_due = 0.0  # time.time() of the next refresh
+        self.future = None  # running refresh
+
+
+class RefreshScheduler(object):
+    """Background refresher of the registered sources (see module).
+
+    Args:
+        names (list): Names of the sources kept warm; defaults to every
+                      registered source
+        intervals (dict): {source name: seconds between refreshes}; sources
+                          not listed use INTERVALS of their resolution
+        store (ClimateStore): Snapshots to start from and to write every
+                              refreshed copy to; None keeps them in memory
+        date_format (str): Form of the Date columns, see the dates module
+        max_workers (int): Sources refreshed at once; defaults to all
+        backoff (float): Seconds before the first retry after a failure
+        max_backoff (float): Longest wait between retries
+    """
+
+    def __init__(self, names=None, intervals=None, store=None,
+                 date_format='string', max_workers=None, backoff=BACKOFF,
+                 max_backoff=MAX_BACKOFF):
+        dates.check_format(date_format)
+        if names is None:
+            names = sources.source_names()
+        intervals = intervals or {}
+        self.store = store
+        self.date_format = date_format
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._entries = OrderedDict()
+        for name in names:
+            source = sources.get_source(name)
+            interval = intervals.get(name, INTERVALS[source.resolution])
+            if interval <= 0:
+                raise ValueError("Invalid interval {!r} for {}".format(
+                    interval, name))
+            self._entries[name] = _Entry(source, interval)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or max(1, len(self._entries)))
+        if store is not None:
+            self._load_store()
+
+    def _load_store(self):
+        """Starts every source from its latest snapshot in the store."""
+        for name, entry in self._entries.items():
+            if not self.store.versions(name):
+                continue
+            try:
+                frame = self.store.read(name, date_format=self.date_format)
+                fetched_at = pd.Timestamp(self.store.info(name)['fetched_at'])
+            except Exception as error:
+                print("Warning: cannot read the stored copy of {}: {}"
+                      .format(name, error))
+                continue
+            entry.frame = frame
+            entry.fetched = time.mktime(fetched_at.timetuple())
+            entry.next_due = entry.fetched + entry.interval
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+        return False
+
+    def start(self):
+        """Starts the background thread refreshing the sources when due."""
+        with self._lock:
+            if self._stopped.is_set():
+                raise RuntimeError("A stopped scheduler cannot be restarted")
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop,
+                                            name='RefreshScheduler')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self, wait=True):
+        """Stops the background thread for good; with wait, also waits for
+        the refreshes already running."""
+        self._stopped.set()
+        self._wake.set()
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join()
+        self._executor.shutdown(wait=wait)
+
+    def _loop(self):
+        while not self._stopped.is_set():
+            now = time.time()
+            with self._lock:
+                for entry in self._entries.values():
+                    if entry.future is None and entry.next_due <= now:
+                        self._submit(entry)
+                waiting = [entry.next_due for entry in self._entries.values()
+                           if entry.future is None]
+            self._wake.wait(max(0.0, min(waiting) - now) if waiting else None)
+            self._wake.clear()
+
+    def _submit(self, entry):
+        """Starts a refresh of entry; called with the lock held."""
+        if entry.future is None and not self._stopped.is_set():
+            entry.future = self._executor.submit(self._refresh, entry)
+        return entry.future
+
+    def _refresh(self, entry):
+        name = entry.source.name
+        df, report = sources.grab_one(name, self.date_format)
+        now = time.time()
+        if df is not None and self.store is not None:
+            try:
+                self.store.write(name, df,
+                                 fetched_at=datetime.datetime.now())
+            except Exception as error:
+                print("Warning: cannot store the refreshed copy of {}: {}"
+                      .format(name, error))
+        with self._lock:
+            if df is not None:
+                entry.frame = df
+                entry.fetched = now
+                entry.failures = 0
+                entry.error = None
+                entry.next_due = now + entry.interval
+            else:
+                # keep the last good copy and retry later
+                entry.failures += 1
+                entry.error = report['error']
+                entry.next_due = now + min(
+                    self.max_backoff,
+                    self.backoff * 2 ** (entry.failures - 1))
+            entry.future = None
+        self._wake.set()
+        return report
+
+    def _snapshot(self, name, entry, now):
+        return Snapshot(
+            name, entry.frame,
+            (datetime.datetime.fromtimestamp(entry.fetched)
+             if entry.fetched is not None else None),
+            entry.fetched is None or now - entry.fetched > entry.interval,
+            entry.future is not None, entry.failures, entry.error)
+
+    def get(self, name, timeout=None):
+        """Returns the Snapshot of the last good copy of source name.
+
+        A source whose copy is stale is refreshed in the background, unless
+        it is backing off after a failure; the stale copy is returned at
+        once. A source without any copy yet is refreshed and waited for.
+
+        Args:
+            name (str): Name of the source
+            timeout (float): Seconds to wait when there is no copy yet; 0
+                             returns at once, None waits for the download
+        Returns:
+            Snapshot, whose frame is None if no copy could be obtained
+        Raises:
+            KeyError if the scheduler does not hold source name
+        """
+        entry = self._entries[name]
+        now = time.time()
+        with self._lock:
+            if entry.frame is None:
+                future = self._submit(entry)
+            else:
+                if now - entry.fetched > entry.interval and \
+                        entry.next_due <= now:
+                    self._submit(entry)
+                future = None
+        if future is not None and timeout != 0:
+            try:
+                future.result(timeout)
+            except Exception:
+                pass  # timeout; the refresh goes on in the background
+        with self._lock:
+            return self._snapshot(name, entry, time.time())
+
+    def refresh(self, name, wait=False):
+        """Refreshes source name now, unless a refresh is already running.
+
+        Returns:
+            the refresh report of the sources module ({'status', 'seconds',
+            'rows', 'error'}) if wait, else the Future of the refresh
+        """
+        entry = self._entries[name]
+        with self._lock:
+            future = self._submit(entry)
+        if future is None:
+            raise RuntimeError("The scheduler is stopped")
+        return future.result() if wait else future
+
+    def status(self):
+        """Dictionary of {source name: {'fetched_at', 'stale',
+        'refreshing', 'failures', 'error', 'next_refresh'}}."""
+        now = time.time()
+        status = OrderedDict()
+        with self._lock:
+            for name, entry in self._entries.items():
+                snapshot = self._snapshot(name, entry, now)
+                status[name] = {
+                    'fetched_at': snapshot.fetched_at,
+                    'stale': snapshot.stale,
+                    'refreshing': snapshot.refreshing,
+                    'failures': snapshot.failures,
+                    'error': snapshot.error,
+                    'next_refresh': datetime.datetime.fromtimestamp(
+                        entry.next_due)}
+        return status
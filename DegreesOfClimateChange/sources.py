@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+"""sources registers every data source and retrieves them all at once.
+
+This python module contains the Source class describing one data source (its
+grab function, value column, units, anomaly or absolute values, native time
+resolution and upstream host) and a registry holding the sources of the
+package. grab_all runs the grab functions of the registered sources
+concurrently and returns their dataframes together with a report of the time
+taken and the outcome of each source; a source that fails or is slow does
+not hold back or break the others. grab_one retrieves a single source the
+same way.
+
+Syntax
+from DegreesOfClimateChange import sources
+frames, report = sources.grab_all()
+frames['NOAA']                          --> dataframe of grab_noaa
+frames, report = sources.grab_all(store=ClimateStore())  --> from disk
+report['NOAA']                          --> {'status': 'ok', 'seconds': ...}
+df, entry = sources.grab_one('NOAA')    --> a single source
+sources.get_source('Berkeley').units    --> 'deg C'
+
+Adding an agency (research question 3 of doc/UseCases.md) only takes a grab
+function returning a (Date, value) dataframe and its registration:
+
+sources.register_source(sources.Source(
+    'HadCRUT', 'mypackage.grab_hadcrut:grab_hadcrut', 'Tanomaly_C',
+    units='deg C', kind='anomaly', resolution='monthly',
+    host='www.metoffice.gov.uk'))
+
+after which grab_all retrieves it along with the other sources.
+"""
+
+import importlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from . import dates
+
+
+KINDS = ('anomaly', 'absolute')
+RESOLUTIONS = ('monthly', 'yearly')
+
+
+class Source(object):
+    """Metadata and grab function of one data source.
+
+    Args:
+        name (str): Name of the source, e.g. 'NOAA'
+        grab: Grab function, or its 'module:function' path; module paths
+              starting with '.' are relative to this package. The function
+              must accept a date_format keyword argument
+        column (str): Name of the value column of the returned dataframe
+        units (str): Units of the values, e.g. 'deg C' or 'ppm'
+        kind (str): 'anomaly' for deviations from a baseline average, or
+                    'absolute'
+        resolution (str): Native time resolution, 'monthly' or 'yearly'
+        host (str): Upstream host the data is downloaded from
+        baseline (tuple): (first year, last year) of the reference period
+                          of anomalies; None if unknown or absolute
+    """
+
+    def __init__(self, name, grab, column, units, kind, resolution, host,
+                 baseline=None):
+        if kind not in KINDS:
+            raise ValueError("Invalid kind {!r}, expected one of {}"
+                             .format(kind, KINDS))
+        if resolution not in RESOLUTIONS:
+            raise ValueError("Invalid resolution {!r}, expected one of {}"
+                             .format(resolution, RESOLUTIONS))
+        self.name = name
+        self._grab = grab
+        self.column = column
+        self.units = units
+        self.kind = kind
+        self.resolution = resolution
+        self.host = host
+        self.baseline = baseline
+
+    def __repr__(self):
+        return "Source({!r}, {}, {}, {})".format(
+            self.name, self.column, self.kind, self.resolution)
+
+    @property
+    def grab(self):
+        """The grab function, imported on first use if given as a path."""
+        if not callable(self._grab):
+            module_name, function_name = self._grab.split(':')
+            module = importlib.import_module(module_name, __package__)
+            self._grab = getattr(module, function_name)
+        return self._grab
+
+
+_sources = OrderedDict()
+_sources_lock = threading.Lock()
+
+
+def register_source(source, replace=False):
+    """Adds source to the registry used by grab_all.
+
+    Raises:
+        ValueError if a source of the same name exists and not replace
+    """
+    with _sources_lock:
+        if source.name in _sources and not replace:
+            raise ValueError("Source already registered: " + source.name)
+        _sources[source.name] = source
+
+
+def unregister_source(name):
+    """Removes the source called name from the registry."""
+    with _sources_lock:
+        del _sources[name]
+
+
+def get_source(name):
+    """Returns the registered Source called name; KeyError if unknown."""
+    with _sources_lock:
+        return _sources[name]
+
+
+def source_names():
+    """List of the names of the registered sources, in registration order."""
+    with _sources_lock:
+        return list(_sources.keys())
+
+
+def _run(source, date_format, store, refresh):
+    """Runs the grab function of source, or reads its snapshot from store,
+    and returns (dataframe, report)."""
+    start = time.perf_counter()
+    try:
+        if store is not None:
+            df = store.grab(source.name, refresh=refresh,
+                            date_format=date_format)
+        else:
+            df = source.grab(date_format=date_format)
+    except Exception as error:
+        return None, {'status': 'failed',
+                      'seconds': time.perf_counter() - start,
+                      'rows': 0,
+                      'error': "{}: {}".format(type(error).__name__, error)}
+    return df, {'status': 'ok',
+                'seconds': time.perf_counter() - start,
+                'rows': len(df),
+                'error': None}
+
+
+def grab_one(name, date_format='string', store=None, refresh=False):
+    """Retrieves the single registered source called name.
+
+    Takes the arguments of grab_all. A failing grab function does not raise
+    but is reported, as by grab_all.
+
+    Returns:
+        (dataframe, report) tuple where dataframe is None if the source
+        failed and report is its {'status': 'ok' or 'failed', 'seconds',
+        'rows', 'error'} dictionary of the grab_all report
+    Raises:
+        KeyError if no source is called name
+    """
+    dates.check_format(date_format)
+    return _run(get_source(name), date_format, store, refresh)
+
+
+def grab_all(sources=None, max_workers=None, timeout=None,
+             date_format='string', store=None, refresh=False):
+    """Retrieves the registered sources concurrently.
+
+    Args:
+        sources (list): Names of the sources to retrieve; defaults to every
+                        registered source
+        max_workers (int): Number of sources retrieved at once; defaults to
+                           all of them
+        timeout (float): Seconds to wait for the sources; sources still
+                         running then are reported with status 'timeout'
+                         and finish in the background, and sources still
+                         queued for a worker are cancelled and reported
+                         with status 'cancelled'. None waits for all
+        date_format (str): Form of the Date columns, see the dates module
+        store (ClimateStore): Read each source from its latest snapshot in
+                              store, grabbing and storing it only when it
+                              has none
+        refresh (bool): With a store, grab every source again and store
+                        the results as new versions
+    Returns:
+        (frames, report) tuple where frames is a dictionary of
+        {source name: dataframe} of the sources retrieved successfully and
+        report is a dictionary of {source name: {'status': 'ok', 'failed',
+        'timeout' or 'cancelled', 'seconds': float, 'rows': int, 'error':
+        message or None}}
+    """
+    dates.check_format(date_format)
+    if sources is None:
+        sources = source_names()
+    selected = [get_source(name) for name in sources]
+    frames, report = {}, {}
+    if not selected:
+        return frames, report
+
+    start = time.perf_counter()
+    executor = ThreadPoolExecutor(max_workers=max_workers or len(selected))
+    futures = OrderedDict((executor.submit(_run, source, date_format, store,
+                                            refresh), source)
+                          for source in selected)
+    done, _ = wait(futures, timeout=timeout)
+    # queued sources never start once the call has returned
+    cancelled = set(future for future in futures
+                    if future not in done and future.cancel())
+    executor.shutdown(wait=False)
+    for future, source in futures.items():
+        if future in done:
+            df, report[source.name] = future.result()
+            if df is not None:
+                frames[source.name] = df
+        else:
+            status = 'cancelled' if future in cancelled else 'timeout'
+            report[source.name] = {
+                'status': status,
+                'seconds': time.perf_counter() - start,
+                'rows': 0,
+                'error': "never started" if status == 'cancelled' else None}
+    return frames, report
+
+
+for _source in [
+        Source('NOAA', '.grab_noaa:grab_noaa', 'Tanomaly_C',
+               units='deg C', kind='anomaly', resolution='monthly',
+               host='www.ncdc.noaa.gov', baseline=(1901, 2000)),
+        Source('Berkeley', '.grab_berkeley:grab_berkeley', 'Tanomaly_C',
+               units='deg C', kind='anomaly', resolution='monthly',
+               host='berkeleyearth.lbl.gov', baseline=(1951, 1980)),
+        Source('WorldBank', '.grab_worldbank:grab_worldbank', 'Tabsolute_C',
+               units='deg C', kind='absolute', resolution='yearly',
+               host='climatedataapi.worldbank.org'),
+        Source('Scripps', '.grab_co2_scripps:grab_scripps_co2_data', 'CO2',
+               units='ppm', kind='absolute', resolution='yearly',
+               host='scrippsco2.ucsd.edu')]:
+    register_source(_source)
+del _source
@@ -0,0 +1,112 @@
+"""Local stand-in HTTP server for offline unit tests
+
+This Python module starts a small threaded HTTP server on localhost that
+serves canned responses in place of the upstream data hosts. Tests register
+the body for each path, and optionally a delay to imitate the round trip time
+of the real host, then point the grab functions at the server's base url.
+HEAD requests and single byte range requests are answered as well, unless
+ranges=False imitates a host that ignores the Range header.
+
+(class) StandinServer
+    Context manager wrapping the threaded server. Every request received is
+    recorded in the requests attribute as (method, path, headers) tuples.
+"""
+
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+
+class _ThreadingServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    request_queue_size = 64  # tests open many connections at once
+
+    def handle_error(self, request, client_address):
+        # a client that timed out has closed the connection; not an error
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            HTTPServer.handle_error(self, request, client_address)
+
+
+class StandinServer(object):
+    """Threaded localhost server returning registered bodies by path."""
+
+    def __init__(self, routes=None, delay=0.0, ranges=True):
+        self.routes = dict(routes or {})
+        self.delay = delay
+        self.ranges = ranges
+        self.requests = []
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address
+        return "http://{}:{}".format(host, port)
+
+    def url(self, path):
+        return self.base_url + path
+
+    def __enter__(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_HEAD(self):
+                self._handle("HEAD")
+
+            def _handle(self, method):
+                with standin._lock:
+                    standin.requests.append((method, self.path,
+                                             dict(self.headers)))
+                time.sleep(standin.delay)
+                route = standin.routes.get(self.path)
+                if route is None:
+                    self._respond(method, 404, b"not found", {})
+                    return
+                if callable(route):
+                    status, body, headers = route(self)
+                else:
+                    status, body, headers = 200, route, {}
+                if isinstance(body, str):
+                    body = body.encode("utf-8")
+                byte_range = self.headers.get("Range")
+                if standin.ranges and byte_range and status == 200:
+                    status, body = self._slice(body, byte_range)
+                self._respond(method, status, body, headers)
+
+            @staticmethod
+            def _slice(body, byte_range):
+                start, end = byte_range.split("=")[1].split("-")
+                end = int(end) if end else len(body) - 1
+                return 206, body[int(start):end + 1]
+
+            def _respond(self, method, status, body, headers):
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if method != "HEAD":
+                    self.wfile.write(body)
+
+        self._server = _ThreadingServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        args=(0.05,))
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
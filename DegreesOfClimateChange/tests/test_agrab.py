@@ -0,0 +1,148 @@
+"""Unit test for the asyncio versions of the grab functions
+
+This Python module contains multiple unit test functions to verify the
+agrab_noaa, agrab_berkeley, agrab_scripps_co2_data and agrab_worldbank
+coroutines and the asynchronous downloads of the transport module. Tests
+include verifying that each coroutine returns the same dataframe as its
+blocking grab function and reports the same instrument stages, that the
+number of requests in flight respects the concurrency limit, and that the
+event loop keeps running during downloads.
+
+(class) TestAsyncGrab
+    Python class for unit testing the coroutine grab functions.
+"""
+
+import asyncio
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from pandas.testing import assert_frame_equal
+
+from DegreesOfClimateChange import http_cache
+from DegreesOfClimateChange import instrument
+from DegreesOfClimateChange import transport
+from DegreesOfClimateChange.grab_berkeley import agrab_berkeley, grab_berkeley
+from DegreesOfClimateChange.grab_co2_scripps import (agrab_scripps_co2_data,
+                                                     grab_scripps_co2_data)
+from DegreesOfClimateChange.grab_noaa import agrab_noaa, grab_noaa
+from DegreesOfClimateChange.grab_worldbank import (agrab_worldbank,
+                                                   grab_worldbank)
+from DegreesOfClimateChange.tests.http_standin import StandinServer
+from DegreesOfClimateChange.tests.upstream_fixtures import upstream
+
+
+def run(coroutine):
+    """Runs coroutine to completion in a new event loop"""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+class TestAsyncGrab(unittest.TestCase):
+    """ Unit tests for validating the coroutine grab functions"""
+
+    def setUp(self):
+        """ natively called by the Python unittesting framework """
+        self.saved_cache = http_cache.get_cache()
+        http_cache.set_cache(None)
+
+    def tearDown(self):
+        """ natively called by the Python unittesting framework """
+        http_cache.set_cache(self.saved_cache)
+
+    def test_same_frames_as_blocking(self):
+        with upstream():
+            assert_frame_equal(run(agrab_noaa(limit=4)), grab_noaa())
+            assert_frame_equal(run(agrab_berkeley(date_format='datetime')),
+                               grab_berkeley(date_format='datetime'))
+            df_async, stations_async = run(agrab_scripps_co2_data(
+                by_station=True))
+            df, stations = grab_scripps_co2_data(by_station=True)
+            assert_frame_equal(df_async, df)
+            assert_frame_equal(stations_async, stations)
+            assert_frame_equal(run(agrab_worldbank(1990, 2000, limit=4)),
+                               grab_worldbank(1990, 2000))
+
+    def test_same_stages_as_blocking(self):
+        with upstream():
+            with instrument.collecting() as collector:
+                run(agrab_worldbank(1990, 2000, limit=4))
+            with instrument.collecting() as expected:
+                grab_worldbank(1990, 2000)
+        names = [event['stage'] for event in collector.events]
+        self.assertEqual(names, [event['stage'] for event in expected.events])
+        download, = collector.select('worldbank.download')
+        self.assertEqual(download['failed'],
+                         expected.select('worldbank.download')[0]['failed'])
+
+    def test_parse_executor(self):
+        executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            with upstream():
+                df = run(agrab_noaa(executor=executor))
+        finally:
+            executor.shutdown()
+        self.assertEqual(list(df.columns), ['Date', 'Tanomaly_C'])
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            run(agrab_worldbank(1800))
+        with self.assertRaises(ValueError):
+            run(agrab_noaa(date_format='julian'))
+
+    def test_concurrency_limit(self):
+        delay = 0.1
+        routes = {"/{}.csv".format(k): str(k) for k in range(6)}
+        in_flight = [0, 0]  # current, highest
+        lock = threading.Lock()
+
+        def counting_fetch(url):
+            with lock:
+                in_flight[0] += 1
+                in_flight[1] = max(in_flight)
+            try:
+                return transport.fetch_text(url)[0]
+            finally:
+                with lock:
+                    in_flight[0] -= 1
+
+        with StandinServer(routes, delay=delay) as server:
+            urls = [server.url("/{}.csv".format(k)) for k in range(6)]
+            texts = run(transport.amap(counting_fetch, urls, limit=2))
+            self.assertEqual(texts, [str(k) for k in range(6)])
+            self.assertEqual(in_flight[1], 2)
+            responses = run(transport.afetch_many(urls))
+        self.assertEqual([text for text, _ in responses],
+                         [str(k) for k in range(6)])
+        self.assertEqual(run(transport.amap(len, [])), [])
+
+    def test_loop_not_blocked(self):
+        delay = 0.3
+        ticks = []
+
+        async def ticker():
+            for _ in range(5):
+                ticks.append(time.perf_counter())
+                await asyncio.sleep(0.02)
+
+        async def main(url):
+            results = await asyncio.gather(transport.afetch_bytes(url),
+                                           ticker())
+            return results[0]
+
+        with StandinServer({"/a.txt": "abc"}, delay=delay) as server:
+            start = time.perf_counter()
+            body, latency = run(main(server.url("/a.txt")))
+        self.assertEqual(body, b"abc")
+        self.assertGreaterEqual(latency, delay)
+        # the ticker ran while the request was waiting on the server
+        self.assertEqual(len(ticks), 5)
+        self.assertLess(ticks[-1] - start, delay)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+"""Unit test for align.py
+
+This Python module contains multiple unit test functions to verify the
+execution of the align.py module. Tests include verifying the inner and
+outer joins of several series against a set intersection, the NaN fill of
+missing values, the rejection of repeated dates, and the alignment of
+monthly and yearly dataframes at a common frequency.
+
+(class) TestAlign
+    Python class for unit testing the align.py module.
+"""
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from DegreesOfClimateChange import align
+from DegreesOfClimateChange import dates
+
+
+class TestAlign(unittest.TestCase):
+    """ Unit tests for validating align.py module"""
+
+    def test_joins(self):
+        rng = np.random.RandomState(3)
+        series = []
+        for _ in range(12):
+            xs = rng.choice(200, size=150, replace=False).astype(float)
+            series.append((xs, xs * 10 + len(series)))
+        index, values = align.align(series)
+        common = sorted(set.intersection(*[set(xs) for xs, _ in series]))
+        self.assertEqual(list(index), common)
+        self.assertEqual(values.shape, (len(common), 12))
+        np.testing.assert_allclose(values[:, 5], index * 10 + 5)
+
+        index, values = align.align(series, join='outer')
+        self.assertEqual(list(index),
+                         sorted(set.union(*[set(xs) for xs, _ in series])))
+        present = np.isin(index, series[0][0])
+        self.assertTrue(np.isnan(values[~present, 0]).all())
+        np.testing.assert_allclose(values[present, 0], index[present] * 10)
+
+    def test_invalid_series(self):
+        self.assertRaises(ValueError, align.align, [([1, 2, 2], [0, 1, 2])])
+        self.assertRaises(ValueError, align.align, [([1, 2], [0])])
+        self.assertRaises(ValueError, align.align, [([1], [0])], 'left')
+        index, values = align.align([])
+        self.assertEqual((len(index), values.shape), (0, (0, 0)))
+
+    def test_frames(self):
+        months = np.arange(36)
+        noaa = pd.DataFrame({
+            'Date': dates.make_dates(2000 + months // 12, months % 12 + 1),
+            'Tanomaly_C': months / 10.0})
+        co2 = pd.DataFrame({'Date': dates.make_dates([2001, 2002, 2003]),
+                            'CO2': [370.0, 372.0, 374.0]})
+        frames = {'NOAA': (noaa, 'Tanomaly_C'), 'Scripps': (co2, 'CO2')}
+        # without harmonization only the Januaries of NOAA meet the CO2
+        index, values = align.align_frames(frames, date_format='string')
+        self.assertEqual(list(index), ['2001-1-01', '2002-1-01'])
+        np.testing.assert_allclose(values[:, 0], [1.2, 2.4])
+
+        index, values = align.align_frames(frames, join='outer',
+                                           freq='annual',
+                                           date_format='string')
+        self.assertEqual(list(index), ['2000-01-01', '2001-01-01',
+                                       '2002-01-01', '2003-01-01'])
+        np.testing.assert_allclose(values[:3, 0], [0.55, 1.75, 2.95])
+        self.assertTrue(np.isnan(values[0, 1]))
+        self.assertTrue(np.isnan(values[3, 0]))
+
+
+if __name__ == '__main__':
+    unittest.main()
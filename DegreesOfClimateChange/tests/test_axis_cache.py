@@ -0,0 +1,108 @@
+"""Unit test for axis_cache.py
+
+This Python module contains multiple unit test functions to verify the
+execution of the axis_cache.py module. Tests include verifying that axes are
+computed once and then loaded memory mapped, that changed data or parameters
+give new entries, that the number of entries is bounded, and that the plot
+functions reuse the cached axes.
+
+(class) TestAxisCache
+    Python class for unit testing the AxisCache class and the cached_axes
+    function in the axis_cache.py module.
+"""
+
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from DegreesOfClimateChange import axis_cache
+from DegreesOfClimateChange import dates
+from DegreesOfClimateChange.plot_functions import plot_each_absolute_temperature
+
+
+def monthly_frame(n_years, offset=0.0):
+    """Monthly (Date, Tanomaly_C) dataframe starting in January 1950"""
+    months = np.arange(12 * n_years)
+    return pd.DataFrame({
+        'Date': dates.make_dates(1950 + months // 12, months % 12 + 1),
+        'Tanomaly_C': months / 100.0 + offset})
+
+
+class TestAxisCache(unittest.TestCase):
+    """ Unit tests for validating axis_cache.py module"""
+
+    def setUp(self):
+        """ natively called by the Python unittesting framework """
+        self.directory = tempfile.mkdtemp()
+        self.saved_cache = axis_cache.get_axis_cache()
+        axis_cache.set_axis_cache(axis_cache.AxisCache(self.directory))
+
+    def tearDown(self):
+        """ natively called by the Python unittesting framework """
+        axis_cache.set_axis_cache(self.saved_cache)
+        shutil.rmtree(self.directory)
+
+    def test_compute_once(self):
+        """Axes are computed on the first call and memory mapped after"""
+        df = monthly_frame(3)
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return dates.to_plot_dates(df['Date']), df['Tanomaly_C'].values
+        x, y = axis_cache.cached_axes('raw', df, 'Tanomaly_C', compute)
+        x2, y2 = axis_cache.cached_axes('raw', df, 'Tanomaly_C', compute)
+        self.assertEqual(len(calls), 1)
+        self.assertIsInstance(x2, np.memmap)
+        np.testing.assert_array_equal(x2, dates.to_plot_dates(df['Date']))
+        np.testing.assert_array_equal(y2, df['Tanomaly_C'].values)
+
+        # the arrays are writable, and writing leaves the cache as it was
+        y2 += 1.0
+        _, y3 = axis_cache.cached_axes('raw', df, 'Tanomaly_C', compute)
+        np.testing.assert_array_equal(y3, df['Tanomaly_C'].values)
+
+        axis_cache.cached_axes('raw', monthly_frame(3, 0.1), 'Tanomaly_C',
+                               compute)
+        axis_cache.cached_axes('raw', df, 'Tanomaly_C', compute, 1.0)
+        self.assertEqual(len(calls), 3)
+
+    def test_bounded_and_disabled(self):
+        """Old entries are evicted, and no cache computes every time"""
+        cache = axis_cache.AxisCache(self.directory, max_entries=2)
+        for k in range(4):
+            cache.get(('raw', k), lambda: ([1.0, 2.0], [3.0, 4.0]))
+        self.assertEqual(len(cache._entries()), 2)
+        cache.clear()
+        self.assertEqual(cache._entries(), [])
+
+        axis_cache.set_axis_cache(None)
+        x, y = axis_cache.cached_axes('raw', monthly_frame(1), 'Tanomaly_C',
+                                      lambda: ([1.0], [2.0]))
+        self.assertEqual(list(x), [1.0])
+
+    def test_plot_reuses_axes(self):
+        """Plotting the same data again does not convert any dates"""
+        df = monthly_frame(5)
+        df_wb = pd.DataFrame({'Date': dates.make_dates([1950, 1951]),
+                              'Tabsolute_C': [19.0, 19.2]})
+        first = plot_each_absolute_temperature(df, df, df_wb, False)
+        with mock.patch.object(dates, 'to_plot_dates',
+                               side_effect=AssertionError('converted')):
+            second = plot_each_absolute_temperature(df, df, df_wb, False)
+        for agency in first[1]:
+            np.testing.assert_array_equal(first[1][agency],
+                                          second[1][agency])
+            np.testing.assert_array_equal(first[0][agency],
+                                          second[0][agency])
+        # 1950 mean, less the 1950-1951 mean, plus the World Bank 1950-1951
+        # mean
+        self.assertAlmostEqual(second[0]['NOAA'][0], 0.055 - 0.115 + 19.1)
+
+
+if __name__ == '__main__':
+    unittest.main()
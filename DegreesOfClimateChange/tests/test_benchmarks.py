@@ -0,0 +1,107 @@
+"""Unit test for benchmarks.py
+
+This Python module contains multiple unit test functions to verify the
+execution of the benchmarks.py module. Tests include running a filtered set
+of benchmarks offline, saving and reading the history file, and flagging
+only the benchmarks that slowed down beyond the threshold.
+
+(class) TestBenchmarks
+    Python class for unit testing the benchmarks.py module.
+"""
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+from DegreesOfClimateChange import benchmarks
+
+
+def run_of(**medians):
+    """History record with the given median seconds per benchmark"""
+    return {'results': dict((name, {'median': median, 'min': median,
+                                    'repeat': 1})
+                            for name, median in medians.items())}
+
+
+class TestBenchmarks(unittest.TestCase):
+    """ Unit tests for validating benchmarks.py module"""
+
+    def setUp(self):
+        """ natively called by the Python unittesting framework """
+        self.directory = tempfile.mkdtemp()
+        self.history = os.path.join(self.directory, 'history.jsonl')
+
+    def tearDown(self):
+        """ natively called by the Python unittesting framework """
+        shutil.rmtree(self.directory)
+
+    def test_every_stage_is_covered(self):
+        names = [benchmark.name
+                 for benchmark in benchmarks.all_benchmarks(sizes=(12,))]
+        for stage in ['noaa.download', 'noaa.parse', 'noaa.clean',
+                      'berkeley.download', 'berkeley.parse',
+                      'berkeley.clean', 'scripps.download', 'scripps.parse',
+                      'scripps.clean', 'scripps.aggregate',
+                      'worldbank.download', 'worldbank.aggregate',
+                      'plot_each_absolute_temperature[12]',
+                      'plot_co2_against_temperature[12]',
+                      'plot_each_temperature[12]']:
+            self.assertIn(stage, names)
+
+    def test_run_offline(self):
+        results = benchmarks.run_benchmarks(name_filter='scripps', repeat=2)
+        self.assertEqual(list(results), ['scripps.download', 'scripps.parse',
+                                         'scripps.clean',
+                                         'scripps.aggregate'])
+        for result in results.values():
+            self.assertGreater(result['median'], 0)
+            self.assertLessEqual(result['min'], result['median'])
+            self.assertEqual(result['repeat'], 2)
+
+    def test_history_round_trip(self):
+        self.assertEqual(benchmarks.load_history(self.history), [])
+        results = run_of(a=0.5)['results']
+        benchmarks.append_history(self.history, results)
+        benchmarks.append_history(self.history, results)
+        history = benchmarks.load_history(self.history)
+        self.assertEqual(len(history), 2)
+        self.assertEqual(history[1]['results'], results)
+        for key in ['time', 'revision', 'python', 'pandas', 'numpy']:
+            self.assertIn(key, history[0])
+
+    def test_check_regressions(self):
+        history = [run_of(fast=0.010, slow=0.010, tiny=0.0001)] * 3
+        results = run_of(fast=0.011, slow=0.020, tiny=0.0005,
+                         new=1.0)['results']
+        regressions = benchmarks.check_regressions(results, history)
+        # tiny is 5x slower but by less than MIN_DELTA; new has no history
+        self.assertEqual([r['name'] for r in regressions], ['slow'])
+        self.assertAlmostEqual(regressions[0]['ratio'], 2.0)
+        self.assertEqual(benchmarks.check_regressions(
+            results, history, threshold=2.5), [])
+
+    def test_baseline_uses_recent_runs(self):
+        history = [run_of(a=1.0)] * 10 + [run_of(a=0.010)] * 5
+        regressions = benchmarks.check_regressions(
+            run_of(a=0.1)['results'], history)
+        self.assertEqual(len(regressions), 1)
+        self.assertAlmostEqual(regressions[0]['baseline'], 0.010)
+
+    def test_main_check(self):
+        with open(self.history, 'w') as history_file:
+            history_file.write('{"results": {"berkeley.clean": '
+                               '{"median": 1e-9, "min": 1e-9}}}\n')
+        with redirect_stdout(io.StringIO()) as out:
+            status = benchmarks.main(['--filter', 'berkeley.clean',
+                                      '--repeat', '1', '--history',
+                                      self.history, '--check'])
+        self.assertEqual(status, 1)
+        self.assertIn('Regression: berkeley.clean', out.getvalue())
+        self.assertEqual(len(benchmarks.load_history(self.history)), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
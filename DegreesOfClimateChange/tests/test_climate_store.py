@@ -0,0 +1,120 @@
+"""Unit test for climate_store.py
+
+This Python module contains multiple unit test functions to verify the
+execution of the climate_store.py module. Tests include verifying that
+snapshots round trip in both file formats, that unchanged data does not
+create a new version, that reads select date ranges and columns, and that
+grab_all reads the sources from the store.
+
+(class) TestClimateStore
+    Python class for unit testing the ClimateStore class in the
+    climate_store.py module.
+"""
+
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from DegreesOfClimateChange import dates
+from DegreesOfClimateChange import sources
+from DegreesOfClimateChange.climate_store import ClimateStore
+
+
+def monthly_frame(n_months, offset=0.0):
+    """Monthly (Date, Tanomaly_C) dataframe starting in January 1900"""
+    months = np.arange(n_months)
+    return pd.DataFrame({
+        'Date': dates.make_dates(1900 + months // 12, months % 12 + 1),
+        'Tanomaly_C': months / 100.0 + offset})
+
+
+class TestClimateStore(unittest.TestCase):
+    """ Unit tests for validating climate_store.py module"""
+
+    def setUp(self):
+        """ natively called by the Python unittesting framework """
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """ natively called by the Python unittesting framework """
+        shutil.rmtree(self.directory)
+
+    def test_round_trip_and_versions(self):
+        """Snapshots read back equal and are versioned by content"""
+        for format in ('arrow', 'parquet'):
+            store = ClimateStore(self.directory + '/' + format, format)
+            df = monthly_frame(240)
+            self.assertEqual(store.write('NOAA', df), 1)
+            self.assertEqual(store.write('NOAA', df), 1)
+            typed = df.copy()
+            typed['Date'] = dates.convert_dates(df['Date'], 'period')
+            self.assertEqual(store.write('NOAA', typed), 1)
+            self.assertEqual(store.write('NOAA', monthly_frame(241)), 2)
+            self.assertEqual(store.versions('NOAA'), [1, 2])
+            self.assertEqual(store.sources(), ['NOAA'])
+
+            read = store.read('NOAA', version=1)
+            self.assertEqual(list(read['Date']), list(df['Date']))
+            np.testing.assert_array_equal(read['Tanomaly_C'],
+                                          df['Tanomaly_C'])
+            meta = store.info('NOAA')
+            self.assertEqual((meta['version'], meta['rows'],
+                              meta['resolution']), (2, 241, 'monthly'))
+            self.assertEqual(len(meta['sha256']), 64)
+
+            store.prune('NOAA')
+            self.assertEqual(store.versions('NOAA'), [2])
+            with self.assertRaises(KeyError):
+                store.read('NOAA', version=1)
+
+    def test_select_range_and_columns(self):
+        """Reads keep the requested dates and columns"""
+        store = ClimateStore(self.directory)
+        df = monthly_frame(240)
+        df['Location'] = 'Alert_CAN'
+        store.write('Stations', df)
+        read = store.read('Stations', start='1905-01-01', end='1905-12-01',
+                          columns=['Tanomaly_C'], date_format='datetime')
+        self.assertEqual(list(read.columns), ['Date', 'Tanomaly_C'])
+        self.assertEqual(len(read), 12)
+        self.assertEqual(read['Date'].iloc[0], pd.Timestamp('1905-01-01'))
+        self.assertAlmostEqual(read['Tanomaly_C'].iloc[0], 0.6)
+
+    def test_yearly_strings(self):
+        """Yearly sources return YYYY-01-01 strings"""
+        store = ClimateStore(self.directory)
+        df = pd.DataFrame({'Date': dates.make_dates([1901, 1902]),
+                           'Tabsolute_C': [19.0, 18.9]})
+        store.write('WorldBank', df)
+        self.assertEqual(list(store.read('WorldBank')['Date']),
+                         ['1901-01-01', '1902-01-01'])
+
+    def test_grab_all_from_store(self):
+        """grab_all grabs a source once and then reads its snapshot"""
+        calls = []
+
+        def grab(date_format='string'):
+            calls.append(date_format)
+            return monthly_frame(24)
+        sources.register_source(sources.Source(
+            'Stored', grab, 'Tanomaly_C', units='deg C', kind='anomaly',
+            resolution='monthly', host='localhost'))
+        try:
+            store = ClimateStore(self.directory)
+            for _ in range(2):
+                frames, report = sources.grab_all(['Stored'], store=store)
+                self.assertEqual(report['Stored']['rows'], 24)
+            self.assertEqual(calls, ['datetime'])
+            sources.grab_all(['Stored'], store=store, refresh=True)
+            self.assertEqual(len(calls), 2)
+            self.assertEqual(store.versions('Stored'), [1])
+            self.assertEqual(frames['Stored']['Date'].iloc[-1], '1901-12-01')
+        finally:
+            sources.unregister_source('Stored')
+
+
+if __name__ == '__main__':
+    unittest.main()
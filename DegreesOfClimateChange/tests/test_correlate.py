@@ -0,0 +1,159 @@
+"""Unit test for correlate.py
+
+This Python module contains multiple unit test functions to verify the
+execution of the correlate.py module. Tests include verifying the FFT
+correlations against a dot product at each lag, the pairing of many series
+and the pairwise sweep, the detrended and differenced variants with missing
+values, the surrogate p values of related and unrelated series, the
+correlation of sources with a reference dataframe, and that invalid
+arguments raise ValueError.
+
+(class) TestCorrelate
+    Python class for unit testing the correlate.py module.
+"""
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from DegreesOfClimateChange import correlate
+from DegreesOfClimateChange import dates
+
+
+def lagged_dot(x, y, max_lag):
+    """Correlations of x[t] with y[t + lag], one dot product per lag"""
+    x, y = x - x.mean(), y - y.mean()
+    norm = np.sqrt((x ** 2).sum() * (y ** 2).sum())
+    n = len(x)
+    return np.array([(x[:n - lag] * y[lag:]).sum() / norm if lag >= 0 else
+                     (x[-lag:] * y[:n + lag]).sum() / norm
+                     for lag in range(-max_lag, max_lag + 1)])
+
+
+class TestCorrelate(unittest.TestCase):
+    """ Unit tests for validating correlate.py module"""
+
+    def setUp(self):
+        """ natively called by the Python unittesting framework """
+        rng = np.random.RandomState(11)
+        self.x = np.cumsum(rng.normal(size=240))
+        # y follows x by 7 rows, z is unrelated
+        self.y = np.roll(self.x, 7) + rng.normal(0, 0.5, size=240)
+        self.z = rng.normal(size=240)
+
+    def test_against_dot_products(self):
+        for max_lag in [0, 1, 30, None]:
+            lags, r = correlate.cross_correlation(self.x, self.y, max_lag)
+            expected = lagged_dot(self.x, self.y, len(lags) // 2)
+            np.testing.assert_allclose(r, expected, atol=1e-12)
+        self.assertEqual(list(lags[:2]), [-239, -238])
+        lags, r = correlate.cross_correlation(self.x, self.y, 30)
+        self.assertEqual(lags[np.argmax(r)], 7)
+        self.assertAlmostEqual(
+            correlate.cross_correlation(self.x, self.y, 0)[1][0],
+            np.corrcoef(self.x, self.y)[0, 1])
+
+    def test_pairs(self):
+        columns = np.column_stack([self.y, self.z, np.roll(self.x, -3)])
+        lags, r = correlate.cross_correlation(self.x, columns, 20)
+        self.assertEqual(r.shape, (41, 3))
+        for k in range(3):
+            np.testing.assert_allclose(
+                r[:, k], correlate.cross_correlation(self.x, columns[:, k],
+                                                     20)[1])
+        self.assertEqual(list(lags[np.argmax(r[:, [0, 2]], axis=0)]), [7, -3])
+
+        sources = np.column_stack([self.x, self.z])
+        _, grid = correlate.cross_correlation(sources, columns, 20,
+                                              pairwise=True)
+        self.assertEqual(grid.shape, (41, 2, 3))
+        np.testing.assert_allclose(grid[:, 0, :], r)
+        np.testing.assert_allclose(
+            grid[:, 1, 2],
+            correlate.cross_correlation(self.z, columns[:, 2], 20)[1])
+
+    def test_transforms(self):
+        trend = np.arange(240) * 0.5
+        _, plain = correlate.cross_correlation(self.z + trend,
+                                               self.x + trend, 5)
+        _, detrended = correlate.cross_correlation(
+            self.z + trend, self.x + trend, 5, 'detrend')
+        self.assertGreater(plain.min(), 0.9)
+        self.assertLess(np.abs(detrended).max(), 0.5)
+
+        _, differenced = correlate.cross_correlation(self.x, self.y, 10,
+                                                     'difference')
+        np.testing.assert_allclose(
+            differenced, lagged_dot(np.diff(self.x), np.diff(self.y), 10),
+            atol=1e-12)
+
+        gappy = self.y.copy()
+        gappy[[3, 50, 51]] = np.nan
+        for transform in correlate.TRANSFORMS:
+            _, r = correlate.cross_correlation(self.x, gappy, 10, transform)
+            self.assertFalse(np.isnan(r).any())
+        self.assertTrue(np.isnan(correlate.cross_correlation(
+            trend, self.x, 3, 'detrend')[1]).all())
+
+    def test_surrogates(self):
+        columns = np.column_stack([self.y, self.z])
+        p_values, thresholds = correlate.surrogate_test(
+            self.x, columns, 20, 'difference', n_surrogates=200, seed=4)
+        self.assertLess(p_values[0], 0.01)
+        self.assertGreater(p_values[1], 0.05)
+        self.assertTrue((thresholds > 0).all() and (thresholds < 1).all())
+        again, _ = correlate.surrogate_test(
+            self.x, columns, 20, 'difference', n_surrogates=200, seed=4)
+        np.testing.assert_array_equal(p_values, again)
+        p_value, threshold = correlate.surrogate_test(self.x, self.y, 20,
+                                                      n_surrogates=10)
+        self.assertTrue(np.isscalar(p_value) and np.isscalar(threshold))
+
+    def test_frames(self):
+        months = np.arange(240)
+        monthly = dates.make_dates(1990 + months // 12, months % 12 + 1)
+        years = np.arange(1995, 2010)
+        rises = np.random.RandomState(2).uniform(0.5, 3.0, size=20)
+        co2 = pd.DataFrame({'Date': dates.make_dates(years),
+                            'CO2': 360.0 + np.cumsum(rises)[5:]})
+        # the yearly means of NOAA follow the CO2 by 2 years
+        noaa = pd.DataFrame({'Date': monthly, 'Tanomaly_C': np.repeat(
+            np.r_[0.0, 0.0, np.cumsum(rises)[:18]], 12) / 50.0})
+        frames = {'Scripps': (co2, 'CO2'), 'NOAA': (noaa, 'Tanomaly_C'),
+                  'Berkeley': (noaa.iloc[::-1], 'Tanomaly_C')}
+        correlations, summary = correlate.correlate_frames(
+            frames, 'Scripps', max_lag=4, transform='difference')
+        self.assertEqual(list(correlations.index), list(range(-4, 5)))
+        self.assertEqual(list(correlations.columns), ['NOAA', 'Berkeley'])
+        self.assertEqual(list(summary['peak_lag']), [2, 2])
+        self.assertTrue(summary['p_value'].isnull().all())
+        _, summary = correlate.correlate_frames(
+            frames, 'Scripps', max_lag=4, transform='difference',
+            n_surrogates=50, seed=0)
+        self.assertTrue(((summary['p_value'] > 0) &
+                         (summary['p_value'] <= 1)).all())
+
+    def test_invalid_arguments(self):
+        self.assertRaises(ValueError, correlate.cross_correlation, self.x,
+                          self.y[:-1])
+        self.assertRaises(ValueError, correlate.cross_correlation, self.x,
+                          self.y, 240)
+        self.assertRaises(ValueError, correlate.cross_correlation, self.x,
+                          self.y, 3, 'log')
+        self.assertRaises(ValueError, correlate.cross_correlation,
+                          np.zeros((240, 2)), np.zeros((240, 3)))
+        self.assertRaises(ValueError, correlate.surrogate_test, self.x,
+                          self.y, 3, n_surrogates=0)
+        self.assertRaises(ValueError, correlate.surrogate_test, self.x,
+                          self.y, 3, level=1.5)
+        df = pd.DataFrame({'Date': dates.make_dates([2000, 2001]),
+                           'CO2': [1.0, 2.0]})
+        self.assertRaises(ValueError, correlate.correlate_frames,
+                          {'Scripps': (df, 'CO2')}, 'Scripps')
+        self.assertRaises(ValueError, correlate.correlate_frames,
+                          {'Scripps': (df, 'CO2')}, 'NOAA')
+
+
+if __name__ == '__main__':
+    unittest.main()
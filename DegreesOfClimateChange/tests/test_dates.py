@@ -0,0 +1,113 @@
+"""Unit test for dates.py
+
+This Python module contains multiple unit test functions to verify the
+execution of the dates.py module. Tests include verifying that the string
+dates match the format the grab functions have always returned, that the
+typed forms are built from the integer years and months, that every form
+converts to the same matplotlib dates, and that the plot functions accept
+each form of the Date column.
+
+(class) TestDates
+    Python class for unit testing the functions in the dates.py module.
+"""
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from DegreesOfClimateChange import axis_cache
+from DegreesOfClimateChange import dates
+from DegreesOfClimateChange.plot_functions import plot_each_absolute_temperature
+from DegreesOfClimateChange.plot_functions import plot_each_temperature
+
+
+def monthly_frame(date_format, n_years=3):
+    """Monthly (Date, Tanomaly_C) dataframe starting in January 1990"""
+    months = np.arange(12 * n_years)
+    return pd.DataFrame({
+        "Date": dates.make_dates(1990 + months // 12, months % 12 + 1,
+                                 date_format),
+        "Tanomaly_C": months / 10.0})
+
+
+class TestDates(unittest.TestCase):
+    """ Unit tests for validating dates.py module"""
+
+    def setUp(self):
+        """ natively called by the Python unittesting framework """
+        self.saved_cache = axis_cache.get_axis_cache()
+        axis_cache.set_axis_cache(None)
+
+    def tearDown(self):
+        """ natively called by the Python unittesting framework """
+        axis_cache.set_axis_cache(self.saved_cache)
+
+    def test_string_dates(self):
+        """Strings keep the historical YYYY-M-01 and YYYY-01-01 forms"""
+        self.assertEqual(list(dates.make_dates([1880, 1880], [1, 12])),
+                         ["1880-1-01", "1880-12-01"])
+        self.assertEqual(list(dates.make_dates([1901, 1902])),
+                         ["1901-01-01", "1902-01-01"])
+
+    def test_typed_dates(self):
+        """datetime64 and period dates are built without parsing"""
+        stamps = dates.make_dates([1750, 2018], [3, 11], "datetime")
+        self.assertEqual(stamps.dtype, np.dtype("datetime64[ns]"))
+        self.assertEqual(list(pd.to_datetime(stamps)),
+                         [pd.Timestamp("1750-03-01"),
+                          pd.Timestamp("2018-11-01")])
+        periods = pd.Series(dates.make_dates([1750, 2018], [3, 11], "period"))
+        self.assertIsInstance(periods.dtype, pd.PeriodDtype)
+        self.assertEqual(list(periods.astype(str)), ["1750-03", "2018-11"])
+        years = pd.Series(dates.make_dates([1901, 1902],
+                                           date_format="period"))
+        self.assertEqual(list(years.astype(str)), ["1901", "1902"])
+
+    def test_conversions(self):
+        """Every form converts back and gives the same plot dates"""
+        strings = monthly_frame("string")["Date"]
+        expected = dates.to_plot_dates(strings)
+        for date_format in dates.DATE_FORMATS:
+            column = monthly_frame(date_format)["Date"]
+            np.testing.assert_array_equal(dates.to_plot_dates(column),
+                                          expected)
+            self.assertEqual(list(dates.convert_dates(column, "string")),
+                             list(strings))
+
+    def test_invalid_format(self):
+        """Unknown date formats raise ValueError"""
+        with self.assertRaises(ValueError):
+            dates.make_dates([1901], date_format="julian")
+        with self.assertRaises(ValueError):
+            dates.convert_dates(["1901-01-01"], "julian")
+
+    def test_plot_functions_accept_typed_dates(self):
+        """The plot data is the same for every form of the Date column"""
+        df_wb = pd.DataFrame({"Date": dates.make_dates([1990, 1991, 1992]),
+                              "Tabsolute_C": [19.0, 19.1, 19.2]})
+        results = []
+        for date_format in dates.DATE_FORMATS:
+            df = monthly_frame(date_format)
+            df_wb_typed = df_wb.copy()
+            df_wb_typed["Date"] = dates.convert_dates(
+                df_wb["Date"], date_format, annual=True)
+            results.append((
+                plot_each_temperature(df, df, df_wb_typed, False),
+                plot_each_absolute_temperature(df, df, df_wb_typed, False)))
+        for result in results[1:]:
+            for (y_data, x_data), (y_expected, x_expected) in zip(
+                    result, results[0]):
+                for agency in x_expected:
+                    np.testing.assert_array_equal(x_data[agency],
+                                                  x_expected[agency])
+                    np.testing.assert_array_equal(y_data[agency],
+                                                  y_expected[agency])
+        y_data, x_data = results[0][1]
+        self.assertEqual(len(x_data["NOAA"]), 3)
+        # 1990 mean, less the 1990-1992 mean, plus the World Bank mean
+        self.assertAlmostEqual(y_data["NOAA"][0], 0.55 - 1.75 + 19.1)
+
+
+if __name__ == '__main__':
+    unittest.main()
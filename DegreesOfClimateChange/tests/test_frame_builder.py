@@ -0,0 +1,57 @@
+"""Unit test for frame_builder.py
+
+This Python module contains multiple unit test functions to verify the
+execution of the frame_builder.py module. Tests include verifying that
+blocks of rows are accumulated in order, that scalars are repeated over a
+block, that dtypes are applied, and that malformed input raises ValueError.
+
+(class) TestFrameBuilder
+    Python class for unit testing the FrameBuilder class in the
+    frame_builder.py module.
+"""
+
+import unittest
+
+import numpy as np
+
+from DegreesOfClimateChange.frame_builder import FrameBuilder
+
+
+class TestFrameBuilder(unittest.TestCase):
+    """ Unit tests for validating frame_builder.py module"""
+
+    def test_extend(self):
+        """Blocks are kept in insertion order"""
+        builder = FrameBuilder(['Country', 'Date', 'Tabsolute_C'])
+        builder.extend(Country=['Ghana'], Date=[1901], Tabsolute_C=[26.1])
+        builder.extend(Country='Chad', Date=np.array([1901, 1902]),
+                       Tabsolute_C=[26.5, 26.9])
+        df = builder.build()
+        self.assertEqual(len(builder), 3)
+        self.assertEqual(list(df.columns), ['Country', 'Date', 'Tabsolute_C'])
+        self.assertEqual(list(df['Country']), ['Ghana', 'Chad', 'Chad'])
+        self.assertEqual(list(df['Date']), [1901, 1901, 1902])
+
+    def test_dtypes(self):
+        """dtypes are applied when building"""
+        builder = FrameBuilder(['Date', 'CO2'], dtypes={'CO2': float})
+        builder.extend(Date=[1957, 1958], CO2=[313, 314])
+        df = builder.build()
+        self.assertEqual(df['CO2'].dtype, 'float')
+        self.assertEqual(list(df['CO2']), [313.0, 314.0])
+
+    def test_empty(self):
+        """An empty builder gives an empty frame with the columns"""
+        df = FrameBuilder(['Date', 'CO2']).build()
+        self.assertEqual(df.shape, (0, 2))
+
+    def test_bad_input(self):
+        """Missing columns or unequal lengths raise ValueError"""
+        builder = FrameBuilder(['Date', 'CO2'])
+        self.assertRaises(ValueError, builder.extend, Date=[1957])
+        self.assertRaises(ValueError, builder.extend, Date=[1957, 1958],
+                          CO2=[313.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
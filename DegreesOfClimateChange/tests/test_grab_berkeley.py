@@ -7,6 +7,12 @@ Excceptions thrown for all failed tests.
 (class) grab_berkeley.py
     Python class for unit testing the Python function
     grab_noaa() in the  grab_berkeley.py module.
+(class) TestIncrementalBerkeley
+    Python class for unit testing the incremental refresh of the Berkeley
+    Earth snapshot against a local stand-in server.
+(class) TestParseBerkeley
+    Python class for unit testing the typed parser and the block by block
+    iter_berkeley generator.
 
 Written by Abhishek Anand
 
@@ -16,14 +22,31 @@ Written by Abhishek Anand
 import sys
 sys.path.append("../")
 from DegreesOfClimateChange.grab_berkeley import grab_berkeley
+from DegreesOfClimateChange.grab_berkeley import iter_berkeley
+from DegreesOfClimateChange.grab_berkeley import parse_berkeley
+from DegreesOfClimateChange.grab_berkeley import refresh_berkeley
+from DegreesOfClimateChange import grab_berkeley as grab_berkeley_module
+from DegreesOfClimateChange import http_cache
+from DegreesOfClimateChange.tests.http_standin import StandinServer
+from DegreesOfClimateChange.tests.upstream_fixtures import berkeley_text
+from DegreesOfClimateChange.tests.upstream_fixtures import upstream
+import os
+import shutil
+import tempfile
 import unittest
+from unittest import mock
+import pandas as pd
 
 
-dfberkeley = grab_berkeley()
-
 class test_grab_berkeley(unittest.TestCase):
     """Unit tests for validating grab_berkeleymodule."""
 
+    @classmethod
+    def setUpClass(cls):
+        global dfberkeley
+        with upstream():
+            dfberkeley = grab_berkeley()
+
     def test_checkRowSize(self):
         """Check Row Size  with at least 12"""
         self.assertTrue(dfberkeley.shape[0] >= 12)
@@ -38,10 +61,205 @@ class test_grab_berkeley(unittest.TestCase):
         
     def test_datatypes(self):
         """Test that column Date is a string data type
-        A string in Pandas is actually an object."""
-        self.assertTrue(dfberkeley["Date"].dtypes == 'O')
+        A string in Pandas is actually an object (str from pandas 3)."""
+        # object before pandas 3, the str dtype since
+        self.assertTrue(pd.api.types.is_string_dtype(dfberkeley["Date"]))
+        self.assertTrue(all(isinstance(date, str) for date in dfberkeley["Date"]))
         self.assertTrue(dfberkeley["Tanomaly_C"].dtype == 'float')
 
 
+class TestIncrementalBerkeley(unittest.TestCase):
+    """Unit tests for the incremental refresh of the Berkeley snapshot."""
+
+    def setUp(self):
+        """ natively called by the Python unittesting framework """
+        self.snapshot_dir = tempfile.mkdtemp()
+        self.saved_cache = http_cache.get_cache()
+        http_cache.set_cache(None)
+        self.server = StandinServer({"/berkeley.txt": berkeley_text(240)})
+        self.server.__enter__()
+
+    def tearDown(self):
+        """ natively called by the Python unittesting framework """
+        self.server.__exit__(None, None, None)
+        http_cache.set_cache(self.saved_cache)
+        shutil.rmtree(self.snapshot_dir)
+
+    def refresh(self, text=None):
+        """Serves text, runs refresh_berkeley and returns (dataframe, mode,
+        requests made by the refresh)"""
+        if text is not None:
+            self.server.routes["/berkeley.txt"] = text
+        n_before = len(self.server.requests)
+        df, mode = refresh_berkeley(self.server.url("/berkeley.txt"),
+                                    self.snapshot_dir)
+        return df, mode, self.server.requests[n_before:]
+
+    def test_tail_refresh(self):
+        """Appended months are fetched as byte ranges, and only they are
+        parsed and merged"""
+        df_first, mode, _ = self.refresh()
+        self.assertEqual(mode, "full")
+        self.assertEqual(df_first.shape, (240, 2))
+
+        with mock.patch.object(grab_berkeley_module, "parse_berkeley",
+                               wraps=parse_berkeley) as parse:
+            df, mode, requests = self.refresh(berkeley_text(243))
+        self.assertEqual(mode, "tail")
+        self.assertTrue(all(method == "HEAD" or "Range" in headers
+                            for method, _, headers in requests))
+        self.assertEqual(parse.call_args[0][0].count("\n"), 3)
+        self.assertTrue(df.equals(parse_berkeley(berkeley_text(243))))
+        self.assertEqual(df["Date"].iloc[-1], "1770-3-01")
+
+        # the next refresh starts from the merged snapshot
+        df, mode, requests = self.refresh(berkeley_text(245))
+        self.assertEqual(mode, "tail")
+        self.assertTrue(df.equals(parse_berkeley(berkeley_text(245))))
+        # whose whole hash is unknown, so a same length file is parsed
+        lines = berkeley_text(245).split("\n")
+        lines[34 + 100] = lines[34 + 100][:14] + "9.999" + \
+            lines[34 + 100][19:]
+        df, mode, _ = self.refresh("\n".join(lines))
+        self.assertEqual(mode, "full")
+        self.assertEqual(df["Tanomaly_C"].iloc[100], 9.999)
+
+    def test_unchanged(self):
+        """An unchanged file returns the snapshot without parsing"""
+        self.refresh()
+        df, mode, _ = self.refresh()
+        self.assertEqual(mode, "unchanged")
+        self.assertEqual(df.shape, (240, 2))
+
+    def test_validators(self):
+        """An unchanged ETag and size cost no download"""
+        text = berkeley_text(240)
+        self.server.routes["/berkeley.txt"] = lambda handler: (
+            200, text, {"ETag": '"v{}"'.format(len(text))})
+        self.refresh()
+        df, mode, requests = self.refresh()
+        self.assertEqual(mode, "unchanged")
+        self.assertEqual([method for method, _, _ in requests], ["HEAD"])
+        self.assertEqual(df.shape, (240, 2))
+        text = berkeley_text(241)
+        self.assertEqual(self.refresh()[1], "tail")
+
+    def test_same_length_edit(self):
+        """A revised older month of the same length is not missed"""
+        self.refresh()
+        lines = berkeley_text(240).split("\n")
+        self.assertNotEqual(lines[34 + 100][14:19], "9.999")
+        lines[34 + 100] = lines[34 + 100][:14] + "9.999" + \
+            lines[34 + 100][19:]
+        df, mode, _ = self.refresh("\n".join(lines))
+        self.assertEqual(mode, "full")
+        self.assertEqual(df["Tanomaly_C"].iloc[100], 9.999)
+        self.assertEqual(df.shape, (240, 2))
+
+    def test_full_reload_on_changes(self):
+        """Changed header, edited older values or a shorter file trigger a
+        full reload; without range support the whole file is compared"""
+        self.refresh()
+        # a header of the same length, checked by its own range request
+        same_length_header = berkeley_text(243, note="refreshed")
+        self.assertEqual(self.refresh(same_length_header)[1], "full")
+        changed_header = berkeley_text(245, note="regenerated")
+        self.assertEqual(self.refresh(changed_header)[1], "full")
+
+        # a revised value in the last month of the previous snapshot
+        lines = berkeley_text(247, note="regenerated").split("\n")
+        lines[34 + 244] = lines[34 + 244][:14] + "9.999" + \
+            lines[34 + 244][19:]
+        edited_values = "\n".join(lines)
+        self.assertEqual(self.refresh(edited_values)[1], "full")
+
+        shorter = berkeley_text(200, note="regenerated")
+        self.assertEqual(self.refresh(shorter)[1], "full")
+
+        self.server.ranges = False
+        df, mode, _ = self.refresh(berkeley_text(210, note="regenerated"))
+        self.assertEqual(mode, "tail")
+        self.assertEqual(df.shape, (210, 2))
+
+    def test_typed_dates(self):
+        """Snapshots keep typed dates and return each date_format"""
+        self.refresh()
+        df, mode = refresh_berkeley(self.server.url("/berkeley.txt"),
+                                    self.snapshot_dir, date_format="period")
+        self.assertEqual(mode, "unchanged")
+        self.assertEqual(str(df["Date"].iloc[-1]), "1769-12")
+        df, _ = refresh_berkeley(self.server.url("/berkeley.txt"),
+                                 self.snapshot_dir, date_format="datetime")
+        self.assertEqual(df["Date"].iloc[0], pd.Timestamp("1750-01-01"))
+
+
+class TestParseBerkeley(unittest.TestCase):
+    """Unit tests for the typed Berkeley parser and iter_berkeley."""
+
+    def test_header_by_content(self):
+        """The data is found whatever the length of the description"""
+        short = parse_berkeley(berkeley_text(30, header_lines=5))
+        long = parse_berkeley(berkeley_text(30, header_lines=60))
+        self.assertTrue(short.equals(long))
+        self.assertEqual(short.shape, (30, 2))
+        self.assertEqual(short["Date"].iloc[0], "1750-1-01")
+        self.assertEqual(short["Tanomaly_C"].dtype, 'float')
+
+    def test_missing_values(self):
+        """NaN entries of the monthly anomaly are kept as missing"""
+        text = berkeley_text(3).replace("  1750     2  -0.700",
+                                        "  1750     2     NaN", 1)
+        df = parse_berkeley(text)
+        self.assertTrue(pd.isnull(df["Tanomaly_C"].iloc[1]))
+        self.assertEqual(df["Tanomaly_C"].iloc[2], -0.6)
+
+    def test_iter_blocks(self):
+        """Blocks from a local file concatenate to the full parse"""
+        text = berkeley_text(1000)
+        handle, path = tempfile.mkstemp()
+        with os.fdopen(handle, "w") as text_file:
+            text_file.write(text)
+        try:
+            blocks = list(iter_berkeley(path, chunksize=128))
+        finally:
+            os.remove(path)
+        self.assertEqual(len(blocks), 8)
+        self.assertTrue(all(len(block) <= 128 for block in blocks))
+        self.assertTrue(pd.concat(blocks).equals(parse_berkeley(text)))
+
+    def test_grab_berkeley_standin(self):
+        """grab_berkeley streams and parses the file from the host"""
+        saved_cache = http_cache.get_cache()
+        http_cache.set_cache(None)
+        text = berkeley_text(36)
+        try:
+            with StandinServer({"/global.txt": text}) as server:
+                with mock.patch.object(grab_berkeley_module, "BERKELEY_URL",
+                                       server.url("/global.txt")):
+                    df = grab_berkeley()
+        finally:
+            http_cache.set_cache(saved_cache)
+        self.assertEqual(list(df.columns), ['Date', 'Tanomaly_C'])
+        self.assertTrue(df.equals(parse_berkeley(text)))
+
+    def test_iter_url_cached(self):
+        """A streamed url is copied into the cache while it is read"""
+        cache_dir = tempfile.mkdtemp()
+        saved_cache = http_cache.get_cache()
+        http_cache.set_cache(http_cache.HttpCache(cache_dir))
+        text = berkeley_text(500)
+        try:
+            with StandinServer({"/land.txt": text}) as server:
+                url = server.url("/land.txt")
+                first = pd.concat(iter_berkeley(url, chunksize=100))
+                second = pd.concat(iter_berkeley(url, chunksize=100))
+                self.assertEqual(len(server.requests), 1)
+        finally:
+            http_cache.set_cache(saved_cache)
+            shutil.rmtree(cache_dir)
+        self.assertTrue(first.equals(parse_berkeley(text)))
+        self.assertTrue(second.equals(first))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -9,6 +9,10 @@ is done correctly, and raises approrpriate errors if need be.
 (class) TestGrab_CO2_Scripps
     Python class for unit testing the Python function
     grab_co2_scripps() in the  grab_co2_scripps.py module.
+(class) TestScrippsStations
+    Python class for unit testing the header detection, the cleaning of the
+    station files and the per-station output against a local stand-in
+    server.
 
 Written by Rahul Birmiwal
 2018
@@ -18,9 +22,18 @@ import sys
 sys.path.append("..") # Adds higher directory to python modules path.
 from DegreesOfClimateChange.grab_co2_scripps import grab_scripps_co2_data
 #from grab_co2_scripps import grab_scripps_co2_data
+from DegreesOfClimateChange import grab_co2_scripps as grab_co2_scripps_module
+from DegreesOfClimateChange import http_cache
+from DegreesOfClimateChange.grab_co2_scripps import parse_station
+from DegreesOfClimateChange.tests.http_standin import StandinServer
+from DegreesOfClimateChange.tests.upstream_fixtures import station_csv
+from DegreesOfClimateChange.tests.upstream_fixtures import upstream
 import unittest
+from unittest import mock
 import datetime
+import time
 import warnings
+import pandas as pd
 
 
 def ignore_warnings(test_func):
@@ -47,13 +60,16 @@ class TestGrab_CO2_Scripps(unittest.TestCase):
     def setUp(self):
         """ natively called by the Python unittesting framework """
         print('In setUp()')
-        self.fixture = grab_scripps_co2_data()
+        with upstream():
+            self.fixture = grab_scripps_co2_data()
 
     @ignore_warnings
     def test_datatypes(self):
         """Test that column Date is a string data type
-        A string in Pandas is actually an object."""
-        self.assertTrue(self.fixture["Date"].dtypes == 'O')
+        A string in Pandas is actually an object (str from pandas 3)."""
+        # object before pandas 3, the str dtype since
+        self.assertTrue(pd.api.types.is_string_dtype(self.fixture["Date"]))
+        self.assertTrue(all(isinstance(date, str) for date in self.fixture["Date"]))
         self.assertTrue(self.fixture["CO2"].dtype == 'float')
 
     @ignore_warnings
@@ -82,5 +98,57 @@ class TestGrab_CO2_Scripps(unittest.TestCase):
         print('In tearDown()')
         del self.fixture
 
+
+class TestScrippsStations(unittest.TestCase):
+    """Unit tests for the station parser and the concurrent ingest"""
+
+    def setUp(self):
+        """ natively called by the Python unittesting framework """
+        self.saved_cache = http_cache.get_cache()
+        http_cache.set_cache(None)
+
+    def tearDown(self):
+        """ natively called by the Python unittesting framework """
+        http_cache.set_cache(self.saved_cache)
+
+    def test_parse_station(self):
+        """The header is found by content and bad rows are dropped"""
+        text = station_csv([(1985, 1, -99.99), (1985, 2, 345.5),
+                            (1985, 3, 346.25)], n_notes=7)
+        text += '  1985, 04,  NaN,  1985.29,  n/a,  n/a\n'
+        df = parse_station(text)
+        self.assertEqual(list(df.columns), ['Year', 'Month', 'CO2'])
+        self.assertEqual(list(df['Month']), [2, 3])
+        self.assertEqual(list(df['CO2']), [345.5, 346.25])
+        self.assertEqual(df['Year'].dtype, 'int64')
+
+    def test_grab_standin(self):
+        """Stations are fetched concurrently and averaged per year"""
+        locations = [location for location, _ in
+                     grab_co2_scripps_module.STATION_URLS]
+        routes = {}
+        for k, location in enumerate(locations):
+            routes['/' + location] = station_csv(
+                [(2000, 1, 370.0 + k), (2000, 2, -99.99),
+                 (2001, 1, 372.0 + k)])
+        with StandinServer(routes, delay=0.2) as server:
+            station_urls = [(location, server.url('/' + location))
+                            for location in locations]
+            with mock.patch.object(grab_co2_scripps_module, 'STATION_URLS',
+                                   station_urls):
+                start = time.perf_counter()
+                df, df_stations = grab_scripps_co2_data(
+                    date_format='datetime', by_station=True)
+                elapsed = time.perf_counter() - start
+        self.assertTrue(elapsed < 2 * 0.2 * len(locations))
+        self.assertEqual(list(df.columns), ['Date', 'CO2'])
+        self.assertEqual(list(df['CO2']), [372.0, 374.0])
+        self.assertEqual(df['Date'].iloc[1], pd.Timestamp('2001-01-01'))
+        self.assertEqual(list(df_stations.columns),
+                         ['Date', 'Location', 'CO2'])
+        self.assertEqual(len(df_stations), 2 * len(locations))
+        self.assertEqual(list(df_stations['Location'].unique()), locations)
+
+
 if __name__ == '__main__':
     unittest.main()
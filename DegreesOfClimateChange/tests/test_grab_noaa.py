@@ -15,15 +15,20 @@ Written by Todd Schultz
 
 from datetime import datetime
 from DegreesOfClimateChange.grab_noaa import grab_noaa
+from DegreesOfClimateChange.tests.upstream_fixtures import upstream
 import unittest
-
-
-dfnoaa = grab_noaa()
+import pandas as pd
 
 
 class test_grab_noaa(unittest.TestCase):
     """Unit tests for validating grab_noaa module."""
 
+    @classmethod
+    def setUpClass(cls):
+        global dfnoaa
+        with upstream():
+            dfnoaa = grab_noaa()
+
     def test_column_names(self):
         """Test for exact 2 required column names.
         The required names are Date and Tanomaly_C"""
@@ -50,8 +55,10 @@ class test_grab_noaa(unittest.TestCase):
 
     def test_datatypes(self):
         """Test that column Date is a string data type
-        A string in Pandas is actually an object."""
-        self.assertTrue(dfnoaa["Date"].dtypes == 'O')
+        A string in Pandas is actually an object (str from pandas 3)."""
+        # object before pandas 3, the str dtype since
+        self.assertTrue(pd.api.types.is_string_dtype(dfnoaa["Date"]))
+        self.assertTrue(all(isinstance(date, str) for date in dfnoaa["Date"]))
         self.assertTrue(dfnoaa["Tanomaly_C"].dtype == 'float')
 
     def test_Monthly_data(self):
@@ -10,6 +10,10 @@ is done correctly, and raises approrpriate errors if need be.
     Python class for unit testing the Python function
     grab_worldbank(arg1, arg2) in the  grab_worldbank.py module.
 
+(class) TestFetchCountries
+    Python class for unit testing the concurrent country retrieval against
+    a local stand-in of the climate API.
+
 Written by Rahul Birmiwal
 2018
 """
@@ -18,9 +22,21 @@ Written by Rahul Birmiwal
 import sys
 sys.path.append("..") # Adds higher directory to python modules path.
 from DegreesOfClimateChange.grab_worldbank import grab_worldbank
+from DegreesOfClimateChange import grab_worldbank as grab_worldbank_module
+from DegreesOfClimateChange import http_cache
+from DegreesOfClimateChange import reference_data
+from DegreesOfClimateChange import transport
+from DegreesOfClimateChange.tests.http_standin import StandinServer
+from DegreesOfClimateChange.tests.upstream_fixtures import climate_api_json
+from DegreesOfClimateChange.tests.upstream_fixtures import upstream
+import threading
+import time
 import unittest
+import pandas as pd
+from unittest import mock
 import datetime
 import warnings
+import wbpy
 
 MIN_YEAR = 1901 #constant defining minimum year value in WorldBank dataset
 MAX_YEAR = 2012 #likewise maximum
@@ -50,13 +66,16 @@ class TestGrabWorldbank(unittest.TestCase):
     def setUp(self):
         """ natively called by the Python unittesting framework """
         print('In setUp()')
-        self.fixture = grab_worldbank(2010,2012)
+        with upstream():
+            self.fixture = grab_worldbank(2010,2012)
 
     @ignore_warnings
     def test_datatypes(self):
         """Test that column Date is a string data type
-        A string in Pandas is actually an object."""
-        self.assertTrue(self.fixture["Date"].dtypes == 'O')
+        A string in Pandas is actually an object (str from pandas 3)."""
+        # object before pandas 3, the str dtype since
+        self.assertTrue(pd.api.types.is_string_dtype(self.fixture["Date"]))
+        self.assertTrue(all(isinstance(date, str) for date in self.fixture["Date"]))
         self.assertTrue(self.fixture["Tabsolute_C"].dtype == 'float')
 
     @ignore_warnings
@@ -107,5 +126,147 @@ class TestGrabWorldbank(unittest.TestCase):
         print('In tearDown()')
         del self.fixture
 
+STANDIN_CODES = ['AFG', 'ALB', 'DZA', 'AND', 'AGO', 'ARG', 'ARM', 'AUS',
+                 'AUT', 'AZE', 'BHS', 'BHR', 'BGD', 'BRB', 'BLR', 'BEL',
+                 'BLZ', 'BEN', 'BTN', 'BOL', 'BWA', 'BRA', 'BRN', 'BGR']
+MISSING_CODES = ['AND', 'BHR']  # answered with 404 by the stand-in
+FLAKY_CODE = 'AUT'  # fails once with a 500 before answering
+
+
+def climate_api_routes():
+    """Routes imitating the climate API for STANDIN_CODES."""
+    routes = {}
+    flaky_calls = []
+    lock = threading.Lock()
+    for offset, code in enumerate(STANDIN_CODES):
+        body = climate_api_json(offset)
+
+        def route(handler, body=body, code=code):
+            if code in MISSING_CODES:
+                return 404, "no data", {}
+            if code == FLAKY_CODE:
+                with lock:
+                    flaky_calls.append(code)
+                    if len(flaky_calls) == 1:
+                        return 500, "try again", {}
+            return 200, body, {"Content-Type": "application/json"}
+        routes["/v1/country/cru/tas/year/" + code] = route
+    return routes
+
+
+class TestFetchCountries(unittest.TestCase):
+    """ Unit tests for the concurrent climate API retrieval"""
+
+    def setUp(self):
+        """ natively called by the Python unittesting framework """
+        self.saved_cache = http_cache.get_cache()
+        http_cache.set_cache(None)
+        # retry the flaky country at once
+        self.backoff = mock.patch.object(transport, "BACKOFF", 0.01)
+        self.backoff.start()
+
+    def tearDown(self):
+        """ natively called by the Python unittesting framework """
+        self.backoff.stop()
+        http_cache.set_cache(self.saved_cache)
+
+    def fetch(self, delay, **kwargs):
+        """Runs fetch_countries against a fresh stand-in server and returns
+        (dataset, failed, seconds)"""
+        with StandinServer(climate_api_routes(), delay=delay) as server:
+            climate_api = wbpy.ClimateAPI(fetch=grab_worldbank_module._fetch)
+            climate_api.BASE_URL = server.base_url + "/"
+            start = time.perf_counter()
+            dataset, failed = grab_worldbank_module.fetch_countries(
+                climate_api, STANDIN_CODES, **kwargs)
+            return dataset, failed, time.perf_counter() - start
+
+    def test_matches_sequential(self):
+        """The pooled retrieval returns the same data as requesting the
+        countries one at a time"""
+        parallel = self.fetch(0.0)
+        sequential = self.fetch(0.0, max_workers=1)
+        self.assertEqual(parallel[0], sequential[0])
+        self.assertEqual(parallel[1], sequential[1])
+        self.assertEqual(parallel[1], MISSING_CODES)
+        self.assertEqual(len(parallel[0]),
+                         len(STANDIN_CODES) - len(MISSING_CODES))
+        self.assertEqual(len(parallel[0]['AFG']), 2012 - 1901 + 1)
+        self.assertAlmostEqual(parallel[0]['ALB']['1901'], 11.1901)
+
+    def test_retry(self):
+        """A country whose request fails once is retrieved on the retry of
+        the transport module, is lost without it, and a missing country is
+        requested only once"""
+        with StandinServer(climate_api_routes()) as server:
+            climate_api = wbpy.ClimateAPI(fetch=grab_worldbank_module._fetch)
+            climate_api.BASE_URL = server.base_url + "/"
+            dataset, failed = grab_worldbank_module.fetch_countries(
+                climate_api, STANDIN_CODES)
+            paths = [path for _, path, _ in server.requests]
+        self.assertIn(FLAKY_CODE, dataset)
+        self.assertEqual(paths.count("/v1/country/cru/tas/year/" + FLAKY_CODE),
+                         2)
+        for code in MISSING_CODES:
+            self.assertEqual(paths.count("/v1/country/cru/tas/year/" + code),
+                             1)
+        with mock.patch.object(transport, "RETRIES", 0):
+            dataset, failed, _ = self.fetch(0.0)
+        self.assertIn(FLAKY_CODE, failed)
+
+    def test_yearly_global_mean(self):
+        """The retrieved countries are averaged per year with each mean
+        aligned to its own year"""
+        dataset, _, _ = self.fetch(0.0)
+        pairs = [(code.lower(), code) for code in STANDIN_CODES]
+        df = grab_worldbank_module.yearly_global_mean(dataset, pairs,
+                                                      2010, 2012)
+        self.assertEqual(list(df.columns), ['Date', 'Tabsolute_C'])
+        self.assertEqual(list(df['Date']),
+                         ['2010-01-01', '2011-01-01', '2012-01-01'])
+        offsets = [k for k, code in enumerate(STANDIN_CODES)
+                   if code not in MISSING_CODES]
+        expected = 10.0 + sum(offsets) / len(offsets) + 2011 / 1e4
+        self.assertAlmostEqual(df['Tabsolute_C'].iloc[1], expected)
+        self.assertTrue(isinstance(df["Date"].iloc[0], str))
+        self.assertEqual(df["Tabsolute_C"].dtype, 'float')
+
+    def test_grab_worldbank_standin(self):
+        """grab_worldbank takes its countries from the bundled registry and
+        averages those the stand-in climate API knows"""
+        with StandinServer(climate_api_routes()) as server:
+            with mock.patch.object(wbpy.ClimateAPI, "BASE_URL",
+                                   server.base_url + "/"):
+                df = grab_worldbank(2011, 2012)
+        self.assertEqual(list(df['Date']), ['2011-01-01', '2012-01-01'])
+        registry = reference_data.get_registry()
+        offsets = [k for k, code in enumerate(STANDIN_CODES)
+                   if code not in MISSING_CODES and code in registry]
+        expected = 10.0 + sum(offsets) / len(offsets) + 2012 / 1e4
+        self.assertAlmostEqual(df['Tabsolute_C'].iloc[1], expected)
+
+    def test_legacy_codes(self):
+        """Countries with a legacy World Bank code are requested under their
+        ISO alpha-3 code"""
+        routes = climate_api_routes()
+        for iso3 in ['ROU', 'COD', 'TLS']:
+            routes["/v1/country/cru/tas/year/" + iso3] = climate_api_json(0)
+        with StandinServer(routes) as server:
+            with mock.patch.object(wbpy.ClimateAPI, "BASE_URL",
+                                   server.base_url + "/"):
+                grab_worldbank(2011, 2012)
+        paths = [path for _, path, _ in server.requests]
+        for iso3, legacy in [('ROU', 'ROM'), ('COD', 'ZAR'), ('TLS', 'TMP')]:
+            self.assertIn("/v1/country/cru/tas/year/" + iso3, paths)
+            self.assertNotIn("/v1/country/cru/tas/year/" + legacy, paths)
+
+    def test_speedup(self):
+        """With a per request delay the worker pool is clearly faster than
+        the sequential path"""
+        _, _, parallel_time = self.fetch(0.03)
+        _, _, sequential_time = self.fetch(0.03, max_workers=1)
+        self.assertTrue(parallel_time < sequential_time / 2)
+
+
 if __name__ == '__main__':
     unittest.main()
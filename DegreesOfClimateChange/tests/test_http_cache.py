@@ -0,0 +1,124 @@
+"""Unit test for http_cache.py
+
+This Python module contains multiple unit test functions to verify the
+execution of the http_cache.py module and its use by the transport module.
+Tests run against a local stand-in server and a temporary cache folder, and
+verify that fresh entries are served without network access, that stale
+entries are revalidated with conditional requests, that 304 answers are
+served from disk, and that the least recently used entries are evicted.
+
+(class) TestHttpCache
+    Python class for unit testing the HttpCache class and the cache
+    functions in the http_cache.py module.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from DegreesOfClimateChange import http_cache
+from DegreesOfClimateChange import transport
+from DegreesOfClimateChange.tests.http_standin import StandinServer
+
+
+ETAG = '"v1"'
+
+
+def conditional_route(handler):
+    """Answers 304 when the client already holds the current ETag."""
+    if handler.headers.get("If-None-Match") == ETAG:
+        return 304, b"", {"ETag": ETAG}
+    return 200, b"Year,Value\n1880,-0.12\n", {"ETag": ETAG}
+
+
+class TestHttpCache(unittest.TestCase):
+    """ Unit tests for validating http_cache.py module"""
+
+    def setUp(self):
+        """ natively called by the Python unittesting framework """
+        self.directory = tempfile.mkdtemp()
+        self.saved_cache = http_cache.get_cache()
+        self.cache = http_cache.HttpCache(self.directory, ttl=60)
+        http_cache.set_cache(self.cache)
+
+    def tearDown(self):
+        """ natively called by the Python unittesting framework """
+        http_cache.set_cache(self.saved_cache)
+        shutil.rmtree(self.directory)
+
+    def test_fresh_entry_skips_network(self):
+        """A response younger than the TTL is served from disk"""
+        with StandinServer({"/data.csv": conditional_route}) as server:
+            url = server.url("/data.csv")
+            first, _ = transport.fetch_text(url)
+            second, _ = transport.fetch_text(url)
+            self.assertEqual(first, second)
+            self.assertEqual(len(server.requests), 1)
+
+    def test_stale_entry_revalidates(self):
+        """A stale response is revalidated and a 304 is served from disk"""
+        with StandinServer({"/data.csv": conditional_route}) as server:
+            url = server.url("/data.csv")
+            first, _ = transport.fetch_text(url)
+            second, _ = transport.fetch_text(url, ttl=0)
+            self.assertEqual(first, second)
+            self.assertEqual(len(server.requests), 2)
+            self.assertEqual(server.requests[1][2].get("If-None-Match"),
+                             ETAG)
+        # the 304 restarted the TTL
+        meta = self.cache.lookup(url)
+        self.assertTrue(self.cache.is_fresh(meta))
+
+    def test_persists_across_instances(self):
+        """Entries written by one HttpCache are read by a new one"""
+        self.cache.store("http://example/a", b"abc", {"ETag": ETAG}, "utf-8")
+        reopened = http_cache.HttpCache(self.directory)
+        self.assertEqual(reopened.read("http://example/a"), b"abc")
+        self.assertEqual(reopened.lookup("http://example/a")["etag"], ETAG)
+
+    def test_lru_eviction(self):
+        """Least recently used entries are evicted beyond max_bytes"""
+        cache = http_cache.HttpCache(self.directory, max_bytes=25)
+        cache.store("http://example/a", b"a" * 10)
+        time.sleep(0.01)
+        cache.store("http://example/b", b"b" * 10)
+        time.sleep(0.01)
+        cache.read("http://example/a")  # a is now the most recently used
+        time.sleep(0.01)
+        cache.store("http://example/c", b"c" * 10)
+        self.assertIsNotNone(cache.lookup("http://example/a"))
+        self.assertIsNone(cache.lookup("http://example/b"))
+        self.assertIsNotNone(cache.lookup("http://example/c"))
+        self.assertEqual(cache.info()["total_bytes"], 20)
+
+    def test_hit_keeps_metadata(self):
+        """A cache hit leaves the metadata file untouched and the recency
+        it records survives a new HttpCache"""
+        self.cache.store("http://example/a", b"a")
+        time.sleep(0.01)
+        self.cache.store("http://example/b", b"b")
+        meta_path = os.path.join(
+            self.directory, self.cache.key("http://example/a") + ".json")
+        before = os.stat(meta_path).st_mtime_ns
+        time.sleep(0.01)
+        self.cache.read("http://example/a")
+        self.assertEqual(os.stat(meta_path).st_mtime_ns, before)
+        reopened = http_cache.HttpCache(self.directory)
+        urls = [meta["url"] for meta in reopened.info()["entries"]]
+        self.assertEqual(urls, ["http://example/a", "http://example/b"])
+
+    def test_info_and_clear(self):
+        """cache_info describes the entries and clear_cache removes them"""
+        self.cache.store("http://example/a", b"abc")
+        info = http_cache.cache_info()
+        self.assertEqual(info["n_entries"], 1)
+        self.assertEqual(info["entries"][0]["url"], "http://example/a")
+        http_cache.clear_cache()
+        self.assertEqual(http_cache.cache_info()["n_entries"], 0)
+        self.assertIsNone(self.cache.lookup("http://example/a"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+"""Unit test for instrument.py
+
+This Python module contains multiple unit test functions to verify the
+execution of the instrument.py module. Tests include verifying that no
+event is built while no hook is registered, that the grab and plot functions
+report their stages with durations, bytes and rows, that peak memory is
+traced on request, and that the logging, in-memory and JSON lines sinks
+receive every event.
+
+(class) TestInstrument
+    Python class for unit testing the instrument.py module.
+"""
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import tracemalloc
+import unittest
+from contextlib import redirect_stdout
+
+import numpy as np
+
+from DegreesOfClimateChange import axis_cache
+from DegreesOfClimateChange import instrument
+from DegreesOfClimateChange.grab_co2_scripps import grab_scripps_co2_data
+from DegreesOfClimateChange.grab_noaa import grab_noaa
+from DegreesOfClimateChange.plot_functions import plot_each_temperature
+from DegreesOfClimateChange.tests.test_axis_cache import monthly_frame
+from DegreesOfClimateChange.tests.upstream_fixtures import upstream
+
+
+class TestInstrument(unittest.TestCase):
+    """ Unit tests for validating instrument.py module"""
+
+    def setUp(self):
+        """ natively called by the Python unittesting framework """
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """ natively called by the Python unittesting framework """
+        shutil.rmtree(self.directory)
+
+    def test_no_hook_no_event(self):
+        self.assertFalse(instrument.enabled())
+        stage = instrument.stage('anything', url='x')
+        self.assertIs(stage, instrument.stage('other'))
+        with stage as st:
+            st.record(rows=1)
+
+    def test_grab_stages(self):
+        with upstream():
+            with instrument.collecting() as collector:
+                df_noaa = grab_noaa()
+        totals = collector.totals()
+        self.assertEqual([name for name in totals if name.startswith('noaa')],
+                         ['noaa.download', 'noaa.parse', 'noaa.clean',
+                          'noaa.validate'])
+        fetches = collector.select('transport.fetch')
+        self.assertEqual(len(fetches), 12)
+        self.assertTrue(all(event['bytes'] > 0 for event in fetches))
+        download, = collector.select('noaa.download')
+        self.assertGreater(download['bytes'], 0)
+        self.assertGreaterEqual(download['seconds'], 0)
+        clean, = collector.select('noaa.clean')
+        self.assertEqual(clean['rows'], len(df_noaa))
+        self.assertIsNone(clean['error'])
+        self.assertFalse(instrument.enabled())
+
+    def test_scripps_stages(self):
+        with upstream():
+            with instrument.collecting() as collector:
+                df = grab_scripps_co2_data()
+        names = [event['stage'] for event in collector.events
+                 if event['stage'].startswith('scripps')]
+        self.assertEqual(names, ['scripps.download', 'scripps.parse',
+                                 'scripps.clean', 'scripps.aggregate',
+                                 'scripps.validate'])
+        self.assertEqual(collector.select('scripps.aggregate')[0]['rows'],
+                         len(df))
+
+    def test_plot_stage(self):
+        saved = axis_cache.get_axis_cache()
+        axis_cache.set_axis_cache(None)
+        try:
+            df = monthly_frame(10)
+            with instrument.collecting() as collector:
+                plot_each_temperature(df, df, df.rename(
+                    columns={'Tanomaly_C': 'Tabsolute_C'}), False)
+        finally:
+            axis_cache.set_axis_cache(saved)
+        event, = collector.select('plot.each_temperature')
+        self.assertEqual(event['rows'], 3 * 120)
+
+    def test_peak_memory(self):
+        was_tracing = tracemalloc.is_tracing()
+        with instrument.collecting(memory=True) as collector:
+            self.assertTrue(tracemalloc.is_tracing())
+            with instrument.stage('outer'):
+                with instrument.stage('inner'):
+                    block = np.ones(2000000)
+                del block
+        self.assertEqual(tracemalloc.is_tracing(), was_tracing)
+        inner, = collector.select('inner')
+        outer, = collector.select('outer')
+        self.assertGreaterEqual(inner['peak_memory'], 16000000)
+        # the peak of the inner stage counts for the outer one as well
+        self.assertGreaterEqual(outer['peak_memory'], inner['peak_memory'])
+
+    def test_error_is_reported(self):
+        with instrument.collecting() as collector:
+            with self.assertRaises(KeyError):
+                with instrument.stage('failing', source='test'):
+                    raise KeyError('missing')
+        event, = collector.events
+        self.assertEqual(event['error'], "KeyError: 'missing'")
+        self.assertEqual(event['source'], 'test')
+
+    def test_broken_hook(self):
+        def broken(event):
+            raise RuntimeError('sink down')
+        with redirect_stdout(io.StringIO()) as out:
+            with instrument.hooked(broken):
+                with instrument.stage('step') as st:
+                    st.record(rows=3)
+        self.assertIn('sink down', out.getvalue())
+
+    def test_sinks(self):
+        path = os.path.join(self.directory, 'stages.jsonl')
+        with instrument.hooked(instrument.JsonLinesSink(path)):
+            with self.assertLogs('DegreesOfClimateChange') as logs:
+                with instrument.hooked(instrument.LoggingSink()):
+                    with instrument.stage('step') as st:
+                        st.record(bytes=10, rows=2)
+            with instrument.stage('second'):
+                pass
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('step', logs.output[0])
+        self.assertIn('10 bytes, 2 rows', logs.output[0])
+        with open(path) as events_file:
+            events = [json.loads(line) for line in events_file]
+        self.assertEqual([event['stage'] for event in events],
+                         ['step', 'second'])
+        self.assertEqual(events[0]['rows'], 2)
+
+    def test_remove_unknown_hook(self):
+        self.assertRaises(ValueError, instrument.remove_hook, print)
+
+
+if __name__ == '__main__':
+    unittest.main()
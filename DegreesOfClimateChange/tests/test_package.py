@@ -0,0 +1,83 @@
+"""Unit test for the DegreesOfClimateChange package interface
+
+This Python module contains multiple unit test functions to verify the
+top-level interface in __init__.py. Tests include verifying that the
+public names resolve to the functions of the submodules, and that importing
+the package or the modules of a fetch-only job loads neither matplotlib nor
+wbpy.
+
+(class) TestPackage
+    Python class for unit testing the lazy package interface.
+"""
+
+import os
+import subprocess
+import sys
+import unittest
+
+import DegreesOfClimateChange
+from DegreesOfClimateChange import sources
+from DegreesOfClimateChange.grab_co2_scripps import grab_scripps_co2_data
+
+
+PACKAGE_PARENT = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+
+
+def loaded_modules(statement, modules):
+    """Names among modules loaded by a new interpreter after statement"""
+    code = ("import sys\n{}\nprint(' '.join(name for name in {!r} "
+            "if name in sys.modules))").format(statement, list(modules))
+    output = subprocess.check_output([sys.executable, '-c', code],
+                                     cwd=PACKAGE_PARENT)
+    return output.decode().split()
+
+
+class TestPackage(unittest.TestCase):
+    """ Unit tests for validating the package interface"""
+
+    def test_public_names(self):
+        self.assertIs(DegreesOfClimateChange.grab_all, sources.grab_all)
+        self.assertIs(DegreesOfClimateChange.grab_scripps_co2_data,
+                      grab_scripps_co2_data)
+        self.assertTrue(callable(DegreesOfClimateChange.grab_noaa.grab_noaa))
+        for name in DegreesOfClimateChange.__all__:
+            self.assertIn(name, dir(DegreesOfClimateChange))
+            self.assertIsNotNone(getattr(DegreesOfClimateChange, name))
+
+    def test_unknown_name(self):
+        with self.assertRaises(AttributeError):
+            DegreesOfClimateChange.grab_everything
+
+    def test_fetch_job_imports(self):
+        heavy = ['matplotlib', 'wbpy', 'DegreesOfClimateChange.sources']
+        self.assertEqual(loaded_modules("import DegreesOfClimateChange",
+                                        heavy), [])
+        fetch = ("import DegreesOfClimateChange.sources, "
+                 "DegreesOfClimateChange.grab_noaa, "
+                 "DegreesOfClimateChange.grab_worldbank, "
+                 "DegreesOfClimateChange.grab_co2_scripps")
+        self.assertEqual(loaded_modules(fetch, heavy),
+                         ['DegreesOfClimateChange.sources'])
+
+    def test_plot_data_without_pyplot(self):
+        statement = ("import DegreesOfClimateChange as docc\n"
+                     "docc.plot_each_temperature")
+        self.assertEqual(loaded_modules(statement, ['matplotlib.pyplot']), [])
+
+    def test_headless_backend(self):
+        statement = (
+            "import os\n"
+            "os.environ.pop('DISPLAY', None)\n"
+            "os.environ.pop('WAYLAND_DISPLAY', None)\n"
+            "os.environ.pop('MPLBACKEND', None)\n"
+            "from DegreesOfClimateChange import plot_functions\n"
+            "print(plot_functions._pyplot().get_backend())")
+        output = subprocess.check_output([sys.executable, '-c', statement],
+                                         cwd=PACKAGE_PARENT)
+        if sys.platform.startswith('linux'):
+            self.assertEqual(output.decode().strip().lower(), 'agg')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -36,8 +36,12 @@ from DegreesOfClimateChange.grab_worldbank import grab_worldbank
 from DegreesOfClimateChange.grab_berkeley import grab_berkeley
 from DegreesOfClimateChange.grab_noaa import grab_noaa
 from DegreesOfClimateChange.grab_co2_scripps import grab_scripps_co2_data
+from DegreesOfClimateChange.tests.upstream_fixtures import upstream
+from DegreesOfClimateChange import axis_cache
 import unittest
 import datetime
+import shutil
+import tempfile
 import warnings
 import pandas as pd
 
@@ -69,16 +73,21 @@ class TestPlotFunctions(unittest.TestCase):
     # attribute for grab_worldbank() and cache the computations...
     def __init__(self, *args, **kwargs):
         super(TestPlotFunctions, self).__init__(*args, **kwargs)
-        self.df_wb = grab_worldbank(2009, 2010) # arbitrary dates chosen in
-                                                # tight range for speed
-        self.df_noaa = grab_noaa()
-        self.db_berkeley = grab_berkeley()
-        self.df_co2 = grab_scripps_co2_data()
+        with upstream():
+            self.df_wb = grab_worldbank(2009, 2010) # arbitrary dates chosen in
+                                                    # tight range for speed
+            self.df_noaa = grab_noaa()
+            self.db_berkeley = grab_berkeley()
+            self.df_co2 = grab_scripps_co2_data()
 
     @ignore_warnings
     def setUp(self):
         """ natively called by the Python unittesting framework """
         print('In setUp()')
+        # plotted axes go to a temporary cache, not the user's
+        self.axis_dir = tempfile.mkdtemp()
+        self.saved_axis_cache = axis_cache.get_axis_cache()
+        axis_cache.set_axis_cache(axis_cache.AxisCache(self.axis_dir))
 
         # dataframes used in plotting
         df_noaa = self.df_noaa
@@ -294,6 +303,8 @@ class TestPlotFunctions(unittest.TestCase):
     def tearDown(self):
         """ natively called by the Python unittesting framework """
         print('In tearDown()')
+        axis_cache.set_axis_cache(self.saved_axis_cache)
+        shutil.rmtree(self.axis_dir)
         del self.xdata
         del self.ydata
         del self.ydata_wco2
@@ -0,0 +1,109 @@
+"""Unit test for rebase.py
+
+This Python module contains multiple unit test functions to verify the
+execution of the rebase.py module. Tests include verifying the baseline of
+a reference period in every date format, that anomalies of sources with
+different reference periods agree once rebased onto the same period, that
+baselines are cached per source and period and recomputed for changed data,
+and that invalid periods raise ValueError.
+
+(class) TestRebase
+    Python class for unit testing the rebase.py module.
+"""
+
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from DegreesOfClimateChange import dates
+from DegreesOfClimateChange import rebase
+
+
+def monthly(values, first_year=1950, date_format='string'):
+    """(Date, Tanomaly_C) dataframe of monthly values from first_year"""
+    months = np.arange(len(values))
+    return pd.DataFrame({
+        'Date': dates.make_dates(first_year + months // 12, months % 12 + 1,
+                                 date_format),
+        'Tanomaly_C': values}, columns=['Date', 'Tanomaly_C'])
+
+
+class TestRebase(unittest.TestCase):
+    """ Unit tests for validating rebase.py module"""
+
+    def setUp(self):
+        """ natively called by the Python unittesting framework """
+        rebase.clear_baselines()
+        # warming of 0.01 deg C a month from 1950 to 1979
+        self.truth = np.arange(360) * 0.01
+
+    def test_baseline(self):
+        for date_format in dates.DATE_FORMATS:
+            df = monthly(self.truth, date_format=date_format)
+            self.assertAlmostEqual(
+                rebase.baseline(df, 'Tanomaly_C', (1951, 1952)),
+                self.truth[12:36].mean())
+        df = monthly(self.truth)
+        df.loc[12:23, 'Tanomaly_C'] = np.nan
+        self.assertAlmostEqual(rebase.baseline(df, 'Tanomaly_C', (1951, 1952)),
+                               self.truth[24:36].mean())
+        self.assertEqual(rebase.reference_period('Berkeley'), (1951, 1980))
+        self.assertAlmostEqual(
+            rebase.baseline(df, 'Tanomaly_C', name='Berkeley'),
+            np.nanmean(df['Tanomaly_C'].values[12:]))
+
+    def test_reference_periods(self):
+        # the same temperatures reported against two reference periods
+        noaa = monthly(self.truth - self.truth[:120].mean())
+        berkeley = monthly(self.truth - self.truth[120:240].mean())
+        self.assertFalse(np.allclose(noaa['Tanomaly_C'],
+                                     berkeley['Tanomaly_C']))
+        np.testing.assert_allclose(
+            rebase.rebase(noaa, 'Tanomaly_C', (1970, 1979)),
+            rebase.rebase(berkeley, 'Tanomaly_C', (1970, 1979)))
+        np.testing.assert_allclose(
+            rebase.rebase(noaa, 'Tanomaly_C', (1960, 1969), climatology=14.0),
+            self.truth - self.truth[120:240].mean() + 14.0)
+
+        wb = pd.DataFrame({'Date': dates.make_dates(np.arange(1950, 1980)),
+                           'Tabsolute_C': 19.0 + np.arange(30) * 0.12})
+        absolute = rebase.to_absolute(noaa, 'Tanomaly_C', wb, 'Tabsolute_C',
+                                      (1955, 1964))
+        np.testing.assert_allclose(
+            absolute, rebase.to_absolute(berkeley, 'Tanomaly_C', wb,
+                                         'Tabsolute_C', (1955, 1964)))
+        self.assertAlmostEqual(absolute[60:180].mean(),
+                               wb['Tabsolute_C'][5:15].mean())
+
+    def test_cache(self):
+        df = monthly(self.truth)
+        first = rebase.baseline(df, 'Tanomaly_C', (1960, 1969), name='NOAA')
+        with mock.patch.object(dates, 'month_numbers',
+                               side_effect=AssertionError('recomputed')):
+            self.assertEqual(rebase.baseline(df, 'Tanomaly_C', (1960, 1969),
+                                             name='NOAA'), first)
+        # changed data and another period are averaged anew
+        df.loc[130, 'Tanomaly_C'] += 12.0
+        self.assertAlmostEqual(
+            rebase.baseline(df, 'Tanomaly_C', (1960, 1969), name='NOAA'),
+            first + 0.1)
+        self.assertNotEqual(
+            rebase.baseline(df, 'Tanomaly_C', (1961, 1969), name='NOAA'),
+            first)
+
+    def test_invalid_periods(self):
+        df = monthly(self.truth)
+        for period in [(1980, 1970), 'recent', (1950,), None]:
+            self.assertRaises(ValueError, rebase.baseline, df, 'Tanomaly_C',
+                              period)
+        self.assertRaises(ValueError, rebase.baseline, df, 'Tanomaly_C',
+                          (2000, 2010))
+        self.assertRaises(ValueError, rebase.baseline, df, 'Tanomaly_C',
+                          name='WorldBank')
+        self.assertRaises(KeyError, rebase.reference_period, 'Unknown')
+
+
+if __name__ == '__main__':
+    unittest.main()
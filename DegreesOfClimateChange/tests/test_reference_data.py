@@ -0,0 +1,77 @@
+"""Unit test for reference_data.py
+
+This Python module contains multiple unit test functions to verify the
+execution of the reference_data.py module. Tests include verifying that the
+bundled tables load without network access, that code and name lookups agree,
+that the legacy World Bank codes map to ISO alpha-3 codes, that every economy
+belongs to exactly one region, and that the registry is only loaded once per
+process.
+
+(class) TestReferenceData
+    Python class for unit testing the CountryRegistry class and the
+    get_registry function in the reference_data.py module.
+"""
+
+import unittest
+
+from DegreesOfClimateChange import reference_data
+
+
+REGIONS = ['EAS', 'ECS', 'LCN', 'MEA', 'NAC', 'SAS', 'SSF']
+
+
+class TestReferenceData(unittest.TestCase):
+    """ Unit tests for validating reference_data.py module"""
+
+    def setUp(self):
+        """ natively called by the Python unittesting framework """
+        self.registry = reference_data.get_registry()
+
+    def test_loaded_once(self):
+        """get_registry returns the same registry on every call"""
+        self.assertIs(reference_data.get_registry(), self.registry)
+
+    def test_economies(self):
+        """The economies are read in order and the aggregates are kept
+        apart from them"""
+        self.assertEqual(len(self.registry), 218)
+        self.assertEqual(self.registry.pairs()[0], ('Afghanistan', 'AFG'))
+        self.assertNotIn('WLD', self.registry)
+        self.assertNotIn('', self.registry)
+        self.assertEqual(self.registry.group_names['WLD'], 'World')
+
+    def test_lookups(self):
+        """Name and code lookups are inverse of each other"""
+        self.assertEqual(self.registry.name('GHA'), 'Ghana')
+        self.assertEqual(self.registry.code('Bahamas, The'), 'BHS')
+        self.assertEqual(self.registry.name('CIV'), "Côte d'Ivoire")
+        for name, code in self.registry.pairs():
+            self.assertEqual(self.registry.code(self.registry.name(code)),
+                             code)
+        self.assertRaises(KeyError, self.registry.name, 'XXX')
+
+    def test_iso3(self):
+        """Legacy World Bank codes map to their ISO alpha-3 codes"""
+        legacy = {'ADO': 'AND', 'ZAR': 'COD', 'IMY': 'IMN', 'KSV': 'XKX',
+                  'ROM': 'ROU', 'TMP': 'TLS', 'WBG': 'PSE'}
+        for code, iso3 in legacy.items():
+            self.assertEqual(self.registry.iso3(code), iso3)
+        self.assertEqual(self.registry.iso3('GHA'), 'GHA')
+        iso3_codes = [self.registry.iso3(code) for code in self.registry.codes]
+        self.assertEqual(len(set(iso3_codes)), 218)
+        self.assertRaises(KeyError, self.registry.iso3, 'XXX')
+
+    def test_groups(self):
+        """Every economy is in exactly one region and in the World group"""
+        in_regions = []
+        for region in REGIONS:
+            self.assertIn(region, self.registry.group_names)
+            in_regions.extend(self.registry.members(region))
+        self.assertEqual(sorted(in_regions), sorted(self.registry.codes))
+        self.assertEqual(self.registry.groups_of('USA'), ('NAC', 'WLD'))
+        self.assertEqual(len(self.registry.members('WLD')), 218)
+        self.assertIn('GHA', self.registry.members('SSF'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+"""Unit test for replay.py
+
+This Python module contains multiple unit test functions to verify the
+execution of the replay.py module. Tests include verifying that responses
+recorded from a local stand-in server, including compressed, HEAD and byte
+range responses, are replayed identically once the server is gone, that a
+request without a fixture or a fixture of another format version fails, and
+that the mode can be chosen with environment variables.
+
+(class) TestReplay
+    Python class for unit testing the record and replay modes in the
+    replay.py module.
+"""
+
+import datetime
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from DegreesOfClimateChange import grab_noaa as grab_noaa_module
+from DegreesOfClimateChange import http_cache
+from DegreesOfClimateChange import replay
+from DegreesOfClimateChange import transport
+from DegreesOfClimateChange.tests.http_standin import StandinServer
+from DegreesOfClimateChange.tests.upstream_fixtures import noaa_month_csv
+
+
+BODY = "Year,Value\n" + "1880,-0.12\n" * 500
+
+
+class TestReplay(unittest.TestCase):
+    """ Unit tests for validating replay.py module"""
+
+    def setUp(self):
+        """ natively called by the Python unittesting framework """
+        self.directory = tempfile.mkdtemp()
+        self.saved_cache = http_cache.get_cache()
+        http_cache.set_cache(None)
+
+    def tearDown(self):
+        """ natively called by the Python unittesting framework """
+        http_cache.set_cache(self.saved_cache)
+        shutil.rmtree(self.directory)
+
+    def record(self):
+        """Records the stand-in responses and returns what the transport
+        functions returned while recording, and the urls"""
+        routes = {"/plain.csv": BODY,
+                  "/gzip.csv": lambda handler: (
+                      200, gzip.compress(BODY.encode("utf-8")),
+                      {"Content-Encoding": "gzip"})}
+        with StandinServer(routes) as server:
+            urls = [server.url("/plain.csv"), server.url("/gzip.csv")]
+            with replay.recording(self.directory):
+                return self.use(urls), urls
+
+    @staticmethod
+    def use(urls):
+        """Runs each kind of transport request on urls"""
+        stream = transport.open_stream(urls[1])
+        try:
+            streamed = stream.read()
+        finally:
+            stream.close()
+        return ([transport.fetch_text(url)[0] for url in urls],
+                streamed,
+                transport.fetch_head(urls[0]).get("Content-Length"),
+                transport.fetch_range(urls[0], 11, 21))
+
+    def test_record_and_replay(self):
+        """Replayed responses equal the recorded ones without a server"""
+        recorded, urls = self.record()
+        self.assertEqual(recorded[0], [BODY, BODY])
+        self.assertEqual(recorded[1], BODY.encode("utf-8"))
+        self.assertEqual(recorded[3], (206, b"1880,-0.12\n"))
+        with replay.replaying(self.directory):
+            self.assertEqual(self.use(urls), recorded)
+            with self.assertRaises(replay.FixtureMissing):
+                transport.fetch_text(urls[0] + "?missing")
+        # the raw compressed body is kept
+        meta, body = replay.FixtureStore(self.directory).load("GET", urls[1])
+        self.assertEqual(meta["headers"]["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(body), BODY.encode("utf-8"))
+
+    def test_format_version(self):
+        """Fixtures of another format version are refused"""
+        store = replay.FixtureStore(self.directory)
+        store.save("GET", "http://example.org/a", 200, {}, b"a")
+        meta_path = os.path.join(
+            self.directory, store.key("GET", "http://example.org/a") + ".json")
+        with open(meta_path) as meta_file:
+            meta = json.load(meta_file)
+        meta["version"] = replay.FIXTURE_VERSION + 1
+        with open(meta_path, "w") as meta_file:
+            json.dump(meta, meta_file)
+        with self.assertRaises(ValueError):
+            store.load("GET", "http://example.org/a")
+
+    def test_environment_mode(self):
+        """DOCC_REPLAY and DOCC_FIXTURES select the mode of a process"""
+        store = replay.FixtureStore(self.directory)
+        url_base = "http://example.org/noaa/"
+        this_year = datetime.datetime.now().year
+        for imonth in range(1, 13):
+            store.save("GET", "{}{}/1880-{}.csv".format(url_base, imonth,
+                                                        this_year),
+                       200, {}, noaa_month_csv(imonth, 1880, this_year - 1)
+                       .encode("utf-8"))
+        environ = {"DOCC_REPLAY": "replay", "DOCC_FIXTURES": self.directory}
+        # a cache created before the mode was set is bypassed
+        cache = http_cache.HttpCache(os.path.join(self.directory, "http"))
+        http_cache.set_cache(cache)
+        with mock.patch.dict(os.environ, environ), \
+                mock.patch.object(grab_noaa_module, "BASE_URL", url_base):
+            self.assertEqual(replay.current_mode()[0], "replay")
+            df = grab_noaa_module.grab_noaa()
+        self.assertIsNone(cache.lookup(url_base + "1/1880-{}.csv".format(
+            this_year)))
+        self.assertEqual(df.shape, ((this_year - 1880) * 12, 2))
+        self.assertEqual(df["Date"].iloc[-1],
+                         "{}-12-01".format(this_year - 1))
+        with mock.patch.dict(os.environ, {"DOCC_REPLAY": "replay"}):
+            with self.assertRaises(ValueError):
+                replay.current_mode()
+        with mock.patch.dict(os.environ, environ), replay.live():
+            self.assertEqual(replay.current_mode()[0], "off")
+
+
+if __name__ == '__main__':
+    unittest.main()
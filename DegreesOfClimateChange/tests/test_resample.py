@@ -0,0 +1,107 @@
+"""Unit test for resample.py
+
+This Python module contains multiple unit test functions to verify the
+execution of the resample.py module. Tests include verifying that the annual,
+decadal and seasonal means match a pandas groupby for every date format,
+that periods with too few valid values are dropped, and that several
+dataframes resampled in one pass give the same result as one at a time.
+
+(class) TestResample
+    Python class for unit testing the resample.py module.
+"""
+
+import unittest
+
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from DegreesOfClimateChange import dates
+from DegreesOfClimateChange import resample
+
+
+def monthly(n_months, first_year=1948, first_month=1, date_format='string'):
+    """(Date, Tanomaly_C) dataframe of n_months consecutive months"""
+    months = np.arange(n_months) + first_month - 1
+    return pd.DataFrame({
+        'Date': dates.make_dates(first_year + months // 12, months % 12 + 1,
+                                 date_format),
+        'Tanomaly_C': np.cos(np.arange(n_months) / 7.0)},
+        columns=['Date', 'Tanomaly_C'])
+
+
+class TestResample(unittest.TestCase):
+    """ Unit tests for validating resample.py module"""
+
+    def test_annual_matches_groupby(self):
+        df = monthly(100, first_month=5)
+        years = dates.to_datetime(df['Date']).dt.year.values
+        expected = df['Tanomaly_C'].groupby(years).mean()
+        for date_format in dates.DATE_FORMATS:
+            frame = monthly(100, first_month=5, date_format=date_format)
+            yearly = resample.resample(frame, 'Tanomaly_C', 'annual')
+            self.assertEqual(list(yearly.columns), ['Date', 'Tanomaly_C'])
+            np.testing.assert_allclose(yearly['Tanomaly_C'].values,
+                                       expected.values)
+            self.assertEqual(list(dates.to_datetime(yearly['Date']).dt.year),
+                             list(expected.index))
+        strings = resample.resample(df, 'Tanomaly_C', date_format='string')
+        self.assertEqual(strings['Date'].iloc[0], '1948-01-01')
+
+    def test_decadal_and_seasonal(self):
+        df = monthly(60, first_year=1957, first_month=11)
+        decadal = resample.resample(df, 'Tanomaly_C', 'decadal',
+                                    date_format='string')
+        self.assertEqual(list(decadal['Date']), ['1950-01-01', '1960-01-01'])
+        self.assertAlmostEqual(decadal['Tanomaly_C'].iloc[0],
+                               df['Tanomaly_C'].iloc[:26].mean())
+        seasonal = resample.resample(df, 'Tanomaly_C', 'seasonal',
+                                     date_format='string')
+        # November 1957 opens the autumn, December 1957 the winter of 1958
+        self.assertEqual(list(seasonal['Date'][:3]),
+                         ['1957-9-01', '1957-12-01', '1958-3-01'])
+        self.assertAlmostEqual(seasonal['Tanomaly_C'].iloc[1],
+                               df['Tanomaly_C'].iloc[1:4].mean())
+        keys, valid = resample.period_keys(df['Date'][:4], 'seasonal')
+        self.assertTrue(valid.all())
+        self.assertEqual(list(resample.season_names(keys)),
+                         ['SON', 'DJF', 'DJF', 'DJF'])
+
+    def test_min_count(self):
+        df = monthly(36)
+        df.loc[12:17, 'Tanomaly_C'] = np.nan
+        df.loc[24:35, 'Tanomaly_C'] = np.nan
+        yearly = resample.resample(df, 'Tanomaly_C', date_format='string')
+        # the year without any valid month is dropped
+        self.assertEqual(list(yearly['Date']), ['1948-01-01', '1949-01-01'])
+        self.assertAlmostEqual(yearly['Tanomaly_C'].iloc[1],
+                               df['Tanomaly_C'].iloc[18:24].mean())
+        full = resample.resample(df, 'Tanomaly_C', min_count=12,
+                                 date_format='string')
+        self.assertEqual(list(full['Date']), ['1948-01-01'])
+        self.assertRaises(ValueError, resample.resample, df, 'Tanomaly_C',
+                          min_count=0)
+        self.assertRaises(ValueError, resample.resample, df, 'Tanomaly_C',
+                          'weekly')
+
+    def test_many_in_one_pass(self):
+        noaa = monthly(50, first_year=1880)
+        berkeley = monthly(80, first_year=1750, date_format='period')
+        wb = pd.DataFrame({'Date': dates.make_dates(np.arange(1901, 1931)),
+                           'Tabsolute_C': np.linspace(18.0, 19.0, 30)})
+        frames = resample.resample_many(
+            {'NOAA': (noaa, 'Tanomaly_C'), 'Berkeley': (berkeley,
+                                                       'Tanomaly_C'),
+             'WorldBank': (wb, 'Tabsolute_C')}, 'decadal')
+        self.assertEqual(list(frames), ['NOAA', 'Berkeley', 'WorldBank'])
+        assert_frame_equal(frames['NOAA'],
+                           resample.resample(noaa, 'Tanomaly_C', 'decadal'))
+        assert_frame_equal(frames['Berkeley'],
+                           resample.resample(berkeley, 'Tanomaly_C',
+                                             'decadal'))
+        self.assertEqual(len(frames['WorldBank']), 4)
+        self.assertEqual(resample.resample_many({}), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
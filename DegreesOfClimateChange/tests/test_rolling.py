@@ -0,0 +1,120 @@
+"""Unit test for rolling.py
+
+This Python module contains multiple unit test functions to verify the
+execution of the rolling.py module. Tests include verifying every statistic
+against pandas rolling for trailing and centered windows with missing
+values, the computation of several sources and windows at once, the columns
+added by add_rolling, empty series, the smoothed columns kept by
+grab_berkeley, and that invalid arguments raise ValueError.
+
+(class) TestRolling
+    Python class for unit testing the rolling.py module.
+"""
+
+import io
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from DegreesOfClimateChange import grab_berkeley
+from DegreesOfClimateChange import rolling
+from DegreesOfClimateChange.tests.upstream_fixtures import berkeley_text
+
+
+class TestRolling(unittest.TestCase):
+    """ Unit tests for validating rolling.py module"""
+
+    def setUp(self):
+        """ natively called by the Python unittesting framework """
+        rng = np.random.RandomState(5)
+        self.values = 14.0 + np.cumsum(rng.normal(0, 0.1, size=(300, 3)),
+                                       axis=0)
+        self.values[rng.rand(300, 3) < 0.05] = np.nan
+
+    def test_against_pandas(self):
+        df = pd.DataFrame(self.values)
+        for statistic in rolling.STATISTICS:
+            for window in [1, 2, 7, 12]:
+                for center in [False, True]:
+                    for min_periods in [None, 1, 5]:
+                        expected = getattr(df.rolling(
+                            window, center=center,
+                            min_periods=(window if min_periods is None
+                                         else min(min_periods, window))),
+                            statistic)()
+                        if statistic == 'count':
+                            expected = df.rolling(
+                                window, center=center, min_periods=0).count()
+                        result = rolling.rolling(self.values, window,
+                                                 statistic, center,
+                                                 min_periods)
+                        np.testing.assert_allclose(
+                            result, expected.values, rtol=1e-9, atol=1e-9,
+                            err_msg="{} {} {} {}".format(
+                                statistic, window, center, min_periods))
+
+    def test_windows(self):
+        smoothed = rolling.rolling_windows(self.values, [12, 3, 60],
+                                           center=True, min_periods=1)
+        self.assertEqual(list(smoothed), [12, 3, 60])
+        for window, result in smoothed.items():
+            self.assertEqual(result.shape, self.values.shape)
+            np.testing.assert_allclose(
+                result[:, 1], rolling.rolling(self.values[:, 1], window,
+                                              center=True, min_periods=1))
+        # a window longer than the series
+        self.assertTrue(np.isnan(rolling.rolling(self.values[:10], 12)).all())
+        self.assertEqual(len(rolling.rolling_windows(self.values, [])), 0)
+
+    def test_empty(self):
+        for statistic in rolling.STATISTICS:
+            for center in [False, True]:
+                self.assertEqual(
+                    rolling.rolling([], 3, statistic, center).shape, (0,))
+                self.assertEqual(rolling.rolling(
+                    np.zeros((0, 2)), 3, statistic, center).shape, (0, 2))
+        added = rolling.add_rolling(pd.DataFrame({'Tanomaly_C': []}),
+                                    'Tanomaly_C', [12])
+        self.assertEqual(list(added.columns),
+                         ['Tanomaly_C', 'Tanomaly_C_mean12'])
+        self.assertEqual(len(added), 0)
+
+    def test_add_rolling(self):
+        df = pd.DataFrame({'Date': np.arange(300),
+                           'Tanomaly_C': self.values[:, 0]})
+        added = rolling.add_rolling(df, 'Tanomaly_C', [12, 120], 'max')
+        self.assertEqual(list(added.columns), ['Date', 'Tanomaly_C',
+                                               'Tanomaly_C_max12',
+                                               'Tanomaly_C_max120'])
+        self.assertEqual(list(df.columns), ['Date', 'Tanomaly_C'])
+        np.testing.assert_allclose(
+            added['Tanomaly_C_max120'],
+            df['Tanomaly_C'].rolling(120, center=True).max())
+
+    def test_berkeley_smoothed(self):
+        text = berkeley_text(48)
+        df = grab_berkeley.parse_berkeley(text, smoothed=True)
+        self.assertEqual(list(df.columns),
+                         ['Date', 'Tanomaly_C'] +
+                         [name for _, name in grab_berkeley.SMOOTHED_COLUMNS])
+        np.testing.assert_allclose(df['Tanomaly_10y_C'], df['Tanomaly_C'])
+        self.assertEqual(list(grab_berkeley.parse_berkeley(text).columns),
+                         ['Date', 'Tanomaly_C'])
+        chunks = list(grab_berkeley.iter_berkeley(io.StringIO(text), chunksize=20,
+                                                  smoothed=True))
+        self.assertTrue(pd.concat(chunks).equals(df))
+        self.assertRaises(ValueError, grab_berkeley.grab_berkeley,
+                          incremental=True, smoothed=True)
+
+    def test_invalid_arguments(self):
+        self.assertRaises(ValueError, rolling.rolling, self.values, 0)
+        self.assertRaises(ValueError, rolling.rolling, self.values, 2.5)
+        self.assertRaises(ValueError, rolling.rolling, self.values, 3,
+                          'median')
+        self.assertRaises(ValueError, rolling.rolling, self.values, 3,
+                          min_periods=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
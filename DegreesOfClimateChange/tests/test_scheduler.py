@@ -0,0 +1,182 @@
+"""Unit test for scheduler.py
+
+This Python module contains multiple unit test functions to verify the
+execution of the scheduler.py module. Tests include verifying that the first
+request waits for a copy, that stale copies are served at once while they
+are refreshed in the background, that failed refreshes keep the last good
+copy and back off, and that a ClimateStore gives a warm start.
+
+(class) TestRefreshScheduler
+    Python class for unit testing the RefreshScheduler class in the
+    scheduler.py module.
+"""
+
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import pandas as pd
+
+from DegreesOfClimateChange import sources
+from DegreesOfClimateChange.climate_store import ClimateStore
+from DegreesOfClimateChange.scheduler import RefreshScheduler
+
+
+class CountingGrab(object):
+    """Grab function returning one more row on every call; it fails while
+    failing is set, waits for release when one is given and releases the
+    called semaphore as each call starts"""
+
+    def __init__(self):
+        self.calls = 0
+        self.failing = False
+        self.release = None
+        self.called = threading.Semaphore(0)
+
+    def __call__(self, date_format='string'):
+        self.calls += 1
+        self.called.release()
+        if self.release is not None:
+            self.release.wait()
+        if self.failing:
+            raise IOError('host down')
+        return pd.DataFrame({'Date': ['2000-01-01'] * self.calls,
+                             'Tanomaly_C': [0.5] * self.calls})
+
+
+class TestRefreshScheduler(unittest.TestCase):
+    """ Unit tests for validating scheduler.py module"""
+
+    def setUp(self):
+        """ natively called by the Python unittesting framework """
+        self.grab = CountingGrab()
+        sources.register_source(sources.Source(
+            'Counting', self.grab, 'Tanomaly_C', units='deg C',
+            kind='anomaly', resolution='monthly', host='localhost'))
+        self.schedulers = []
+
+    def tearDown(self):
+        """ natively called by the Python unittesting framework """
+        if self.grab.release is not None:
+            self.grab.release.set()
+        for scheduler in self.schedulers:
+            scheduler.stop()
+        sources.unregister_source('Counting')
+
+    def scheduler(self, interval=60.0, **kwargs):
+        scheduler = RefreshScheduler(['Counting'],
+                                     intervals={'Counting': interval},
+                                     **kwargs)
+        self.schedulers.append(scheduler)
+        return scheduler
+
+    def test_first_get_waits(self):
+        scheduler = self.scheduler()
+        snapshot = scheduler.get('Counting')
+        self.assertEqual(len(snapshot.frame), 1)
+        self.assertFalse(snapshot.stale)
+        self.assertFalse(snapshot.refreshing)
+        self.assertLess(abs((pd.Timestamp.now() -
+                             snapshot.fetched_at).total_seconds()), 5)
+        # fresh copies are served without any new download
+        scheduler.get('Counting')
+        self.assertEqual(self.grab.calls, 1)
+
+    def test_first_get_without_waiting(self):
+        self.grab.release = threading.Event()
+        scheduler = self.scheduler()
+        snapshot = scheduler.get('Counting', timeout=0)
+        self.assertIsNone(snapshot.frame)
+        self.assertTrue(snapshot.refreshing)
+        self.grab.release.set()
+        scheduler.refresh('Counting').result()
+        self.assertEqual(len(scheduler.get('Counting').frame), 1)
+
+    def test_stale_while_revalidate(self):
+        scheduler = self.scheduler(interval=0.1)
+        first = scheduler.get('Counting').frame
+        # the copy is stale after at least the interval
+        time.sleep(0.2)
+        self.grab.release = threading.Event()
+        # the refresh waits for release, so get returns without it
+        served = []
+        getter = threading.Thread(
+            target=lambda: served.append(scheduler.get('Counting')))
+        getter.start()
+        getter.join(10)
+        self.assertEqual(len(served), 1)
+        snapshot = served[0]
+        self.assertIs(snapshot.frame, first)
+        self.assertTrue(snapshot.stale)
+        self.assertTrue(snapshot.refreshing)
+        # the Future of the running refresh
+        running = scheduler.refresh('Counting')
+        self.grab.release.set()
+        running.result()
+        snapshot = scheduler.get('Counting')
+        self.assertEqual(len(snapshot.frame), 2)
+        self.assertFalse(snapshot.stale)
+
+    def test_failures_back_off(self):
+        scheduler = self.scheduler(backoff=10.0, max_backoff=25.0)
+        scheduler.get('Counting')
+        self.grab.failing = True
+        delays = []
+        for _ in range(3):
+            report = scheduler.refresh('Counting', wait=True)
+            self.assertEqual(report['status'], 'failed')
+            status = scheduler.status()['Counting']
+            delays.append((status['next_refresh'] -
+                           pd.Timestamp.now()).total_seconds())
+        for delay, expected in zip(delays, [10, 20, 25]):
+            self.assertAlmostEqual(delay, expected, delta=2.0)
+        snapshot = scheduler.get('Counting')
+        # the last good copy survives, and no retry happens before the
+        # backoff even though the copy is stale by then
+        self.assertEqual(len(snapshot.frame), 1)
+        self.assertEqual(snapshot.failures, 3)
+        self.assertIn('host down', snapshot.error)
+        self.assertFalse(snapshot.refreshing)
+
+        self.grab.failing = False
+        scheduler.refresh('Counting', wait=True)
+        snapshot = scheduler.get('Counting')
+        self.assertEqual((snapshot.failures, snapshot.error), (0, None))
+        self.assertEqual(len(snapshot.frame), 5)
+
+    def test_background_refresh(self):
+        with self.scheduler(interval=0.05) as scheduler:
+            # three refreshes start without any get
+            for _ in range(3):
+                self.assertTrue(self.grab.called.acquire(timeout=10))
+            self.assertIsNotNone(scheduler.get('Counting', timeout=0).frame)
+        calls = self.grab.calls
+        time.sleep(0.15)
+        self.assertEqual(self.grab.calls, calls)
+        self.assertRaises(RuntimeError, scheduler.start)
+
+    def test_store_warm_start(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        store = ClimateStore(directory)
+        store.write('Counting', pd.DataFrame({'Date': ['1999-01-01'] * 3,
+                                              'Tanomaly_C': [0.1] * 3}))
+        scheduler = self.scheduler(store=store)
+        snapshot = scheduler.get('Counting', timeout=0)
+        self.assertEqual(len(snapshot.frame), 3)
+        self.assertFalse(snapshot.stale)
+        self.assertEqual(self.grab.calls, 0)
+        scheduler.refresh('Counting', wait=True)
+        self.assertEqual(store.versions('Counting'), [1, 2])
+
+    def test_invalid_arguments(self):
+        scheduler = self.scheduler()
+        self.assertRaises(KeyError, scheduler.get, 'Unknown')
+        self.assertRaises(ValueError, self.scheduler, interval=0)
+        self.assertRaises(KeyError, RefreshScheduler, ['Unknown'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+"""Unit test for sources.py
+
+This Python module contains multiple unit test functions to verify the
+execution of the sources.py module. Tests include verifying the metadata of
+the bundled sources, the registration of new sources, that grab_all runs
+the sources concurrently while isolating failing and slow sources, and that
+grab_one reports a single source the same way.
+
+(class) TestSources
+    Python class for unit testing the source registry and grab_all in the
+    sources.py module.
+"""
+
+import threading
+import time
+import unittest
+
+import pandas as pd
+
+from DegreesOfClimateChange import sources
+
+
+def fake_grab(rows, barrier=None, error=None, release=None):
+    """Grab function returning a (Date, Tanomaly_C) dataframe once all the
+    parties of barrier have arrived, or after release is set, or raising
+    error"""
+    def grab(date_format='string'):
+        if barrier is not None:
+            barrier.wait()
+        if release is not None:
+            release.wait()
+        if error is not None:
+            raise error
+        return pd.DataFrame({'Date': ['2000-{}-01'.format(k + 1)
+                                      for k in range(rows)],
+                             'Tanomaly_C': [0.5] * rows})
+    return grab
+
+
+class TestSources(unittest.TestCase):
+    """ Unit tests for validating sources.py module"""
+
+    def setUp(self):
+        """ natively called by the Python unittesting framework """
+        self.added = []
+
+    def tearDown(self):
+        """ natively called by the Python unittesting framework """
+        for name in self.added:
+            sources.unregister_source(name)
+
+    def add(self, name, grab):
+        sources.register_source(sources.Source(
+            name, grab, 'Tanomaly_C', units='deg C', kind='anomaly',
+            resolution='monthly', host='localhost'))
+        self.added.append(name)
+
+    def test_bundled_sources(self):
+        """The four agencies are registered with their metadata"""
+        self.assertEqual(sources.source_names()[:4],
+                         ['NOAA', 'Berkeley', 'WorldBank', 'Scripps'])
+        berkeley = sources.get_source('Berkeley')
+        self.assertEqual((berkeley.kind, berkeley.resolution, berkeley.units),
+                         ('anomaly', 'monthly', 'deg C'))
+        self.assertEqual(sources.get_source('Scripps').units, 'ppm')
+        self.assertEqual(sources.get_source('NOAA').grab.__name__,
+                         'grab_noaa')
+
+    def test_register(self):
+        """Duplicate names and invalid metadata raise ValueError"""
+        with self.assertRaises(ValueError):
+            self.add('NOAA', fake_grab(1))
+        with self.assertRaises(ValueError):
+            sources.Source('X', fake_grab(1), 'CO2', 'ppm', 'relative',
+                           'monthly', 'localhost')
+        with self.assertRaises(KeyError):
+            sources.grab_all(['Unknown'])
+
+    def test_grab_all_concurrent_and_isolated(self):
+        """Sources run in parallel and a failure only affects its source"""
+        # run one after another, the first source would break the barrier
+        barrier = threading.Barrier(2, timeout=10)
+        self.add('Slow1', fake_grab(3, barrier=barrier))
+        self.add('Slow2', fake_grab(4, barrier=barrier))
+        self.add('Broken', fake_grab(1, error=IOError('host down')))
+        frames, report = sources.grab_all(['Slow1', 'Slow2', 'Broken'])
+        self.assertEqual(sorted(frames), ['Slow1', 'Slow2'])
+        self.assertEqual(report['Slow2']['rows'], 4)
+        self.assertEqual(report['Slow1']['status'], 'ok')
+        self.assertIsNone(report['Slow1']['error'])
+        self.assertEqual(report['Broken']['status'], 'failed')
+        self.assertIn('host down', report['Broken']['error'])
+
+    def test_grab_one(self):
+        """A single source is retrieved and reported like in grab_all"""
+        self.add('One', fake_grab(3))
+        self.add('Broken', fake_grab(1, error=IOError('host down')))
+        df, report = sources.grab_one('One')
+        self.assertEqual(len(df), 3)
+        self.assertEqual((report['status'], report['rows']), ('ok', 3))
+        df, report = sources.grab_one('Broken')
+        self.assertIsNone(df)
+        self.assertEqual(report['status'], 'failed')
+        self.assertIn('host down', report['error'])
+        self.assertRaises(KeyError, sources.grab_one, 'Unknown')
+        self.assertRaises(ValueError, sources.grab_one, 'One', 'julian')
+
+    def test_grab_all_timeout(self):
+        """A source still running after the timeout is reported as such"""
+        release = threading.Event()
+        self.add('Fast', fake_grab(2))
+        self.add('Stuck', fake_grab(2, release=release))
+        try:
+            frames, report = sources.grab_all(['Fast', 'Stuck'],
+                                              timeout=1.0)
+        finally:
+            release.set()
+        self.assertEqual(list(frames), ['Fast'])
+        self.assertEqual(report['Stuck']['status'], 'timeout')
+
+    def test_grab_all_cancels_queued(self):
+        """Sources still waiting for a worker at the timeout never run"""
+        release = threading.Event()
+        started = []
+
+        def queued(date_format='string'):
+            started.append(True)
+            return fake_grab(1)(date_format)
+        self.add('Stuck', fake_grab(2, release=release))
+        self.add('Queued', queued)
+        try:
+            frames, report = sources.grab_all(['Stuck', 'Queued'],
+                                              max_workers=1, timeout=0.2)
+        finally:
+            release.set()
+        time.sleep(0.2)
+        self.assertEqual(frames, {})
+        self.assertEqual(report['Stuck']['status'], 'timeout')
+        self.assertEqual(report['Queued']['status'], 'cancelled')
+        self.assertEqual(report['Queued']['error'], 'never started')
+        self.assertEqual(started, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+"""Unit test for transport.py
+
+This Python module contains multiple unit test functions to verify the
+execution of the transport.py module against a local stand-in server, so no
+network access is needed. Tests include verifying that concurrent downloads
+keep the order of the requested urls, that they overlap in time, that
+failed requests are retried and slow ones time out, that the requests to a
+host are capped, that compressed bodies are decompressed, and that
+grab_noaa combines the 12 concurrently downloaded months correctly.
+
+(class) TestTransport
+    Python class for unit testing the Python functions in transport.py
+"""
+
+import datetime
+import gzip
+import threading
+import time
+import unittest
+from unittest import mock
+
+import requests
+
+from DegreesOfClimateChange import grab_noaa as grab_noaa_module
+from DegreesOfClimateChange import http_cache
+from DegreesOfClimateChange import transport
+from DegreesOfClimateChange.tests.http_standin import StandinServer
+from DegreesOfClimateChange.tests.upstream_fixtures import noaa_month_csv
+
+
+class TestTransport(unittest.TestCase):
+    """ Unit tests for validating transport.py module"""
+
+    def setUp(self):
+        """ natively called by the Python unittesting framework """
+        # every request must reach the stand-in server
+        self.saved_cache = http_cache.get_cache()
+        http_cache.set_cache(None)
+
+    def tearDown(self):
+        """ natively called by the Python unittesting framework """
+        http_cache.set_cache(self.saved_cache)
+
+    def test_fetch_text(self):
+        """fetch_text returns the body and a positive latency"""
+        with StandinServer({"/a.csv": "a,b\n1,2\n"}) as server:
+            text, latency = transport.fetch_text(server.url("/a.csv"))
+        self.assertEqual(text, "a,b\n1,2\n")
+        self.assertTrue(latency > 0)
+
+    def test_fetch_many_order_and_overlap(self):
+        """fetch_many keeps url order and runs the requests concurrently"""
+        delay = 0.2
+        routes = {"/{}.csv".format(k): str(k) for k in range(12)}
+        with StandinServer(routes, delay=delay) as server:
+            urls = [server.url("/{}.csv".format(k)) for k in range(12)]
+            start = time.perf_counter()
+            responses = transport.fetch_many(urls)
+            elapsed = time.perf_counter() - start
+        self.assertEqual([text for text, _ in responses],
+                         [str(k) for k in range(12)])
+        self.assertTrue(all(latency >= delay for _, latency in responses))
+        # sequential would take 12 round trips
+        self.assertTrue(elapsed < 6 * delay)
+
+    def test_fetch_many_empty(self):
+        """fetch_many with no urls returns an empty list"""
+        self.assertEqual(transport.fetch_many([]), [])
+
+    def test_retry_with_backoff(self):
+        """5xx answers are retried and the last answer is returned once
+        the retries are used up"""
+        answers = [503, 500, 200]
+
+        def flaky(handler):
+            return answers.pop(0), "ok", {}
+        with mock.patch.object(transport, "BACKOFF", 0.01):
+            with StandinServer({"/flaky": flaky, "/down": (
+                    lambda handler: (503, "down", {}))}) as server:
+                text, _ = transport.fetch_text(server.url("/flaky"))
+                with mock.patch.object(transport, "RETRIES", 1):
+                    with self.assertRaises(requests.HTTPError):
+                        transport.fetch_text(server.url("/down"))
+                down_requests = [path for _, path, _ in server.requests
+                                 if path == "/down"]
+        self.assertEqual(text, "ok")
+        self.assertEqual(answers, [])
+        self.assertEqual(len(down_requests), 2)
+
+    def test_read_timeout(self):
+        """A host that does not answer in time raises instead of hanging"""
+        release = threading.Event()
+
+        def stuck(handler):
+            # answers only once the client has given up, or after 10 s
+            release.wait(10)
+            return 200, "late", {}
+        with mock.patch.object(transport, "TIMEOUT", (1.0, 0.1)), \
+                mock.patch.object(transport, "RETRIES", 1), \
+                mock.patch.object(transport, "BACKOFF", 0.01):
+            with StandinServer({"/slow": stuck}) as server:
+                try:
+                    with self.assertRaises(requests.Timeout):
+                        transport.fetch_text(server.url("/slow"))
+                finally:
+                    release.set()
+                attempts = [path for _, path, _ in server.requests
+                            if path == "/slow"]
+        self.assertEqual(len(attempts), 2)
+
+    def test_host_limit(self):
+        """No more than the host limit of requests are in flight at once"""
+        delay = 0.1
+        routes = {"/{}.csv".format(k): str(k) for k in range(6)}
+        transport.set_host_limit("127.0.0.1", 2)
+        self.addCleanup(transport.set_host_limit, "127.0.0.1", None)
+        with StandinServer(routes, delay=delay) as server:
+            urls = [server.url("/{}.csv".format(k)) for k in range(6)]
+            start = time.perf_counter()
+            transport.fetch_many(urls)
+            elapsed = time.perf_counter() - start
+        # 6 requests, 2 at a time: at least 3 round trips
+        self.assertGreaterEqual(elapsed, 3 * delay)
+        self.assertRaises(ValueError, transport.set_host_limit, "x", 0)
+
+    def test_gzip(self):
+        """Compressed bodies are requested and decompressed, also when
+        streamed"""
+        text = "Year,Value\n" + "1900,0.1\n" * 1000
+        body = gzip.compress(text.encode("utf-8"))
+
+        def compressed(handler):
+            return 200, body, {"Content-Encoding": "gzip"}
+        with StandinServer({"/data.csv": compressed}) as server:
+            fetched, _ = transport.fetch_text(server.url("/data.csv"))
+            stream = transport.open_stream(server.url("/data.csv"))
+            try:
+                streamed = stream.read()
+            finally:
+                stream.close()
+            accept = server.requests[0][2].get("Accept-Encoding", "")
+        self.assertEqual(fetched, text)
+        self.assertEqual(streamed.decode("utf-8"), text)
+        self.assertIn("gzip", accept)
+        self.assertLess(len(body), len(text))
+
+    def test_grab_noaa_concurrent(self):
+        """grab_noaa combines the concurrently fetched months in order and
+        reports the latency of each request"""
+        this_year = datetime.datetime.now().year
+        routes = {}
+        for imonth in range(1, 13):
+            path = "/{}/1880-{}.csv".format(imonth, this_year)
+            routes[path] = noaa_month_csv(imonth, 1880, this_year - 1)
+        with StandinServer(routes, delay=0.05) as server:
+            with mock.patch.object(grab_noaa_module, "BASE_URL",
+                                   server.base_url + "/"):
+                latencies = {}
+                df_concurrent = grab_noaa_module.grab_noaa(
+                    latencies=latencies)
+                df_sequential = grab_noaa_module.grab_noaa(concurrent=False)
+
+        self.assertEqual(list(df_concurrent.columns), ['Date', 'Tanomaly_C'])
+        self.assertEqual(df_concurrent.shape[0], (this_year - 1880) * 12)
+        self.assertEqual(df_concurrent["Date"].iloc[0], "1880-1-01")
+        self.assertEqual(df_concurrent["Date"].iloc[1], "1880-2-01")
+        self.assertEqual(sorted(latencies.keys()), list(range(1, 13)))
+        self.assertTrue(df_concurrent.equals(df_sequential))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+"""Unit test for validation.py
+
+This Python module contains multiple unit test functions to verify the
+execution of the validation.py module. Tests include verifying that the
+frames of the grab functions pass in every date format, that each check
+finds the gaps, duplicates, sentinels, implausible values and schema errors
+it is meant to find, that only the schema and rows checks raise unless
+validate is 'raise', and that a short NOAA download raises ValidationError
+even under python -O.
+
+(class) TestValidation
+    Python class for unit testing the validate and check functions in the
+    validation.py module.
+"""
+
+import io
+import os
+import subprocess
+import sys
+import unittest
+from contextlib import redirect_stdout
+
+import numpy as np
+import pandas as pd
+
+from DegreesOfClimateChange import dates
+from DegreesOfClimateChange import grab_noaa
+from DegreesOfClimateChange import validation
+from DegreesOfClimateChange.tests.upstream_fixtures import noaa_month_csv
+
+
+PACKAGE_PARENT = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+
+
+def monthly(n_months, date_format='string', first_year=1950):
+    """(Date, Tanomaly_C) dataframe of n_months consecutive months"""
+    months = np.arange(n_months)
+    return pd.DataFrame({
+        'Date': dates.make_dates(first_year + months // 12, months % 12 + 1,
+                                 date_format),
+        'Tanomaly_C': np.sin(months) / 2}, columns=['Date', 'Tanomaly_C'])
+
+
+def failed(report):
+    """Names of the failed checks of report"""
+    return [check['check'] for check in report.errors + report.warnings]
+
+
+class TestValidation(unittest.TestCase):
+    """ Unit tests for validating validation.py module"""
+
+    def test_clean_frames_pass(self):
+        for date_format in dates.DATE_FORMATS:
+            report = validation.validate(
+                monthly(120, date_format), 'Tanomaly_C', 'monthly',
+                valid_range=validation.ANOMALY_RANGE, min_rows=120)
+            self.assertTrue(report.passed, str(report))
+            self.assertEqual(failed(report), [])
+            yearly = pd.DataFrame({
+                'Date': dates.make_dates(np.arange(1958, 2018),
+                                         date_format=date_format),
+                'CO2': np.linspace(315.0, 405.0, 60)})
+            report = validation.validate(yearly, 'CO2', 'yearly',
+                                         valid_range=validation.CO2_RANGE)
+            self.assertTrue(report.passed, str(report))
+
+    def test_gaps_and_duplicates(self):
+        df = monthly(24).drop([5, 6, 7, 20]).reset_index(drop=True)
+        df = pd.concat([df, df.iloc[[2]]], ignore_index=True)
+        report = validation.validate(df, 'Tanomaly_C')
+        self.assertEqual(failed(report), ['order', 'duplicates', 'gaps'])
+        gaps = report.errors[2]
+        self.assertEqual(gaps['count'], 4)
+        self.assertEqual(gaps['examples'],
+                         ['1950-06 to 1950-08', '1951-09 to 1951-09'])
+        self.assertEqual(report.errors[1]['examples'], ['1950-03'])
+
+    def test_values(self):
+        df = monthly(12)
+        df.loc[[1, 2], 'Tanomaly_C'] = [-99.99, 42.0]
+        df.loc[3, 'Tanomaly_C'] = np.nan
+        report = validation.validate(df, 'Tanomaly_C',
+                                     valid_range=validation.ANOMALY_RANGE)
+        self.assertEqual(failed(report), ['sentinels', 'range', 'missing'])
+        self.assertEqual(report.errors[0]['examples'], ['-99.99'])
+        self.assertEqual(report.errors[1]['examples'], ['42.0'])
+        # NaN values are only a warning
+        df.loc[[1, 2], 'Tanomaly_C'] = 0.0
+        report = validation.validate(df, 'Tanomaly_C')
+        self.assertTrue(report.passed)
+        self.assertEqual(report.warnings[0]['count'], 1)
+
+    def test_schema_and_dates(self):
+        df = monthly(12)
+        report = validation.validate(df, 'CO2')
+        self.assertEqual(report.errors[0]['examples'], ['CO2'])
+        df['Tanomaly_C'] = 'warm'
+        self.assertEqual(failed(validation.validate(df, 'Tanomaly_C')),
+                         ['schema'])
+        df = monthly(3)
+        df.loc[1, 'Date'] = 'soon'
+        report = validation.validate(df, 'Tanomaly_C', min_rows=4)
+        self.assertEqual(failed(report), ['dates', 'rows', 'gaps'])
+        self.assertEqual(report.errors[0]['examples'], ['soon'])
+        self.assertRaises(ValueError, validation.validate, df, 'Tanomaly_C',
+                          'daily')
+
+    def test_check(self):
+        report = validation.check(monthly(12), 'Test', 'Tanomaly_C')
+        self.assertIs(validation.last_report('Test'), report)
+        self.assertEqual(report.to_dict()['rows'], 12)
+        with self.assertRaises(validation.ValidationError) as caught:
+            validation.check(monthly(12).drop(4), 'Test', 'Tanomaly_C',
+                             mode='raise')
+        self.assertIn('gaps', str(caught.exception))
+        self.assertFalse(validation.last_report('Test').passed)
+        self.assertIsNone(validation.last_report('Unknown'))
+
+        # by default the failed checks are only reported
+        output = io.StringIO()
+        with redirect_stdout(output):
+            report = validation.check(monthly(12).drop(4), 'Test',
+                                      'Tanomaly_C')
+        self.assertEqual(failed(report), ['gaps'])
+        self.assertIs(validation.last_report('Test'), report)
+        self.assertIn('Warning: Test: 11 rows failed', output.getvalue())
+        # except the schema and rows checks
+        for df, kwargs in [(monthly(12), {'min_rows': 13}),
+                           (monthly(12).drop(columns='Tanomaly_C'), {})]:
+            self.assertRaises(validation.ValidationError, validation.check,
+                              df, 'Test', 'Tanomaly_C', **kwargs)
+        self.assertIsNone(validation.check(monthly(12).drop(4), 'Off',
+                                           'Tanomaly_C', mode='off'))
+        self.assertIsNone(validation.last_report('Off'))
+        self.assertRaises(ValueError, validation.check, monthly(12), 'Test',
+                          'Tanomaly_C', mode='warn')
+
+    def test_short_noaa_download(self):
+        texts = [noaa_month_csv(imonth, 1880, 1990)
+                 for imonth in range(1, 13)]
+        with self.assertRaises(validation.ValidationError) as caught:
+            grab_noaa._frame_from_texts(texts, 2000, 'string')
+        self.assertIsInstance(caught.exception, ValueError)
+        self.assertEqual(caught.exception.report.errors[0]['check'], 'rows')
+        df = grab_noaa._frame_from_texts(texts, 2000, 'string', 'off')
+        self.assertEqual(len(df), (1990 - 1880 + 1) * 12)
+        self.assertRaises(ValueError, grab_noaa.grab_noaa, validate='warn')
+        # the check does not vanish like an assert statement under -O
+        code = ("from DegreesOfClimateChange import grab_noaa, validation\n"
+                "from DegreesOfClimateChange.tests.upstream_fixtures "
+                "import noaa_month_csv\n"
+                "texts = [noaa_month_csv(m, 1880, 1990) for m in "
+                "range(1, 13)]\n"
+                "try:\n"
+                "    grab_noaa._frame_from_texts(texts, 2000, 'string')\n"
+                "except validation.ValidationError:\n"
+                "    print('raised')\n")
+        output = subprocess.check_output([sys.executable, '-O', '-c', code],
+                                         cwd=PACKAGE_PARENT)
+        self.assertEqual(output.decode().strip(), 'raised')
+
+
+if __name__ == '__main__':
+    unittest.main()
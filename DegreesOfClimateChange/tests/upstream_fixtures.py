@@ -0,0 +1,41 @@
+"""Synthetic upstream responses for offline unit tests
+
+This Python module serves the synthetic files of the fixtures module, in
+the formats published by NOAA, Berkeley Earth, the Scripps Institution of
+Oceanography and the World Bank climate API, to the unit tests. Tests that
+call the grab functions run them inside upstream(), so that every request is
+served from those fixtures through the replay module, without any network
+access and in the same code paths as a live download.
+
+Setting the DOCC_REPLAY environment variable (see the replay module) turns
+the synthetic fixtures off, e.g. DOCC_REPLAY=off runs the tests against the
+live hosts and DOCC_REPLAY=replay against previously recorded fixtures.
+
+(function) upstream
+    Context manager serving the synthetic fixtures to the grab functions.
+(function) noaa_month_csv, berkeley_text, station_csv, climate_api_json
+    Builders of the body of each upstream file, from the fixtures module.
+"""
+
+import contextlib
+import os
+
+from DegreesOfClimateChange import replay
+from DegreesOfClimateChange.fixtures import berkeley_text  # noqa: F401
+from DegreesOfClimateChange.fixtures import climate_api_json  # noqa: F401
+from DegreesOfClimateChange.fixtures import fixture_directory
+from DegreesOfClimateChange.fixtures import noaa_month_csv  # noqa: F401
+from DegreesOfClimateChange.fixtures import station_csv  # noqa: F401
+
+
+@contextlib.contextmanager
+def _environment_mode():
+    yield None
+
+
+def upstream():
+    """Context manager under which the grab functions are served the
+    synthetic fixtures, unless DOCC_REPLAY selects another mode."""
+    if os.environ.get("DOCC_REPLAY"):
+        return _environment_mode()
+    return replay.replaying(fixture_directory())
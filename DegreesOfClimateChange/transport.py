@@ -0,0 +1,447 @@
+# -*- coding: utf-8 -*-
+"""transport provides the shared HTTP session used by the grab functions.
+
+This python module holds a single, pooled keep-alive requests session that
+every data access function in this project downloads through. Reusing one
+session avoids a new TCP and TLS handshake for every file requested from the
+same host, and the fetch_many function downloads several files from a host
+concurrently so that the wall time is close to that of a single request.
+
+Syntax
+from DegreesOfClimateChange import transport
+text, latency = transport.fetch_text(url)
+responses = transport.fetch_many([url1, url2, url3])
+
+Each response is returned as a (text, latency) tuple where latency is the
+time in seconds taken by that single request.
+
+afetch_many and afetch_bytes are their coroutine versions for asyncio
+applications: the requests run in worker threads, so that the event loop
+goes on while they wait on the network.
+
+Responses go through the persistent on-disk cache of the http_cache module.
+A cached copy younger than its TTL is returned without any network access,
+and an older copy is revalidated with a conditional request so that a 304
+Not Modified answer is served from disk.
+
+Every request has connect and read timeouts (TIMEOUT), is retried after
+connection errors, timeouts and 5xx or 429 answers with an exponential,
+jittered backoff (RETRIES, BACKOFF), and waits for a free slot of its host so
+that no host gets more than HOST_LIMIT requests at once (see set_host_limit).
+Responses are requested gzip compressed and decompressed while they are
+read; open_stream hands the decompressed stream straight to a parser.
+
+Every request can be recorded into, or served from, local fixture files
+instead of the network; see the replay module. Each download is reported to
+the hooks of the instrument module as a 'transport.fetch' stage.
+"""
+
+import asyncio
+import io
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from urllib.parse import urlsplit
+
+from . import http_cache
+from . import instrument
+from . import replay
+
+
+POOL_SIZE = 12  # keep-alive connections kept open per host
+HOST_LIMIT = POOL_SIZE  # requests in flight to one host, unless set per host
+TIMEOUT = (10.0, 60.0)  # seconds to connect, and between received bytes
+RETRIES = 3  # extra attempts after a connection error, timeout or 5xx/429
+BACKOFF = 0.5  # seconds; attempt k waits a random time up to BACKOFF * 2**k
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_session = None
+_session_lock = threading.Lock()
+_host_limits = {}  # {host: limit} set with set_host_limit
+_host_slots = {}  # {host: BoundedSemaphore}
+_host_lock = threading.Lock()
+_random = random.Random()
+
+
+def get_session():
+    """Returns the shared, pooled keep-alive requests session.
+
+    The session is created on first use and reused for the life of the
+    process. Its connection pool holds up to POOL_SIZE connections per host
+    so that concurrent requests from fetch_many do not wait on each other.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            # compressed bodies are decompressed while they are read
+            session.headers['Accept-Encoding'] = 'gzip, deflate'
+            # the adapter can also record or replay responses (see replay)
+            adapter = replay.FixtureAdapter(
+                pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session = session
+    return _session
+
+
+def set_host_limit(host, limit):
+    """Caps the number of requests in flight to host (e.g. 'www.ncdc.noaa.gov')
+    at limit; None restores the default HOST_LIMIT."""
+    if limit is not None and limit < 1:
+        raise ValueError("Invalid host limit {!r}".format(limit))
+    with _host_lock:
+        if limit is None:
+            _host_limits.pop(host, None)
+        else:
+            _host_limits[host] = limit
+        # requests already holding a slot release it into the old semaphore
+        _host_slots.pop(host, None)
+
+
+def _host_slot(url):
+    """Returns the semaphore bounding the requests in flight to the host of
+    url."""
+    host = urlsplit(url).hostname or ''
+    with _host_lock:
+        slot = _host_slots.get(host)
+        if slot is None:
+            slot = threading.BoundedSemaphore(_host_limits.get(host,
+                                                               HOST_LIMIT))
+            _host_slots[host] = slot
+        return slot
+
+
+def _request(session, method, url, **kwargs):
+    """Sends a request with the timeouts, retries and host limit of this
+    module, and returns the response.
+
+    Connection errors, timeouts and RETRY_STATUSES answers are retried up to
+    RETRIES times, after a random wait up to BACKOFF * 2**attempt seconds
+    (full jitter), so that clients failing together do not retry together.
+    A response opened with stream=True keeps its host slot until it is
+    closed; the slot is released through response.release_slot.
+    """
+    if session is None:
+        session = get_session()
+    kwargs.setdefault('timeout', TIMEOUT)
+    slot = _host_slot(url)
+    for attempt in range(RETRIES + 1):
+        slot.acquire()
+        try:
+            response = session.request(method, url, **kwargs)
+        except replay.FixtureMissing:
+            slot.release()
+            raise
+        except (requests.ConnectionError, requests.Timeout) as error:
+            slot.release()
+            if attempt == RETRIES:
+                raise
+            reason = "{}: {}".format(type(error).__name__, error)
+        else:
+            if (response.status_code not in RETRY_STATUSES or
+                    attempt == RETRIES):
+                if kwargs.get('stream'):
+                    response.release_slot = slot.release
+                else:
+                    slot.release()
+                return response
+            response.close()
+            slot.release()
+            reason = "HTTP {}".format(response.status_code)
+        with instrument.stage('transport.retry', url=url,
+                              attempt=attempt + 1, reason=reason):
+            time.sleep(_random.uniform(0, BACKOFF * 2 ** attempt))
+
+
+def fetch_text(url, session=None, ttl=None):
+    """Downloads a single url and returns its body as text.
+
+    Args:
+        url (str): Address of the file to download
+        session (requests.Session): Session to use; defaults to the shared
+                                    pooled session from get_session()
+        ttl (float): Seconds a cached copy is used without revalidation;
+                     defaults to the TTL of the shared cache
+    Returns:
+        (text, latency) tuple where text is the decoded response body and
+        latency is the duration of the request in seconds
+    Raises:
+        requests.HTTPError if the server does not answer with a success code
+    """
+    start = time.perf_counter()
+    body, encoding = _fetch_body(url, session, ttl)
+    text = body.decode(encoding or 'utf-8', errors='replace')
+    latency = time.perf_counter() - start
+    return text, latency
+
+
+def fetch_bytes(url, session=None, ttl=None):
+    """Downloads a single url and returns its undecoded body.
+
+    Same as fetch_text, but returns (body bytes, latency) so that byte
+    offsets into the file are preserved.
+    """
+    start = time.perf_counter()
+    body, _ = _fetch_body(url, session, ttl)
+    latency = time.perf_counter() - start
+    return body, latency
+
+
+def _conditional_headers(meta):
+    """Request headers revalidating the cached entry meta."""
+    headers = {}
+    if meta is not None:
+        if meta.get("etag"):
+            headers['If-None-Match'] = meta["etag"]
+        if meta.get("last_modified"):
+            headers['If-Modified-Since'] = meta["last_modified"]
+    return headers
+
+
+def _fetch_body(url, session, ttl):
+    """Returns (body bytes, encoding) for url, going through the cache."""
+    with instrument.stage('transport.fetch', url=url) as st:
+        body, encoding = _fetch_cached(url, session, ttl)
+        st.record(bytes=len(body))
+    return body, encoding
+
+
+def _http_cache():
+    """Returns the shared HTTP cache, or None while the replay module records
+    or replays responses, which must neither come from nor go to it."""
+    if replay.current_mode()[0] != 'off':
+        return None
+    return http_cache.get_cache()
+
+
+def _fetch_cached(url, session, ttl):
+    cache = _http_cache()
+    meta = cache.lookup(url) if cache is not None else None
+    if meta is not None and cache.is_fresh(meta, ttl):
+        try:
+            return cache.read(url), meta["encoding"]
+        except KeyError:
+            meta = None
+
+    # conditional request if we hold an older copy
+    response = _request(session, 'GET', url,
+                        headers=_conditional_headers(meta))
+    if response.status_code == 304 and meta is not None:
+        try:
+            body = cache.read(url)
+            cache.revalidated(url, response.headers)
+            return body, meta["encoding"]
+        except KeyError:
+            response = _request(session, 'GET', url)
+    response.raise_for_status()
+
+    body = response.content
+    encoding = response.encoding or response.apparent_encoding
+    if cache is not None:
+        cache.store(url, body, response.headers, encoding)
+    return body, encoding
+
+
+def open_stream(url, session=None, ttl=None):
+    """Opens url as a binary file object that is read while downloading.
+
+    Large files can then be parsed block by block without holding the whole
+    body in memory. A fresh cached copy is opened from disk, and a download
+    is written to the cache as it is read, and kept once read to the end.
+
+    Args:
+        url (str): Address of the file
+        session (requests.Session): Session to use; defaults to the shared
+                                    pooled session from get_session()
+        ttl (float): Seconds a cached copy is used without revalidation
+    Returns:
+        readable binary file object; close it when done
+    """
+    cache = _http_cache()
+    meta = cache.lookup(url) if cache is not None else None
+    if meta is not None and cache.is_fresh(meta, ttl):
+        stream = cache.open(url)
+        if stream is not None:
+            return stream
+        meta = None
+
+    response = _request(session, 'GET', url,
+                        headers=_conditional_headers(meta), stream=True)
+    if response.status_code == 304 and meta is not None:
+        _close(response)
+        stream = cache.open(url)
+        if stream is not None:
+            cache.revalidated(url, response.headers)
+            return stream
+        response = _request(session, 'GET', url, stream=True)
+    try:
+        response.raise_for_status()
+    except requests.HTTPError:
+        _close(response)
+        raise
+    response.raw.decode_content = True
+    return _ResponseStream(response, cache, url)
+
+
+def _close(response):
+    """Closes a streamed response and frees its host slot."""
+    response.close()
+    release_slot = getattr(response, 'release_slot', None)
+    if release_slot is not None:
+        response.release_slot = None
+        release_slot()
+
+
+class _ResponseStream(io.RawIOBase):
+    """Reads a streamed response, copying it into the cache if one is given.
+
+    The copy is stored in the cache when the stream has been read to the
+    end and closed; a stream closed early leaves the cache untouched.
+    """
+
+    def __init__(self, response, cache=None, url=None):
+        super(_ResponseStream, self).__init__()
+        self._response = response
+        self._cache = cache
+        self._url = url
+        self._copy, self._copy_path = (cache.temp_file() if cache is not None
+                                       else (None, None))
+        self._complete = False
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def tell(self):
+        """Number of bytes read so far."""
+        return self._position
+
+    def readinto(self, buffer):
+        data = self._response.raw.read(len(buffer))
+        if not data:
+            self._complete = True
+            return 0
+        if self._copy is not None:
+            self._copy.write(data)
+        buffer[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            _close(self._response)
+            if self._copy is not None:
+                self._copy.close()
+                if self._complete:
+                    self._cache.store_file(self._url, self._copy_path,
+                                           self._response.headers,
+                                           self._response.encoding)
+                elif os.path.exists(self._copy_path):
+                    os.remove(self._copy_path)
+        super(_ResponseStream, self).close()
+
+
+def fetch_many(urls, max_workers=None, session=None, ttl=None):
+    """Downloads several urls concurrently over the shared session.
+
+    Args:
+        urls (list): Addresses of the files to download
+        max_workers (int): Number of requests in flight at once; defaults to
+                           one per url, up to POOL_SIZE
+        session (requests.Session): Session to use; defaults to the shared
+                                    pooled session from get_session()
+        ttl (float): Seconds a cached copy is used without revalidation
+    Returns:
+        list of (text, latency) tuples in the same order as urls
+    """
+    urls = list(urls)
+    if not urls:
+        return []
+    if max_workers is None:
+        max_workers = min(len(urls), POOL_SIZE)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda url: fetch_text(url, session, ttl),
+                                 urls))
+
+
+async def amap(func, items, limit=None):
+    """Coroutine calling func on each item in worker threads.
+
+    The blocking requests of func run outside the event loop, at most limit
+    at a time, so that coroutines can download without holding up the loop.
+
+    Args:
+        func: Function of one item, e.g. fetch_text
+        items (list): Arguments of func
+        limit (int): Calls in flight at once; defaults to one per item, up
+                     to POOL_SIZE
+    Returns:
+        list of the results of func, in the same order as items
+    """
+    items = list(items)
+    if not items:
+        return []
+    if limit is None:
+        limit = min(len(items), POOL_SIZE)
+    executor = ThreadPoolExecutor(max_workers=max(1, limit))
+    loop = asyncio.get_running_loop()
+    try:
+        return list(await asyncio.gather(
+            *[loop.run_in_executor(executor, func, item) for item in items]))
+    finally:
+        executor.shutdown(wait=False)
+
+
+async def afetch_many(urls, limit=None, session=None, ttl=None):
+    """Coroutine version of fetch_many; limit is the number of requests in
+    flight at once. Returns the list of (text, latency) tuples."""
+    return await amap(lambda url: fetch_text(url, session, ttl), urls, limit)
+
+
+async def afetch_bytes(url, session=None, ttl=None):
+    """Coroutine version of fetch_bytes."""
+    return (await amap(lambda url: fetch_bytes(url, session, ttl), [url]))[0]
+
+
+def fetch_head(url, session=None):
+    """Returns the response headers of a HEAD request for url.
+
+    HEAD requests bypass the cache; they are used to learn the current size
+    of a file before deciding what part of it to download. Compression is
+    refused so that Content-Length is the size of the file itself.
+    """
+    response = _request(session, 'HEAD', url, allow_redirects=True,
+                        headers={'Accept-Encoding': 'identity'})
+    response.raise_for_status()
+    return response.headers
+
+
+def fetch_range(url, start, end=None, session=None):
+    """Downloads the bytes start to end (inclusive) of url.
+
+    Args:
+        url (str): Address of the file
+        start (int): Offset of the first byte wanted
+        end (int): Offset of the last byte wanted; None for the end of file
+        session (requests.Session): Session to use; defaults to the shared
+                                    pooled session from get_session()
+    Returns:
+        (status_code, body) tuple. A 206 status means the server honoured
+        the range and body holds only those bytes; a 200 status means the
+        server ignored it and body holds the whole file.
+    """
+    byte_range = 'bytes={}-{}'.format(start, '' if end is None else end)
+    # offsets refer to the uncompressed file
+    with instrument.stage('transport.range', url=url,
+                          range=byte_range) as st:
+        response = _request(session, 'GET', url,
+                            headers={'Range': byte_range,
+                                     'Accept-Encoding': 'identity'})
+        response.raise_for_status()
+        st.record(bytes=len(response.content))
+    return response.status_code, response.content
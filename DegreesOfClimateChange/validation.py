@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+"""validation checks the dataframes of the grab functions as they arrive.
+
+This python module contains the validate function, which runs a set of
+vectorized checks over a (Date, value) dataframe and returns a
+ValidationReport, and the check function used by the grab functions, which
+also keeps the last report of every source. Unlike an assert statement, the
+checks also run under python -O.
+
+The validate argument of the grab functions selects what a failed check
+does:
+
+raise       any failed error check raises ValidationError (a ValueError)
+report      the default; the report is kept and printed as a warning, only
+            the schema and rows checks, without which the dataframe is
+            unusable, raise ValidationError
+off         no checks are run
+
+The checks, in order, are:
+
+schema      the Date and value columns exist and the values are numeric
+dates       every Date is a valid date
+rows        there are at least min_rows rows
+order       the dates increase
+duplicates  no date appears twice
+gaps        no month (or year) is missing between the first and last date
+sentinels   no missing value mnemonic (such as Scripps' -99.99) is left
+range       the values are physically plausible
+missing     number of NaN values; a warning, it never fails the report
+
+Each check costs one pass of numpy over the columns, a small fraction of the
+time taken to parse the downloaded text.
+
+Syntax
+from DegreesOfClimateChange import validation
+report = validation.validate(df, 'Tanomaly_C', 'monthly',
+                             valid_range=validation.ANOMALY_RANGE)
+report.passed                           --> True if no error check failed
+report.errors                           --> failed error checks
+report.to_dict()                        --> for logs and JSON
+validation.last_report('NOAA')          --> report of the latest grab_noaa
+df = grab_noaa(validate='raise')        --> ValidationError on any error
+"""
+
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from . import dates
+from . import instrument
+
+
+RESOLUTIONS = ('monthly', 'yearly')
+MODES = ('raise', 'report', 'off')  # validate argument of the grab functions
+BLOCKING = ('schema', 'rows')  # checks that raise also in 'report' mode
+ERROR = 'error'  # severity of checks that fail the report
+WARNING = 'warning'  # severity of checks that are only reported
+SENTINELS = (-99.99, -999.0, -9999.0)  # missing value mnemonics upstream
+ANOMALY_RANGE = (-10.0, 10.0)  # deg C, temperature anomalies
+ABSOLUTE_RANGE = (-90.0, 60.0)  # deg C, absolute surface temperatures
+CO2_RANGE = (150.0, 1000.0)  # ppm, atmospheric CO2
+MAX_EXAMPLES = 5  # offending values quoted in each check
+
+_reports = {}  # {source name: last ValidationReport}
+_reports_lock = threading.Lock()
+
+
+class ValidationError(ValueError):
+    """Raised when a dataframe fails an error check.
+
+    Attributes:
+        report (ValidationReport): Report of the failed validation
+    """
+
+    def __init__(self, report):
+        ValueError.__init__(self, str(report))
+        self.report = report
+
+
+class ValidationReport(object):
+    """Outcome of the checks of one dataframe.
+
+    Attributes:
+        name (str): Name of the validated source
+        rows (int): Rows of the dataframe
+        seconds (float): Time taken by the checks
+        checks (list): One {'check', 'severity', 'passed', 'count',
+                       'message', 'examples'} dictionary per check run
+    """
+
+    def __init__(self, name, rows):
+        self.name = name
+        self.rows = rows
+        self.seconds = 0.0
+        self.checks = []
+
+    def add(self, check, severity, count, message='', examples=()):
+        """Appends the outcome of a check; it passes if count is 0."""
+        count = int(count)
+        self.checks.append({
+            'check': check,
+            'severity': severity,
+            'passed': count == 0,
+            'count': count,
+            'message': message if count else '',
+            'examples': [str(example) for example in
+                         list(examples)[:MAX_EXAMPLES]] if count else []})
+
+    @property
+    def errors(self):
+        """Failed checks of ERROR severity."""
+        return [check for check in self.checks
+                if not check['passed'] and check['severity'] == ERROR]
+
+    @property
+    def warnings(self):
+        """Failed checks of WARNING severity."""
+        return [check for check in self.checks
+                if not check['passed'] and check['severity'] == WARNING]
+
+    @property
+    def passed(self):
+        """True if no error check failed."""
+        return not self.errors
+
+    def raise_for_errors(self):
+        """Raises ValidationError if an error check failed."""
+        if not self.passed:
+            raise ValidationError(self)
+
+    def to_dict(self):
+        return {'name': self.name, 'rows': self.rows,
+                'seconds': self.seconds, 'passed': self.passed,
+                'checks': [dict(check) for check in self.checks]}
+
+    def __str__(self):
+        failed = self.errors + self.warnings
+        if not failed:
+            return "{}: {} rows passed {} checks".format(
+                self.name, self.rows, len(self.checks))
+        lines = ["{}: {} rows failed {} of {} checks".format(
+            self.name, self.rows, len(failed), len(self.checks))]
+        for check in failed:
+            lines.append("  {} ({}): {}{}".format(
+                check['check'], check['severity'], check['message'],
+                ", e.g. " + ", ".join(check['examples'])
+                if check['examples'] else ""))
+        return "\n".join(lines)
+
+    def __repr__(self):
+        return "ValidationReport({!r}, rows={}, passed={})".format(
+            self.name, self.rows, self.passed)
+
+
+def validate(df, column, resolution='monthly', valid_range=None,
+             sentinels=SENTINELS, min_rows=None, name=None):
+    """Runs the checks of the module over a (Date, value) dataframe.
+
+    Args:
+        df (dataframe): Dataframe with a Date column of any form of the
+                        dates module and a value column
+        column (str): Name of the value column
+        resolution (str): 'monthly' or 'yearly', the spacing expected
+                          between consecutive dates
+        valid_range (tuple): (lowest, highest) plausible value; None skips
+                             the range check
+        sentinels (tuple): Missing value mnemonics that must not be left
+        min_rows (int): Fewest rows expected; None skips the rows check
+        name (str): Name of the source in the report; defaults to column
+    Returns:
+        ValidationReport
+    Raises:
+        ValueError if resolution is unknown
+    """
+    if resolution not in RESOLUTIONS:
+        raise ValueError("Invalid resolution {!r}, expected one of {}"
+                         .format(resolution, RESOLUTIONS))
+    start = time.perf_counter()
+    report = ValidationReport(name or column, len(df))
+
+    absent = [label for label in ('Date', column) if label not in df.columns]
+    numeric = (column in df.columns and
+               pd.api.types.is_numeric_dtype(df[column].dtype) and
+               not pd.api.types.is_bool_dtype(df[column].dtype))
+    if absent:
+        report.add('schema', ERROR, len(absent), "missing columns", absent)
+    else:
+        report.add('schema', ERROR, not numeric,
+                   "column {} is not numeric".format(column),
+                   [df[column].dtype])
+    if not report.passed:
+        report.seconds = time.perf_counter() - start
+        return report
+
+    months, valid = dates.month_numbers(df['Date'])
+    invalid = ~valid
+    report.add('dates', ERROR, invalid.sum(), "invalid dates",
+               df['Date'][invalid] if invalid.any() else ())
+    if min_rows is not None:
+        report.add('rows', ERROR, len(df) < min_rows,
+                   "{} rows, expected at least {}".format(len(df), min_rows))
+
+    # consecutive periods as consecutive integers
+    periods = months[valid]
+    if resolution == 'yearly':
+        periods = periods // 12
+    steps = np.diff(periods)
+    backwards = np.flatnonzero(steps < 0)
+    report.add('order', ERROR, len(backwards), "dates out of order",
+               _labels(periods[backwards + 1], resolution))
+    ordered = np.sort(periods)
+    steps = np.diff(ordered)
+    repeated = np.flatnonzero(steps == 0)
+    report.add('duplicates', ERROR, len(repeated), "duplicate dates",
+               _labels(ordered[repeated], resolution))
+    holes = np.flatnonzero(steps > 1)
+    report.add('gaps', ERROR, (steps[holes] - 1).sum(),
+               "{} missing {} periods".format(
+                   (steps[holes] - 1).sum(), resolution),
+               ["{} to {}".format(first, last) for first, last in zip(
+                   _labels(ordered[holes] + 1, resolution),
+                   _labels(ordered[holes + 1] - 1, resolution))])
+
+    values = np.asarray(df[column].values, dtype=np.float64)
+    nan = np.isnan(values)
+    flagged = np.zeros(len(values), dtype=bool)
+    if sentinels:
+        flagged = np.isclose(values[:, None],
+                             np.asarray(sentinels, dtype=np.float64)[None, :],
+                             rtol=0.0, atol=1e-6).any(axis=1)
+        report.add('sentinels', ERROR, flagged.sum(),
+                   "missing value mnemonics left in {}".format(column),
+                   values[flagged])
+    if valid_range is not None:
+        lowest, highest = valid_range
+        outside = ~nan & ~flagged & ((values < lowest) | (values > highest))
+        report.add('range', ERROR, outside.sum(),
+                   "values of {} outside [{}, {}]".format(column, lowest,
+                                                          highest),
+                   values[outside])
+    report.add('missing', WARNING, nan.sum(),
+               "{} NaN values of {}".format(nan.sum(), column))
+
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def check_mode(mode):
+    """Raises ValueError if mode is not one of MODES."""
+    if mode not in MODES:
+        raise ValueError("Invalid validate {!r}, expected one of {}"
+                         .format(mode, MODES))
+
+
+def check(df, name, column, resolution='monthly', mode='report', **kwargs):
+    """Validates the dataframe of source name as it is grabbed.
+
+    The report is kept for last_report and recorded in a '<name>.validate'
+    stage of the instrument module. Takes the arguments of validate.
+
+    Args:
+        mode (str): What a failed check does, one of MODES
+    Returns:
+        ValidationReport, or None if mode is 'off'
+    Raises:
+        ValidationError if an error check failed in 'raise' mode, or one of
+        the BLOCKING checks failed in 'report' mode
+        ValueError if mode is unknown
+    """
+    check_mode(mode)
+    if mode == 'off':
+        return None
+    with instrument.stage(name.lower() + '.validate') as st:
+        report = validate(df, column, resolution, name=name, **kwargs)
+        st.record(rows=report.rows, errors=len(report.errors),
+                  warnings=len(report.warnings))
+    with _reports_lock:
+        _reports[name] = report
+    if mode == 'raise' or any(error['check'] in BLOCKING
+                              for error in report.errors):
+        report.raise_for_errors()
+    if not report.passed:
+        print("Warning: {}".format(report))
+    return report
+
+
+def last_report(name):
+    """Returns the ValidationReport of the latest grab of source name, or
+    None if it was not grabbed yet."""
+    with _reports_lock:
+        return _reports.get(name)
+
+
+def _labels(periods, resolution):
+    """Formats integer periods as 'YYYY-MM' months or 'YYYY' years."""
+    if resolution == 'yearly':
+        return [str(year + 1970) for year in periods]
+    return [str(month) for month in
+            np.asarray(periods, dtype=np.int64).astype('datetime64[M]')]
@@ -8,6 +8,8 @@ setup(
    description='A useful module',
    author='Todd, Abhishek, Rahul',
    author_email='setup@setup.com',
-   packages=['DegreesofClimateChange'],  #same as name
-   install_requires=['pandas','numpy','datetime','sys','wbpy'], #external packages as dependencies
+   packages=['DegreesOfClimateChange'],  #same as the package directory
+   package_data={'DegreesOfClimateChange': ['*.csv']},  #bundled reference tables
+   install_requires=['pandas','numpy','datetime','sys','wbpy','requests'], #external packages as dependencies
+   extras_require={'store': ['pyarrow']},  #optional ClimateStore snapshots
 )
\ No newline at end of file